@@ -0,0 +1,266 @@
+"""
+Benchmarks for the DAG builder.
+
+Run all of them with:
+    python benchmarks.py
+or just some of them by name, eg.
+    python benchmarks.py construction
+
+Results are printed, and with --json they are also written to a file as JSON, eg.
+    python benchmarks.py --json results.json
+so runs from before and after a change can be compared.
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+import dag
+
+
+def time_call(function, repeat=5):
+    """Returns the best time taken (in seconds) out of several calls to function"""
+    best = None
+
+    for i in range(repeat):
+        start_time = time.perf_counter()
+        function()
+        taken = time.perf_counter() - start_time
+
+        if best is None or taken < best:
+            best = taken
+
+    return best
+
+
+def get_block(num_statements, num_identifiers=50, seed=0):
+    """
+    Returns a generated basic block of three-address statements over a fixed set of identifiers.
+    Operands are picked from a small set so common subexpressions and reassignments are frequent,
+    and some of them are constants.
+    """
+    generator = random.Random(seed)
+    identifiers = ["v{}".format(i) for i in range(num_identifiers)]
+    statements = []
+
+    for i in range(num_statements):
+        target = generator.choice(identifiers)
+        left = generator.choice(identifiers)
+
+        if generator.random() < 0.1:
+            statements.append("{}={}".format(target, left))
+        else:
+            operator = generator.choice(dag.BINARY_OPERATORS)
+            right = str(generator.randrange(10)) if generator.random() < 0.2 else generator.choice(identifiers)
+            statements.append("{} = {} {} {}".format(target, left, operator, right))
+
+    return statements
+
+
+def get_expression_block(num_expressions, num_identifiers=8, seed=0):
+    """
+    Returns a generated basic block like a naive front end would make: random expressions over a
+    few identifiers and small constants (so x*1, x+0 and constant subexpressions are common),
+    each broken into three-address statements with a fresh temporary for every subexpression
+
+    :return: (statements, identifiers assigned the value of each expression)
+    """
+    generator = random.Random(seed)
+    identifiers = ["v{}".format(i) for i in range(num_identifiers)]
+    statements = []
+    targets = []
+    temporary_count = 0
+
+    def lower(depth):
+        nonlocal temporary_count
+
+        if depth == 0 or generator.random() < 0.2:
+            return str(generator.randrange(3)) if generator.random() < 0.3 else generator.choice(identifiers)
+
+        left, right = lower(depth - 1), lower(depth - 1)
+        temporary_count += 1
+        temporary = "tmp{}".format(temporary_count)
+        statements.append("{} = {} {} {}".format(temporary, left, generator.choice("+-*"), right))
+        return temporary
+
+    for i in range(num_expressions):
+        target = "x{}".format(i)
+        statements.append("{} = {}".format(target, lower(3)))
+        targets.append(target)
+
+    return statements, targets
+
+
+def benchmark_construction():
+    """Measures DAG build time as basic blocks get longer; time per statement should stay flat"""
+    results = {}
+
+    for num_statements in [1000, 10000, 100000]:
+        statements = get_block(num_statements)
+        taken = time_call(lambda: dag.get_dag(statements), repeat=3)
+
+        results[num_statements] = {
+            "seconds": taken,
+            "microseconds per statement": taken / num_statements * 1e6,
+            "nodes": len(dag.get_dag(statements).nodes),
+        }
+
+    print("Building the DAG of a generated basic block:")
+    for num_statements, result in results.items():
+        print("    {} statements: {:.3f} ms ({:.2f} us per statement), {} nodes".format(
+            num_statements, result["seconds"] * 1000, result["microseconds per statement"], result["nodes"]))
+
+    return results
+
+
+def get_peak_memory(function):
+    """Returns the peak memory (in bytes) allocated while calling function, as seen by tracemalloc"""
+    tracemalloc.start()
+    try:
+        function()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def benchmark_streaming(num_statements=200000):
+    """
+    Measures streaming a file of three-address statements into the DAG builder, and compares
+    peak memory with reading every line into a list first
+
+    :param num_statements: Number of statements in the generated file
+    """
+    results = {}
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "block.txt")
+
+        with open(path, "w") as file:
+            for statement in get_block(num_statements):
+                file.write(statement + "\n")
+
+        def stream():
+            with open(path) as file:
+                return dag.get_dag(file)
+
+        def read_all():
+            with open(path) as file:
+                lines = file.readlines()
+            return dag.get_dag(lines)
+
+        taken = time_call(stream, repeat=1)
+        results["statements per second"] = num_statements / taken
+        results["streamed peak bytes"] = get_peak_memory(stream)
+        results["read all peak bytes"] = get_peak_memory(read_all)
+
+    print("Streaming {} statements from a file:".format(num_statements))
+    print("    {:.0f} statements/s".format(results["statements per second"]))
+    print("    peak memory {:.1f} MB streamed, {:.1f} MB reading every line first".format(
+        results["streamed peak bytes"] / 1e6, results["read all peak bytes"] / 1e6))
+
+    return results
+
+
+def get_register_pressure(statements, live_out):
+    """
+    Returns the most identifiers live at once in straight-line three-address code, as a measure
+    of how many registers it needs
+
+    :param live_out: Identifiers used after the code
+    """
+    live = set(live_out)
+    most = len(live)
+
+    for target, operator, left, right in reversed(list(dag.read_statements(statements))):
+        live.discard(target)
+        for operand in (left, right):
+            if operand is not None and operand.isidentifier():
+                live.add(operand)
+
+        most = max(most, len(live))
+
+    return most
+
+
+def benchmark_optimization():
+    """
+    Compares the input code of a corpus of generated basic blocks with the code generated from
+    their DAG, unoptimized and optimized, by statement count, temporaries and register pressure
+    """
+    corpus = {}
+
+    for num_statements in [1000, 10000]:
+        # random statements over 50 identifiers, 10 of which are used after the block
+        statements = get_block(num_statements)
+        corpus["random {}".format(num_statements)] = statements, sorted(dag.get_dag(statements).current)[:10]
+
+        # front end style expressions, every tenth of whose results is used after the block
+        statements, targets = get_expression_block(num_statements // 5)
+        corpus["expressions {}".format(num_statements)] = statements, targets[::10]
+
+    results = {}
+
+    for block_name, (statements, live_out) in corpus.items():
+        block_dag = dag.get_dag(statements)
+        result = {"input": {"statements": len(statements),
+                            "registers": get_register_pressure(statements, live_out)}}
+
+        for name, code_dag in [("dag", block_dag), ("optimized dag", dag.get_optimized_dag(block_dag))]:
+            code = dag.get_code(code_dag, live_out)
+            temporaries = {statement.split("=")[0].strip() for statement in code} - set(code_dag.current)
+
+            result[name] = {
+                "statements": len(code),
+                "temporaries": len(temporaries),
+                "registers": get_register_pressure(code, live_out),
+            }
+
+        result["seconds"] = time_call(lambda: dag.get_code(dag.get_optimized_dag(dag.get_dag(statements)), live_out),
+                                      repeat=3)
+        results[block_name] = result
+
+    print("Code generated for a corpus of basic blocks:")
+    for block_name, result in results.items():
+        print("    {} (optimized in {:.3f} ms):".format(block_name, result["seconds"] * 1000))
+        for name in ["input", "dag", "optimized dag"]:
+            print("        {}: {}".format(name, ", ".join("{} {}".format(value, key) for key, value in result[name].items())))
+
+    return results
+
+
+BENCHMARKS = {
+    "construction": benchmark_construction,
+    "streaming": benchmark_streaming,
+    "optimization": benchmark_optimization,
+}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Runs DAG benchmarks")
+    parser.add_argument("names", nargs="*", help="benchmarks to run (all of them by default): " + ", ".join(BENCHMARKS))
+    parser.add_argument("--json", metavar="PATH", help="also write the results to this file as JSON")
+    args = parser.parse_args()
+
+    for name in args.names:
+        if name not in BENCHMARKS:
+            parser.error("unknown benchmark {!r}".format(name))
+
+    results = {
+        "python": sys.version,
+        "platform": platform.platform(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "benchmarks": {},
+    }
+
+    for name in args.names or list(BENCHMARKS):
+        results["benchmarks"][name] = BENCHMARKS[name]()
+        print()
+
+    if args.json is not None:
+        with open(args.json, "w") as file:
+            json.dump(results, file, indent=2)
@@ -1,60 +1,701 @@
+"""
+Directed Acyclic Graph (DAG) of a basic block, built by local value numbering.
+
+Every node gets a value number, and a hash table maps (operator, left node, right node) to the
+node already computing that value, so a common subexpression is found with one lookup instead
+of comparing it against every earlier statement. Building the DAG takes time linear in the
+number of three-address statements.
+
+Leaves hold the initial values of identifiers (shown subscripted with 0, eg. B0) and constants.
+Each node also keeps the identifiers currently holding its value; when an identifier is
+assigned again (eg. B=B*C) it moves to the new node, and later uses of it refer to that node.
+
+Three-address statements are read one line at a time through generators, so a block can be
+streamed from a file or stdin without holding the input in memory, eg.
+    python dag.py ir_dump.txt
+    python dag.py - --summary < ir_dump.txt
+Each line is "target = operand", "target = op operand" or "target = operand op operand", where
+operands are identifiers (t1, count, x_2) or constants (42, 3.5). Blank lines and anything
+after a # are ignored.
+
+Optimizing the DAG (get_optimized_dag) folds constants and simplifies identities such as x*1 and
+x+0 while the nodes are numbered, so the simplified values are shared like any others. Copies
+(A=B) never make nodes of their own: A just becomes another identifier on B's node, so every
+later use of A reads B's value directly. get_code then turns the DAG back into three-address
+code, keeping only the nodes needed for the identifiers live at the end of the block, eg.
+    python dag.py ir_dump.txt --optimize --live-out x,y --code
+"""
+
+import argparse
+import heapq
 import re
-grammer = ["D=B*C", "E=A+B", "B=B*C", "A=E-D"]
-x=[]
-
-opr = []
-left =[]
-right =[]
-temp=[]
-val =[]
-
-for i in grammer:
-    a = i.split("=")
-    val.append(a[0])
-    temp.append(a[1])
-
-count = 0
-
-for i in range (0,len(temp)):
-    for j in range (0,len(temp)):
-        if temp[j] == temp[i]:
-            
-            if i == j:
+import sys
+
+# operators whose operands can be swapped without changing the value
+COMMUTATIVE_OPERATORS = {"+", "*"}
+BINARY_OPERATORS = ("+", "-", "*", "/", "%")
+UNARY_OPERATORS = ("-",)
+
+CONSTANT = r"\d+(?:\.\d*)?|\.\d+"
+IDENTIFIER = r"[A-Za-z_][A-Za-z0-9_]*"
+# constant folding can make negative constants, which get_code writes as binary operands (eg. x + -3)
+OPERAND = "-?(?:{})|{}".format(CONSTANT, IDENTIFIER)
+# a constant made by folding
+FOLDED_CONSTANT_PATTERN = re.compile("-?(?:{})".format(CONSTANT))
+
+TOKEN_PATTERN = re.compile(r"\s*(?:(?P<constant>{})|(?P<identifier>{})|(?P<operator>[-+*/%=]))".format(
+    CONSTANT, IDENTIFIER))
+# a whole statement, matched in one go: target = [unary operator] operand [binary operator operand]
+STATEMENT_PATTERN = re.compile(r"\s*({})\s*=\s*(?:([{}])\s*({})|({})\s*(?:([{}])\s*({}))?)\s*".format(
+    IDENTIFIER, re.escape("".join(UNARY_OPERATORS)), OPERAND, OPERAND, re.escape("".join(BINARY_OPERATORS)), OPERAND))
+
+
+class Node:
+    """Class representing a node of a DAG: a leaf, or an operator applied to one or two nodes"""
+
+    __slots__ = ("number", "operator", "left", "right", "value", "identifiers")
+
+    def __init__(self, number, operator=None, left=None, right=None, value=None):
+        """
+        :param number: Value number of the node (it's index in the DAG's node list)
+        :param operator: Operator of an interior node, or None for a leaf
+        :param left: Left child (the only child of a unary operator)
+        :param right: Right child, or None for a leaf or unary operator
+        :param value: Identifier or constant whose initial value a leaf holds
+        """
+        self.number = number
+        self.operator = operator
+        self.left = left
+        self.right = right
+        self.value = value
+        # identifiers currently holding the node's value; a dict is used as an ordered set,
+        # so identifiers can be removed in constant time when they are reassigned
+        self.identifiers = {}
+
+    def is_leaf(self):
+        return self.operator is None
+
+    def is_constant(self):
+        return self.operator is None and not self.value.isidentifier()
+
+    def get_label(self):
+        """Returns how the node is shown as a child: it's leaf value (eg. B0), or it's value number"""
+        if self.is_leaf():
+            return self.value + "0" if self.value.isidentifier() else self.value
+
+        return str(self.number)
+
+    def __repr__(self):
+        if self.is_leaf():
+            return "Node({}, {!r})".format(self.number, self.value)
+
+        children = [self.left.number] if self.right is None else [self.left.number, self.right.number]
+        return "Node({}, {!r}, {})".format(self.number, self.operator, children)
+
+
+class DAG:
+    """Class representing the DAG of a basic block, built one three-address statement at a time"""
+
+    def __init__(self, optimize=False):
+        """:param optimize: If true, constants are folded and identities simplified as nodes are added"""
+        self.optimize = optimize
+        self.nodes = []
+        # maps (operator, left number, right number) and ("leaf", value) keys to their node
+        self.value_numbers = {}
+        # maps each identifier that has been assigned in the block to the node holding it's value
+        self.current = {}
+
+    def add_node(self, key, **kwargs):
+        node = Node(len(self.nodes), **kwargs)
+        self.nodes.append(node)
+        self.value_numbers[key] = node
+        return node
+
+    def get_operand_node(self, operand):
+        """
+        Returns the node for an operand: the node an identifier was last assigned, or else a leaf
+        for it's initial value (or for a constant), made the first time it is used
+        """
+        node = self.current.get(operand)
+        if node is not None:
+            return node
+
+        return self.get_leaf(operand)
+
+    def get_leaf(self, value):
+        """Returns the leaf for the initial value of an identifier, or for a constant"""
+        key = ("leaf", value)
+        node = self.value_numbers.get(key)
+
+        if node is None:
+            node = self.add_node(key, value=value)
+
+        return node
+
+    def get_operation_node(self, operator, left, right=None):
+        """
+        Returns the node applying an operator to operand nodes, reusing an existing node
+        if the same value has already been computed
+        """
+        if self.optimize:
+            simplified = self.simplify(operator, left, right)
+            if simplified is not None:
+                return simplified
+
+        if right is not None and operator in COMMUTATIVE_OPERATORS and right.number < left.number:
+            left, right = right, left
+
+        key = (operator, left.number, None if right is None else right.number)
+        node = self.value_numbers.get(key)
+
+        if node is None:
+            node = self.add_node(key, operator=operator, left=left, right=right)
+
+        return node
+
+    def simplify(self, operator, left, right):
+        """
+        Returns a node already holding the value of an operation, if constant folding or an
+        algebraic identity gives one, or else None. Arithmetic is taken to be on numbers, so
+        x*0 is 0 and x-x is 0.
+        """
+        if left.is_constant() and (right is None or right.is_constant()):
+            value = fold_constants(operator, parse_constant(left.value),
+                                   None if right is None else parse_constant(right.value))
+
+            text = None if value is None else format_constant(value)
+
+            if text is not None:
+                return self.get_leaf(text)
+
+        if right is None:
+            # --x is x
+            if operator == "-" and left.operator == "-" and left.right is None:
+                return left.left
+
+            return None
+
+        left_value = parse_constant(left.value) if left.is_constant() else None
+        right_value = parse_constant(right.value) if right.is_constant() else None
+
+        if operator == "+":
+            if right_value == 0:
+                return left
+            if left_value == 0:
+                return right
+        elif operator == "-":
+            if right_value == 0:
+                return left
+            if left is right:
+                return self.get_leaf("0")
+        elif operator == "*":
+            if right_value == 1:
+                return left
+            if left_value == 1:
+                return right
+            if left_value == 0 or right_value == 0:
+                return self.get_leaf("0")
+        elif operator == "/":
+            if right_value == 1:
+                return left
+
+        return None
+
+    def assign(self, target, node):
+        """Makes an identifier hold the value of a node, taking it off the node it held before"""
+        previous = self.current.get(target)
+
+        if previous is not None:
+            del previous.identifiers[target]
+
+        node.identifiers[target] = None
+        self.current[target] = node
+
+    def add_statement(self, target, operator, left, right=None):
+        """
+        Adds a three-address statement to the DAG
+
+        :param target: Identifier assigned by the statement
+        :param operator: Operator, or None for a copy (target = left)
+        :param left: Left operand (the only operand of a copy or unary operator)
+        :param right: Right operand, or None
+        :return: Node holding the value assigned
+        """
+        left_node = self.get_operand_node(left)
+
+        if operator is None:
+            node = left_node
+        else:
+            right_node = None if right is None else self.get_operand_node(right)
+            node = self.get_operation_node(operator, left_node, right_node)
+
+        self.assign(target, node)
+        return node
+
+    def get_table(self):
+        """
+        Returns the DAG as a table: a list of (node number, identifiers, left child, operator,
+        right child) rows, one for every interior node and every leaf whose initial value is
+        copied into an identifier
+        """
+        rows = []
+
+        for node in self.nodes:
+            if node.is_leaf() and not node.identifiers:
+                continue
+
+            identifiers = " ".join(node.identifiers)
+
+            if node.is_leaf():
+                rows.append((node.number, identifiers, node.get_label(), "", ""))
+            else:
+                right = "" if node.right is None else node.right.get_label()
+                rows.append((node.number, identifiers, node.left.get_label(), node.operator, right))
+
+        return rows
+
+
+def parse_constant(text):
+    return float(text) if "." in text else int(text)
+
+
+def format_constant(value):
+    """
+    Returns the text of a folded constant, or None if it can't be written as a constant of a
+    statement (eg. inf, nan or 1e+25), in which case the operation is left to run time
+    """
+    text = repr(value) if isinstance(value, float) else str(value)
+    return text if FOLDED_CONSTANT_PATTERN.fullmatch(text) else None
+
+
+def fold_constants(operator, left, right=None):
+    """
+    Returns the value of an operator applied to constants, or None where it is left to run
+    time: division by zero, inexact integer division and % of negative numbers (whose results
+    differ between languages)
+    """
+    if right is None:
+        return -left if operator == "-" else None
+
+    if operator == "+":
+        return left + right
+    if operator == "-":
+        return left - right
+    if operator == "*":
+        return left * right
+    if right == 0:
+        return None
+
+    both_integers = isinstance(left, int) and isinstance(right, int)
+
+    if operator == "/":
+        if both_integers:
+            return left // right if left % right == 0 else None
+        return left / right
+    if operator == "%" and both_integers and left >= 0 and right > 0:
+        return left % right
+
+    return None
+
+
+def tokenize(text):
+    """
+    Splits a three-address statement into tokens
+
+    :return: List of (kind, text) pairs, where kind is "constant", "identifier" or "operator"
+    """
+    tokens = []
+    pos = 0
+    text = text.rstrip()
+
+    while pos < len(text):
+        match = TOKEN_PATTERN.match(text, pos)
+
+        if match is None:
+            raise ValueError("Unexpected character {!r} in: {}".format(text[pos:].lstrip()[:1], text))
+
+        tokens.append((match.lastgroup, match.group(match.lastgroup)))
+        pos = match.end()
+
+    return tokens
+
+
+def parse_statement(statement):
+    """
+    Parses a three-address statement such as "A=B+C", "t2 = -t1", "x = 42" or "A=B" into
+    (target, operator, left, right); operator and right are None where there are none
+    """
+    match = STATEMENT_PATTERN.fullmatch(statement)
+
+    if match is None:
+        # tokenizing finds any character that can't start a token, for a better error message
+        tokenize(statement)
+        raise ValueError("Bad three-address statement: {}".format(statement.strip()))
+
+    target, unary_operator, unary_operand, left, operator, right = match.groups()
+
+    if unary_operator is not None:
+        return target, unary_operator, unary_operand, None
+
+    return target, operator, left, right
+
+
+def read_statements(lines):
+    """
+    Generates the three-address statements in an iterable of lines (eg. an open file),
+    skipping blank lines and comments
+
+    :return: Generator of (target, operator, left, right) tuples, as made by parse_statement
+    """
+    for line_number, line in enumerate(lines, 1):
+        line = line.split("#", 1)[0].strip()
+
+        if not line:
+            continue
+
+        try:
+            yield parse_statement(line)
+        except ValueError as error:
+            raise ValueError("Line {}: {}".format(line_number, error)) from None
+
+
+def get_dag(statements):
+    """
+    Builds the DAG of a basic block, one statement at a time
+
+    :param statements: Iterable of three-address statement strings or lines, eg. a list or an open file
+    """
+    dag = DAG()
+
+    for statement in read_statements(statements):
+        dag.add_statement(*statement)
+
+    return dag
+
+
+def get_optimized_dag(dag):
+    """
+    Returns a copy of a DAG with constants folded and identities simplified. Nodes are numbered
+    children first, so they are rebuilt in order, each from the already rebuilt children.
+    """
+    optimized = DAG(optimize=True)
+    new_nodes = []
+
+    for node in dag.nodes:
+        if node.is_leaf():
+            new_nodes.append(optimized.get_leaf(node.value))
+        else:
+            right = None if node.right is None else new_nodes[node.right.number]
+            new_nodes.append(optimized.get_operation_node(node.operator, new_nodes[node.left.number], right))
+
+    for identifier, node in dag.current.items():
+        optimized.assign(identifier, new_nodes[node.number])
+
+    return optimized
+
+
+def get_live_nodes(dag, live_out):
+    """
+    Returns the set of numbers of the nodes needed to work out the final values of the
+    live-out identifiers; every other node is dead
+
+    :param live_out: Iterable of identifiers whose values are used after the block
+    """
+    stack = [dag.current[identifier] for identifier in live_out if identifier in dag.current]
+    live = set()
+
+    while stack:
+        node = stack.pop()
+
+        if node.number in live:
+            continue
+
+        live.add(node.number)
+        for child in (node.left, node.right):
+            if child is not None:
+                stack.append(child)
+
+    return live
+
+
+def get_needs(dag):
+    """
+    Returns the Sethi-Ullman number of every node: how many registers evaluating it needs
+    if the bigger of it's two children is evaluated first (treating shared nodes as if they
+    were not shared)
+    """
+    needs = []
+
+    for node in dag.nodes:
+        if node.is_leaf():
+            needs.append(1)
+        elif node.right is None:
+            needs.append(needs[node.left.number])
+        else:
+            left, right = needs[node.left.number], needs[node.right.number]
+            needs.append(max(left, right) if left != right else left + 1)
+
+    return needs
+
+
+def get_copy_sequence(copies, get_temporary):
+    """
+    Orders copies that must all read the values identifiers held before any of them ran, so that
+    no identifier is overwritten before it is read. A cycle of copies (eg. a=b, b=a) is broken by
+    saving one of the values in a temporary first.
+
+    :param copies: Dict mapping each identifier written to the identifier it copies
+    :param get_temporary: Function returning an unused temporary name
+    :return: List of (target, source) copies, in order
+    """
+    copies = dict(copies)
+    reads = {}
+    for source in copies.values():
+        reads[source] = reads.get(source, 0) + 1
+
+    ready = [target for target in copies if reads.get(target, 0) == 0]
+    sequence = []
+
+    while copies:
+        if not ready:
+            # every identifier left is read by another copy, so they form cycles
+            target = next(iter(copies))
+            temporary = get_temporary()
+            sequence.append((temporary, target))
+
+            for other, source in copies.items():
+                if source == target:
+                    copies[other] = temporary
+
+            reads[temporary] = reads[target]
+            reads[target] = 0
+            ready.append(target)
+
+        target = ready.pop()
+        source = copies.pop(target)
+        sequence.append((target, source))
+        reads[source] -= 1
+
+        if reads[source] == 0 and source in copies:
+            ready.append(source)
+
+    return sequence
+
+
+def get_code(dag, live_out=None, temporary_prefix="t"):
+    """
+    Generates three-address code for a DAG, computing each live node once.
+
+    Nodes are list scheduled: of the nodes whose children have all been computed, the next one
+    emitted is the one that is the last to read the most values (which can then be dropped),
+    then the one with the higher Sethi-Ullman number, then the earliest in the block.
+    A node's value goes straight into one of it's live-out identifiers if that doesn't
+    overwrite an initial value still to be read; otherwise into a temporary, and temporaries
+    are reused once every node reading them has been emitted. Other live-out identifiers
+    holding the value are copied at the end of the block.
+
+    :param live_out: Identifiers whose values are used after the block (every identifier
+    assigned in the block by default)
+    :param temporary_prefix: Prefix of the temporaries made (t1, t2, ...); names already in the
+    block are skipped
+    :return: List of statement strings
+    """
+    live_out = set(dag.current if live_out is None else live_out)
+    live = get_live_nodes(dag, live_out)
+    needs = get_needs(dag)
+    used_names = {node.value for node in dag.nodes if node.is_leaf()} | set(dag.current)
+
+    # names holding the value of each node; leaves are read from their identifier or constant
+    names = {node.number: node.value for node in dag.nodes if node.is_leaf()}
+    # reads of each live node still to be emitted
+    uses = dict.fromkeys(live, 0)
+    # live nodes reading each live node, and how many interior children of each are still to be emitted
+    parents = {number: [] for number in live}
+    waiting = {}
+    # reads still to be emitted of the initial value of each identifier
+    leaf_reads = {}
+    final_copies = []
+
+    for number in live:
+        node = dag.nodes[number]
+        children = {child for child in (node.left, node.right) if child is not None}
+
+        for child in (node.left, node.right):
+            if child is not None:
+                uses[child.number] += 1
+
+        for child in children:
+            parents[child.number].append(node)
+
+        waiting[number] = sum(1 for child in children if not child.is_leaf())
+
+    for identifier in sorted(live_out & set(dag.current)):
+        node = dag.current[identifier]
+
+        if node.is_leaf() and node.value != identifier:
+            # the identifier is a copy of another's initial value, or of a constant
+            final_copies.append((identifier, node))
+            uses[node.number] += 1
+
+    for number, count in uses.items():
+        node = dag.nodes[number]
+        if node.is_leaf() and not node.is_constant():
+            leaf_reads[node.value] = count
+
+    code = []
+    free_temporaries = []
+    temporary_count = 0
+    # identifiers written as the target of a node, which are never reused as temporaries
+    node_targets = set()
+    # heap of (priority, node number) of the nodes that can be emitted
+    ready = []
+
+    def get_temporary():
+        nonlocal temporary_count
+
+        if free_temporaries:
+            return free_temporaries.pop()
+
+        temporary_count += 1
+        while "{}{}".format(temporary_prefix, temporary_count) in used_names:
+            temporary_count += 1
+
+        return "{}{}".format(temporary_prefix, temporary_count)
+
+    def get_priority(node):
+        # count the values this node is the last to read
+        dropped = 0
+
+        for child in {node.left, node.right}:
+            if child is not None and not child.is_constant():
+                reads = (node.left is child) + (node.right is child)
+                if uses[child.number] == reads:
+                    dropped += 1
+
+        return 1 - dropped, -needs[node.number], node.number
+
+    def emit(node):
+        operands = []
+
+        for child in (node.left, node.right):
+            if child is None:
                 continue
-            x = val[i]
-            x = x + " " + val[j]
-            val.remove(j)
-            val[i] = x
-
-for i in temp:
-    if len(i) == 3:
-        re.split('[+-]{1}', i)  
-        opr.append(i[1])
-        left.append(i[0])
-        right.append(i[2])
-        count += 1
-        continue
-
-    if len(i) == 2:
-        i.split("+")
-        opr.append(i[0])
-        left.append("-")
-        right.append(i[1])
-        count += 1
-        continue
-    if len(i) == 1:
-        x = val[count]
-        x = x + " " + i
-        for k in (0,len(val)-1):
-            if val[k] == i:
-                temp2 = k
-                val[temp2] = x
-        count += 1
-        continue
-                
-        
-
-print("VAl\tLeft\tOperator\tRight")
-for i in range(0,count):
-    print(f"{val[i]}\t{left[i]}\t{opr[i]}\t\t{right[i]}")
 
+            operands.append(names[child.number])
+            uses[child.number] -= 1
+
+            if child.is_leaf():
+                if not child.is_constant():
+                    leaf_reads[child.value] -= 1
+            elif uses[child.number] == 0 and names[child.number] not in node_targets:
+                free_temporaries.append(names[child.number])
+
+            if uses[child.number] <= 2:
+                # the last nodes reading the child may now come before others
+                for parent in parents[child.number]:
+                    if parent.number not in names and waiting[parent.number] == 0:
+                        heapq.heappush(ready, (get_priority(parent), parent.number))
+
+        targets = [identifier for identifier in node.identifiers if identifier in live_out]
+        target = next((identifier for identifier in targets if leaf_reads.get(identifier, 0) == 0), None)
+
+        if target is None:
+            target = get_temporary()
+        else:
+            node_targets.add(target)
+
+        names[node.number] = target
+
+        for identifier in targets:
+            if identifier != target:
+                final_copies.append((identifier, node))
+                uses[node.number] += 1
+
+        if len(operands) == 1:
+            code.append("{} = {}{}".format(target, node.operator, operands[0]))
+        else:
+            code.append("{} = {} {} {}".format(target, operands[0], node.operator, operands[1]))
+
+        for parent in parents[node.number]:
+            waiting[parent.number] -= 1
+            if waiting[parent.number] == 0:
+                heapq.heappush(ready, (get_priority(parent), parent.number))
+
+    for number in live:
+        node = dag.nodes[number]
+        if not node.is_leaf() and waiting[number] == 0:
+            ready.append((get_priority(node), number))
+
+    heapq.heapify(ready)
+
+    while ready:
+        priority, number = heapq.heappop(ready)
+
+        if number in names:
+            continue
+
+        node = dag.nodes[number]
+        current_priority = get_priority(node)
+
+        if current_priority != priority:
+            # other nodes have been emitted since this entry was pushed
+            heapq.heappush(ready, (current_priority, number))
+            continue
+
+        emit(node)
+
+    # copies of initial values go first, before any other copy overwrites the identifier they read
+    initial_copies = {identifier: node.value for identifier, node in final_copies
+                      if node.is_leaf() and not node.is_constant()}
+    for identifier, source in get_copy_sequence(initial_copies, get_temporary):
+        code.append("{} = {}".format(identifier, source))
+
+    for identifier, node in final_copies:
+        if identifier not in initial_copies:
+            code.append("{} = {}".format(identifier, names[node.number]))
+
+    return code
+
+
+def print_table(dag):
+    print("Node\tIdentifiers\tLeft\tOperator\tRight")
+    for number, identifiers, left, operator, right in dag.get_table():
+        print(f"{number}\t{identifiers}\t\t{left}\t{operator}\t\t{right}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Builds the DAG of a basic block of three-address statements")
+    parser.add_argument("file", nargs="?", help="file of statements, one per line, or - for stdin "
+                                                "(a small example block by default)")
+    parser.add_argument("--summary", action="store_true", help="only print the number of statements and nodes")
+    parser.add_argument("--optimize", action="store_true", help="fold constants and simplify identities")
+    parser.add_argument("--live-out", metavar="NAMES", help="comma separated identifiers used after the block "
+                                                           "(every identifier assigned by default)")
+    parser.add_argument("--code", action="store_true", help="print three-address code generated from the DAG "
+                                                          "instead of the table")
+    args = parser.parse_args()
+
+    try:
+        if args.file is None:
+            grammer = ["D=B*C", "E=A+B", "B=B*C", "A=E-D"]
+            dag = get_dag(grammer)
+        elif args.file == "-":
+            dag = get_dag(sys.stdin)
+        else:
+            with open(args.file) as file:
+                dag = get_dag(file)
+    except ValueError as error:
+        sys.exit(error)
+
+    if args.optimize:
+        dag = get_optimized_dag(dag)
+
+    live_out = None if args.live_out is None else [name.strip() for name in args.live_out.split(",")]
+
+    if args.summary:
+        print("{} identifiers, {} nodes".format(len(dag.current), len(dag.nodes)))
+    elif args.code:
+        for statement in get_code(dag, live_out):
+            print(statement)
+    else:
+        print_table(dag)
@@ -0,0 +1,228 @@
+import io
+import random
+import unittest
+import dag
+
+
+def run_block(statements, values):
+    """
+    Interprets a basic block of +, - and * statements
+
+    :param values: Dict of the initial value of each identifier
+    :return: Dict of the value of each identifier at the end of the block
+    """
+    values = dict(values)
+
+    def get_value(operand):
+        return values[operand] if operand.isidentifier() else dag.parse_constant(operand)
+
+    for target, operator, left, right in dag.read_statements(statements):
+        if operator is None:
+            values[target] = get_value(left)
+        elif right is None:
+            values[target] = -get_value(left)
+        elif operator == "+":
+            values[target] = get_value(left) + get_value(right)
+        elif operator == "-":
+            values[target] = get_value(left) - get_value(right)
+        else:
+            values[target] = get_value(left) * get_value(right)
+
+    return values
+
+
+class TestValueNumbering(unittest.TestCase):
+
+    def test_common_subexpressions(self):
+        print("Testing common subexpressions share a node, with commutative operands in either order")
+
+        block_dag = dag.get_dag(["A = B + C", "D = C + B", "E = B * C", "F = C * B", "G = B - C", "H = C - B"])
+
+        self.assertIs(block_dag.current["A"], block_dag.current["D"])
+        self.assertIs(block_dag.current["E"], block_dag.current["F"])
+        self.assertIsNot(block_dag.current["G"], block_dag.current["H"])
+        self.assertEqual(list(block_dag.current["A"].identifiers), ["A", "D"])
+        # leaves for B and C, and one node for each distinct value
+        self.assertEqual(len(block_dag.nodes), 6)
+
+    def test_reassignment(self):
+        print("Testing reassigning an identifier moves it to the new node")
+
+        block_dag = dag.get_dag(["A = B + C", "B = B * C", "D = B + C", "E = A"])
+        first, second = block_dag.current["A"], block_dag.current["D"]
+
+        # B + C after B is reassigned uses the new B, so is a different value
+        self.assertIsNot(first, second)
+        self.assertIs(second.right, block_dag.current["B"])
+        self.assertEqual(first.left.get_label(), "B0")
+        self.assertNotIn("B", first.left.identifiers)
+        # a copy is another identifier on the same node
+        self.assertEqual(list(first.identifiers), ["A", "E"])
+
+        self.assertEqual(block_dag.get_table(), [
+            (2, "A E", "B0", "+", "C0"),
+            (3, "B", "B0", "*", "C0"),
+            (4, "D", "C0", "+", "3"),
+        ])
+
+    def test_leaf_sharing(self):
+        print("Testing identifiers and constants get one leaf each, kept after reassignment")
+
+        block_dag = dag.get_dag(["A = B + 1", "C = B * 1", "B = 1", "D = B - 1"])
+        leaf = block_dag.get_leaf("B")
+
+        self.assertIs(block_dag.current["A"].left, leaf)
+        self.assertIs(block_dag.current["C"].left, leaf)
+        # B now holds the constant, so it's initial value keeps it's leaf
+        self.assertIs(block_dag.current["B"], block_dag.get_leaf("1"))
+        self.assertIs(block_dag.current["D"].left, block_dag.current["D"].right)
+        self.assertEqual(len(block_dag.nodes), 5)
+        self.assertEqual(leaf.get_label(), "B0")
+
+
+class TestReadStatements(unittest.TestCase):
+
+    def test_read_statements(self):
+        print("Testing reading statements from a generator of lines, skipping blank lines and comments")
+
+        lines = (line for line in ["t1=A+B", "", "   # a comment", "t2 = -t1  # negate", "x = 42\n", "A=t2"])
+
+        self.assertEqual(list(dag.read_statements(lines)), [
+            ("t1", "+", "A", "B"),
+            ("t2", "-", "t1", None),
+            ("x", None, "42", None),
+            ("A", None, "t2", None),
+        ])
+
+    def test_read_file(self):
+        print("Testing building a DAG from an open file")
+
+        block_dag = dag.get_dag(io.StringIO("A = B + C\n\n# copy\nD = C + B\n"))
+        self.assertIs(block_dag.current["A"], block_dag.current["D"])
+
+    def test_parse_errors(self):
+        print("Testing parse errors give the line number")
+
+        lines = ["A = B + C", "", "# just a comment", "D = B $ C"]
+        with self.assertRaisesRegex(ValueError, r"^Line 4: Unexpected character '\$'"):
+            dag.get_dag(lines)
+
+        with self.assertRaisesRegex(ValueError, "^Line 2: Bad three-address statement: A = B \\+"):
+            dag.get_dag(["X = 1", "A = B +  # missing operand"])
+
+        with self.assertRaisesRegex(ValueError, "^Line 1: "):
+            dag.get_dag(["1 = A"])
+
+        # statements before the bad line are read first, as the lines are streamed
+        statements = dag.read_statements(iter(["A = B", "# comment", "B = ?"]))
+        self.assertEqual(next(statements), ("A", None, "B", None))
+        with self.assertRaisesRegex(ValueError, r"^Line 3: Unexpected character '\?'"):
+            next(statements)
+
+
+class TestDAG(unittest.TestCase):
+
+    def test_fold_constants(self):
+        print("Testing constant folding")
+
+        self.assertEqual(dag.fold_constants("+", 2, 3), 5)
+        self.assertEqual(dag.fold_constants("-", 2, 3), -1)
+        self.assertEqual(dag.fold_constants("-", 4), -4)
+        self.assertEqual(dag.fold_constants("/", 6, 3), 2)
+        self.assertEqual(dag.fold_constants("/", 1.5, 2), 0.75)
+        self.assertEqual(dag.fold_constants("%", 7, 3), 1)
+
+        # left to run time
+        self.assertIsNone(dag.fold_constants("/", 7, 2))
+        self.assertIsNone(dag.fold_constants("/", 1, 0))
+        self.assertIsNone(dag.fold_constants("%", -7, 3))
+        self.assertIsNone(dag.fold_constants("%", 1.5, 1))
+
+    def test_format_constant(self):
+        print("Testing folded constants are only kept if they can be written as constants")
+
+        self.assertEqual(dag.format_constant(-3), "-3")
+        self.assertEqual(dag.format_constant(3.0), "3.0")
+        self.assertEqual(dag.format_constant(0.75), "0.75")
+        self.assertEqual(dag.format_constant(10 ** 30), "1" + "0" * 30)
+
+        for value in [1e25, 1e-08, float("inf"), float("-inf"), float("nan")]:
+            self.assertIsNone(dag.format_constant(value))
+
+    def test_optimize(self):
+        print("Testing folding and identities when optimizing")
+
+        block_dag = dag.get_optimized_dag(dag.get_dag([
+            "A = 2 * 3", "B = X * 1", "C = 0 + X", "D = X - X", "E = -X", "F = -E", "G = 1.5 * 2", "H = 7 / 2",
+        ]))
+
+        self.assertEqual(block_dag.current["A"].value, "6")
+        self.assertIs(block_dag.current["B"], block_dag.current["C"])
+        self.assertEqual(block_dag.current["B"].get_label(), "X0")
+        self.assertEqual(block_dag.current["D"].value, "0")
+        self.assertIs(block_dag.current["F"], block_dag.current["B"])
+        self.assertEqual(block_dag.current["G"].value, "3.0")
+        self.assertEqual(block_dag.current["H"].operator, "/")
+
+    def test_optimize_large_floats(self):
+        print("Testing floats that can't be written as constants are not folded")
+
+        statements = ["A = 100000000000000000000.0 * 100000.0", "B = A + 1", "C = 0.0001 * 0.0001", "D = C * 2"]
+        block_dag = dag.get_optimized_dag(dag.get_dag(statements))
+
+        self.assertEqual(block_dag.current["A"].operator, "*")
+        self.assertEqual(block_dag.current["C"].operator, "*")
+
+        code = dag.get_code(block_dag, ["B", "D"])
+        values = run_block(code, {})
+        self.assertEqual(values["B"], 1e25 + 1)
+        self.assertEqual(values["D"], 0.0001 * 0.0001 * 2)
+
+    def test_code_shares_subexpressions(self):
+        print("Testing generated code computes a common subexpression once")
+
+        statements = ["t1 = A + B", "t2 = B + A", "C = t1 * t2", "D = -C", "A = 4"]
+        code = dag.get_code(dag.get_dag(statements), ["C", "D", "A"])
+
+        self.assertEqual(sum(1 for statement in code if "+" in statement), 1)
+        self.assertLess(len(code), len(statements))
+
+        expected, result = run_block(statements, {"A": 2, "B": 3}), run_block(code, {"A": 2, "B": 3})
+        self.assertEqual([result[name] for name in "CDA"], [expected[name] for name in "CDA"])
+
+    def test_code_is_equivalent(self):
+        print("Testing generated code gives the same values as the block, for random blocks")
+
+        generator = random.Random(1)
+        identifiers = list("abcdefg")
+
+        def get_operand():
+            return str(generator.randrange(4)) if generator.random() < 0.3 else generator.choice(identifiers)
+
+        for trial in range(500):
+            statements = []
+
+            for i in range(generator.randrange(1, 25)):
+                target = generator.choice(identifiers)
+                kind = generator.random()
+
+                if kind < 0.15:
+                    statements.append("{} = {}".format(target, get_operand()))
+                elif kind < 0.25:
+                    statements.append("{} = -{}".format(target, get_operand()))
+                else:
+                    statements.append("{} = {} {} {}".format(target, get_operand(), generator.choice("+-*"),
+                                                             get_operand()))
+
+            live_out = generator.sample(identifiers, generator.randrange(len(identifiers) + 1))
+            block_dag = dag.get_dag(statements)
+
+            for code_dag in [block_dag, dag.get_optimized_dag(block_dag)]:
+                for code_live_out in [live_out, None]:
+                    code = dag.get_code(code_dag, code_live_out)
+                    checked = block_dag.current if code_live_out is None else code_live_out
+                    values = {identifier: generator.randrange(-5, 6) for identifier in identifiers}
+
+                    expected, result = run_block(statements, values), run_block(code, values)
+                    for identifier in checked:
+                        self.assertEqual(result[identifier], expected[identifier], (statements, code))
@@ -1,10 +1,88 @@
 #Program to Construct DFA using REGEX
 # str = "CAABBAAB"
+import argparse
+import importlib.util
+import os
+import random
+import sys
+import time
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# the regex NFA/DFA builder of Experiment no #4, used by TableDFA.from_regex
+REGEX_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "Experiment no #4")
+
+
+# modules of Experiment no #4 loaded by load_regex_module, by name
+regex_modules = {}
+
+
+def get_regex_module_spec(name):
+    """Returns the module spec of a module of Experiment no #4, or None if there is no such module"""
+    path = os.path.join(REGEX_DIRECTORY, name + ".py")
+    return importlib.util.spec_from_file_location(name, path) if os.path.isfile(path) else None
+
+
+class RegexModuleFinder:
+    """Import finder for the modules of Experiment no #4, only installed while one is loading"""
+
+    @staticmethod
+    def find_spec(name, path=None, target=None):
+        return get_regex_module_spec(name)
+
+
+def load_regex_module(name):
+    """
+    Loads a module of Experiment no #4 from it's path, without adding the directory to sys.path.
+
+    The modules it imports (dfa, nfa, ...) are loaded from the same directory while it runs, then
+    sys.modules is put back as it was, so modules of the same names elsewhere are not shadowed.
+    """
+    if name in regex_modules:
+        return regex_modules[name]
+
+    saved_modules = dict(sys.modules)
+    # modules already imported under the same names would be used instead of the ones beside it
+    for module_name in saved_modules:
+        if get_regex_module_spec(module_name) is not None:
+            del sys.modules[module_name]
+
+    sys.meta_path.insert(0, RegexModuleFinder)
+    try:
+        spec = get_regex_module_spec(name)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    finally:
+        sys.meta_path.remove(RegexModuleFinder)
+        for module_name in set(sys.modules) - set(saved_modules):
+            del sys.modules[module_name]
+        sys.modules.update(saved_modules)
+
+    regex_modules[name] = module
+    return module
+
+# the language C(A|B)+ as a declarative spec; the same language as the hand written DFA below
+# (which rejects "C" on it's own, since it needs N > 1)
+SPEC = {
+    "states": ["start", "after C", "after A or B"],
+    "alphabet": ["A", "B", "C"],
+    "start": "start",
+    "accept": ["after A or B"],
+    "transitions": {
+        "start": {"C": "after C"},
+        "after C": {"A": "after A or B", "B": "after A or B"},
+        "after A or B": {"A": "after A or B", "B": "after A or B"},
+    },
+}
+
+
 def DFA(str, N):
-    # If n <= 1, then prNo
+    # If n <= 1, then No
     if (N <= 1):
-        print("No")
-        return
+        return False
     # To count the matched characters
     count = 0
     # Check if the first character is C
@@ -21,16 +99,215 @@ def DFA(str, N):
                 break
     else:
         # If the first character
-        # is not C, pr-1
-        print("No")
-        return
+        # is not C, No
+        return False
     # If all characters matches
-    if (count == N):
-        print("Yes")
-    else:
-        print("No")
+    return count == N
+
+
+class TableDFA:
+    """
+    Class representing a DFA driven by a transition table, so any language can be matched by
+    the same loop instead of a hand written one for each.
+
+    Each state has a row mapping symbols to next states. A missing entry means the string
+    can't be accepted, so matching stops there.
+    """
+
+    def __init__(self, states, alphabet, transitions, start, accept):
+        """
+        :param states: List of state names
+        :param alphabet: List of input symbols (single characters)
+        :param transitions: Dict mapping each state to a dict of symbol -> next state;
+        missing transitions reject
+        :param start: Initial state
+        :param accept: Iterable of accepting states
+        """
+        self.states = list(states)
+        self.alphabet = list(alphabet)
+        number = {state: i for i, state in enumerate(self.states)}
+
+        for state, row in transitions.items():
+            for symbol, next_state in row.items():
+                if state not in number or next_state not in number:
+                    raise ValueError("Unknown state in transition {} -{}-> {}".format(state, symbol, next_state))
+                if symbol not in self.alphabet:
+                    raise ValueError("Symbol {!r} is not in the alphabet".format(symbol))
+
+        # rows[state number] maps a symbol to the next state number
+        self.rows = [{symbol: number[next_state] for symbol, next_state in transitions.get(state, {}).items()}
+                     for state in self.states]
+        self.start = number[start]
+        self.accepting = [state in set(accept) for state in self.states]
+        # DFA from Experiment no #4 looking up characters the rows don't hold, for a regex
+        # with character classes beyond Latin-1 (see from_regex); None otherwise
+        self.range_dfa = None
+
+        # for NumPy matching: next state for every (state, byte), with an extra dead state at the end
+        self.byte_table = None
+        if numpy is not None and all(len(symbol) == 1 and ord(symbol) < 256 for symbol in self.alphabet):
+            dead = len(self.states)
+            self.byte_table = numpy.full((dead + 1, 256), dead, dtype=numpy.int32)
+
+            for state, row in enumerate(self.rows):
+                for symbol, next_state in row.items():
+                    self.byte_table[state, ord(symbol)] = next_state
+
+    @classmethod
+    def from_spec(cls, spec):
+        """Creates a TableDFA from a dict like SPEC (eg. loaded from a JSON file)"""
+        return cls(spec["states"], spec["alphabet"], spec["transitions"], spec["start"], spec["accept"])
+
+    @classmethod
+    def from_regex(cls, regex):
+        """
+        Creates a TableDFA from a regex, built with nfa_utils from Experiment no #4
+        (eg. "C.[AB]+" for C(A|B)+). The rows hold every Latin-1 character of the alphabet.
+        If a character class goes beyond Latin-1 (eg. ~ or [^a]), other characters are looked
+        up in the regex's DFA, and there is no NumPy byte table.
+        """
+        dfa = load_regex_module("nfa_utils").get_regex_dfa(regex, minimize=True)
+
+        # every single character symbol, including the Latin-1 characters of the classes
+        columns = {symbol: column for symbol, column in dfa.symbol_columns.items()
+                   if isinstance(symbol, str) and len(symbol) == 1}
+        width = len(dfa.symbols)
+        states = list(range(dfa.num_states()))
+        transitions = {}
+
+        for state in states:
+            transitions[state] = {}
+            for symbol, column in columns.items():
+                next_state = dfa.table[state * width + column]
+                if next_state >= 0:
+                    transitions[state][symbol] = next_state
+
+        table_dfa = cls(states, sorted(columns), transitions, 0, dfa.accept_states)
+
+        if dfa.range_index is not None and max(dfa.range_index.ends) > 255:
+            table_dfa.range_dfa = dfa
+            table_dfa.byte_table = None
+
+        return table_dfa
+
+    def matches(self, string):
+        """Returns true if the DFA accepts the whole string"""
+        rows = self.rows
+        range_dfa = self.range_dfa
+        state = self.start
+
+        for symbol in string:
+            next_state = rows[state].get(symbol)
+
+            if next_state is None:
+                if range_dfa is None:
+                    return False
+
+                # the DFA numbers it's states the same way, with -1 for a missing transition
+                next_state = range_dfa.get_transition(state, symbol)
+                if next_state < 0:
+                    return False
+
+            state = next_state
+
+        return self.accepting[state]
+
+    def match_many(self, strings, lengths=None):
+        """
+        Matches every string of a list, or of a NumPy array of byte strings (dtype "S")
+
+        :param lengths: For a NumPy array, optional length of each string (see match_array)
+        :return: List of booleans, or a NumPy array of booleans for a NumPy array
+        """
+        if numpy is not None and isinstance(strings, numpy.ndarray):
+            return self.match_array(strings, lengths)
+
+        return [self.matches(string) for string in strings]
+
+    def match_array(self, strings, lengths=None):
+        """
+        Matches a NumPy array of byte strings (dtype "S") a column of bytes at a time, moving
+        every string on by one symbol per step, each byte standing for the Latin-1 character
+        with the same value. Each string stops at it's length, so zero bytes inside a string
+        are matched like any other byte.
+
+        :param lengths: Length of each string; by default numpy.char.str_len, which can't tell
+        zero bytes at the end of a string from NumPy's padding
+        :return: NumPy array of booleans
+        """
+        if self.byte_table is None:
+            raise ValueError("NumPy matching needs NumPy and an alphabet of Latin-1 characters")
+        if strings.dtype.kind != "S":
+            raise ValueError("Expected an array of byte strings, not {}".format(strings.dtype))
+
+        strings = numpy.ascontiguousarray(strings.ravel())
+        lengths = numpy.char.str_len(strings) if lengths is None else numpy.asarray(lengths).ravel()
+        # one row of bytes per string, padded with zero bytes to the longest one
+        symbols = strings.view(numpy.uint8).reshape(len(strings), strings.dtype.itemsize)
+        states = numpy.full(len(strings), self.start, dtype=numpy.int32)
+        accepting = numpy.array(self.accepting + [False])
+
+        for i in range(lengths.max(initial=0)):
+            column = symbols[:, i]
+            # the padding after the end of a shorter string leaves it's state as it is
+            states = numpy.where(i < lengths, self.byte_table[states, column], states)
+
+        return accepting[states]
+
+
+def time_call(function, repeat=5):
+    """Returns the best time taken (in seconds) out of several calls to function"""
+    best = None
+
+    for i in range(repeat):
+        start_time = time.perf_counter()
+        function()
+        taken = time.perf_counter() - start_time
+
+        if best is None or taken < best:
+            best = taken
+
+    return best
+
+
+def benchmark(num_strings=100000):
+    """Compares the hand written DFA with the table driven one on random strings over A, B and C"""
+    generator = random.Random(0)
+    strings = ["C" + "".join(generator.choice("AB" if generator.random() < 0.9 else "ABC")
+                             for i in range(generator.randrange(30)))
+               for j in range(num_strings)]
+    dfas = {"spec": TableDFA.from_spec(SPEC), "regex": TableDFA.from_regex("C.[AB]+")}
+
+    for name, dfa in dfas.items():
+        if dfa.match_many(strings) != [DFA(string, len(string)) for string in strings]:
+            raise AssertionError("The {} DFA disagrees with the hand written one".format(name))
+
+    results = {
+        "hand written": time_call(lambda: [DFA(string, len(string)) for string in strings]),
+        "table (spec)": time_call(lambda: dfas["spec"].match_many(strings)),
+        "table (regex)": time_call(lambda: dfas["regex"].match_many(strings)),
+    }
+
+    if numpy is not None:
+        array = numpy.array([string.encode() for string in strings])
+        results["table (NumPy array)"] = time_call(lambda: dfas["spec"].match_many(array))
+
+    print("Matching {} strings against C(A|B)+:".format(num_strings))
+    for name, taken in results.items():
+        print("    {}: {:.0f} strings/s".format(name, num_strings / taken))
+
+
 # Driver Code
 if __name__ == '__main__':
-    str = "ACCBBCCA"
-    N = len(str)
-    DFA(str, N)
+    parser = argparse.ArgumentParser(description="Matches strings against C(A|B)+ with a table driven DFA")
+    parser.add_argument("strings", nargs="*", default=["ACCBBCCA"], help="strings to match")
+    parser.add_argument("--regex", help="match against this regex (Experiment no #4 syntax) instead")
+    parser.add_argument("--benchmark", action="store_true", help="compare with the hand written DFA")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark()
+    else:
+        dfa = TableDFA.from_spec(SPEC) if args.regex is None else TableDFA.from_regex(args.regex)
+        for str, accepted in zip(args.strings, dfa.match_many(args.strings)):
+            print("Yes" if accepted else "No")
@@ -0,0 +1,102 @@
+import importlib.util
+import os
+import sys
+import types
+import unittest
+
+# the module's file name has spaces, so it is loaded from it's path
+spec = importlib.util.spec_from_file_location(
+    "dfa_with_regex", os.path.join(os.path.dirname(os.path.abspath(__file__)), "DFA WITH REGEX.py"))
+dfa_with_regex = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(dfa_with_regex)
+
+numpy = dfa_with_regex.numpy
+TableDFA = dfa_with_regex.TableDFA
+
+
+class TestTableDFA(unittest.TestCase):
+
+    strings = ["C", "CA", "CB", "CABBA", "", "A", "CC", "CAC", "ACCBBCCA", "CABX"]
+
+    def test_from_spec(self):
+        print("Testing table DFA from the spec matches the hand written DFA")
+
+        dfa = TableDFA.from_spec(dfa_with_regex.SPEC)
+
+        for string in self.strings:
+            self.assertEqual(dfa.matches(string), dfa_with_regex.DFA(string, len(string)), string)
+
+        self.assertEqual(dfa.match_many(self.strings), [dfa.matches(string) for string in self.strings])
+
+    def test_bad_spec(self):
+        print("Testing table DFA rejects transitions on unknown states and symbols")
+
+        with self.assertRaises(ValueError):
+            TableDFA(["s"], ["a"], {"s": {"a": "t"}}, "s", ["s"])
+        with self.assertRaises(ValueError):
+            TableDFA(["s"], ["a"], {"s": {"b": "s"}}, "s", ["s"])
+
+    def test_from_regex(self):
+        print("Testing table DFA from a regex")
+
+        dfa = TableDFA.from_regex("C.[AB]+")
+        self.assertIsNone(dfa.range_dfa)
+
+        for string in self.strings:
+            self.assertEqual(dfa.matches(string), dfa_with_regex.DFA(string, len(string)), string)
+
+    def test_from_regex_imports(self):
+        print("Testing table DFA from a regex leaves sys.path and other modules of the same names alone")
+
+        path = list(sys.path)
+        other_dfa = types.ModuleType("dfa")
+        saved_dfa = sys.modules.get("dfa")
+        sys.modules["dfa"] = other_dfa
+
+        try:
+            dfa = TableDFA.from_regex("C.[AB]+")
+            self.assertIs(sys.modules["dfa"], other_dfa)
+            self.assertNotIn("nfa_utils", sys.modules)
+        finally:
+            if saved_dfa is None:
+                del sys.modules["dfa"]
+            else:
+                sys.modules["dfa"] = saved_dfa
+
+        self.assertEqual(sys.path, path)
+        self.assertTrue(dfa.matches("CAB"))
+
+    def test_from_regex_wide_classes(self):
+        print("Testing table DFA from a regex with classes beyond Latin-1")
+
+        dfa = TableDFA.from_regex("C.~*.D")
+        self.assertIsNotNone(dfa.range_dfa)
+        self.assertIsNone(dfa.byte_table)
+        self.assertEqual(dfa.match_many(["CD", "CxyD", "C€D", "C€", "xD"]), [True, True, True, False, False])
+
+        dfa = TableDFA.from_regex("[^a]+")
+        self.assertEqual(dfa.match_many(["b", "Ā€", "ba", ""]), [True, True, False, False])
+
+    @unittest.skipIf(numpy is None, "NumPy is not installed")
+    def test_match_array(self):
+        print("Testing table DFA matching a NumPy array of byte strings")
+
+        for dfa in [TableDFA.from_spec(dfa_with_regex.SPEC), TableDFA.from_regex("C.[AB]+")]:
+            strings = numpy.array([string.encode() for string in self.strings])
+            self.assertEqual(list(dfa.match_many(strings)), [dfa.matches(string) for string in self.strings])
+
+    @unittest.skipIf(numpy is None, "NumPy is not installed")
+    def test_match_array_zero_bytes(self):
+        print("Testing table DFA matches zero bytes inside a NumPy byte string")
+
+        dfa = TableDFA.from_regex("a*.b")
+        strings = numpy.array([b"a\x00b", b"aab", b"b", b""])
+
+        self.assertEqual(list(dfa.match_many(strings)), [False, True, True, False])
+        self.assertFalse(dfa.matches("a\x00b"))
+
+        # NumPy drops zero bytes at the end, so they can only be matched with the lengths given
+        dfa = TableDFA.from_regex("a*.[\x00]")
+        strings = numpy.array([b"aa\x00", b"a\x00"])
+        self.assertEqual(list(dfa.match_many(strings)), [False, False])
+        self.assertEqual(list(dfa.match_many(strings, lengths=[3, 2])), [True, True])
@@ -0,0 +1,231 @@
+"""
+Versioned binary file format for compiled automata (DFA and CompactNFA), so they can be
+loaded at startup instead of being rebuilt from their regex.
+
+File layout (native byte order, every section starting on an 8 byte boundary):
+    header:         magic (4 bytes), format version (uint16), automaton kind (uint16),
+                    byte order flag (uint16), padding (uint16), number of sections (uint64)
+    section table:  (offset, length in bytes) of each section, as uint64 pairs
+    sections:       arrays of int64, or UTF-8 text
+
+The loader memory maps the file, and the transition tables are used straight from the
+mapping as memoryviews, so they are neither parsed nor copied. Only the (small) alphabet
+and accept state sets are read into Python objects, so loading takes time linear in the
+alphabet and accept states, not in the size of the tables (a CompactNFA also allocates
+one int per state, to mark states while it steps).
+
+Sections of a DFA file:
+    symbols text, symbol offsets, symbol classes, symbol columns, transition table, accept states,
+    accept patterns (state, number of pattern ids, pattern ids... for each state)
+The symbols are the whole alphabet, with the symbols labelling the columns first, in column order,
+and symbol columns holds the column of each (several symbols share a column in a compressed DFA).
+Sections of a CompactNFA file:
+    symbols text, symbol offsets, symbol classes, state ids, transition offsets, transition columns,
+    transition targets, accept states
+Symbol classes holds, for each symbol, -1 if it is a literal symbol, or else the number of
+ranges of it's character class followed by the first and last code point of each range
+(the text of a character class symbol is empty).
+"""
+
+import hashlib
+import mmap
+import os
+import struct
+import sys
+from array import array
+from char_class import CharClass
+from compact_nfa import CompactNFA
+from dfa import DFA
+import nfa_utils
+
+MAGIC = b"RXAF"
+FORMAT_VERSION = 4
+
+# kinds of automata that can be stored
+KIND_DFA = 1
+KIND_COMPACT_NFA = 2
+
+BYTE_ORDER_FLAG = 1 if sys.byteorder == "little" else 2
+
+HEADER = struct.Struct("=4sHHHHQ")
+SECTION_ENTRY = struct.Struct("=QQ")
+
+
+def get_symbol_sections(symbols):
+    """Returns the (text, offsets, classes) sections storing a list of symbols"""
+    encoded = []
+    classes = array("q")
+
+    for symbol in symbols:
+        if isinstance(symbol, CharClass):
+            encoded.append(b"")
+            classes.append(len(symbol.ranges))
+            for start, end in symbol.ranges:
+                classes.extend([start, end])
+        else:
+            encoded.append(symbol.encode("utf-8"))
+            classes.append(-1)
+
+    offsets = array("q", [0])
+
+    for symbol in encoded:
+        offsets.append(offsets[-1] + len(symbol))
+
+    return b"".join(encoded), offsets, classes
+
+
+def get_symbols(text, offsets, classes):
+    """Returns the list of symbols stored in (text, offsets, classes) sections"""
+    symbols = []
+    i = 0
+
+    for symbol_id in range(len(offsets) - 1):
+        num_ranges = classes[i]
+
+        if num_ranges == -1:
+            symbols.append(bytes(text[offsets[symbol_id]:offsets[symbol_id + 1]]).decode("utf-8"))
+            i += 1
+        else:
+            ranges = [(classes[i + 1 + 2 * j], classes[i + 2 + 2 * j]) for j in range(num_ranges)]
+            symbols.append(CharClass(ranges))
+            i += 1 + 2 * num_ranges
+
+    return symbols
+
+
+def save(automaton, path):
+    """
+    Writes a DFA or CompactNFA to a file. The file is written under a temporary name
+    and then renamed, so a reader never sees a partly written file.
+    """
+    if isinstance(automaton, DFA):
+        kind = KIND_DFA
+
+        # the column labels come first, followed by any other symbols sharing their columns
+        labels = set(automaton.symbols)
+        symbols = automaton.symbols + [symbol for symbol in automaton.symbol_index if symbol not in labels]
+        symbol_sections = get_symbol_sections(symbols)
+        symbol_columns = array("q", [automaton.symbol_index[symbol] for symbol in symbols])
+
+        accept_patterns = array("q")
+        for state, pattern_ids in sorted(automaton.accept_patterns.items()):
+            accept_patterns.extend([state, len(pattern_ids)] + sorted(pattern_ids))
+
+        sections = [*symbol_sections, symbol_columns, array("q", automaton.table),
+                    array("q", sorted(automaton.accept_states)), accept_patterns]
+    elif isinstance(automaton, CompactNFA):
+        kind = KIND_COMPACT_NFA
+        symbol_sections = get_symbol_sections(automaton.symbols)
+
+        sections = [*symbol_sections, array("q", automaton.state_ids), array("q", automaton.offsets),
+                    array("q", automaton.columns), array("q", automaton.targets),
+                    array("q", sorted(automaton.accept_states))]
+    else:
+        raise TypeError("Only DFA and CompactNFA objects can be saved, not {}".format(type(automaton).__name__))
+
+    data = [bytes(section) if isinstance(section, array) else section for section in sections]
+
+    # lay the sections out after the header and section table, 8 byte aligned
+    offset = HEADER.size + SECTION_ENTRY.size * len(data)
+    entries = []
+    for section in data:
+        offset += -offset % 8
+        entries.append((offset, len(section)))
+        offset += len(section)
+
+    temp_path = "{}.{}.tmp".format(path, os.getpid())
+
+    with open(temp_path, "wb") as file:
+        file.write(HEADER.pack(MAGIC, FORMAT_VERSION, kind, BYTE_ORDER_FLAG, 0, len(data)))
+
+        for entry in entries:
+            file.write(SECTION_ENTRY.pack(*entry))
+
+        for (section_offset, length), section in zip(entries, data):
+            file.write(b"\0" * (section_offset - file.tell()))
+            file.write(section)
+
+    os.replace(temp_path, path)
+
+
+def load(path):
+    """
+    Loads a DFA or CompactNFA saved with save. The file stays memory mapped for as long as
+    the automaton is in use, and its transition tables are read from the mapping in place.
+
+    :raises ValueError: If the file is not an automaton file, or was written by an
+    incompatible version or on a machine with a different byte order
+    """
+    with open(path, "rb") as file:
+        mapping = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    view = memoryview(mapping)
+
+    if len(view) < HEADER.size:
+        raise ValueError("{} is too short to be an automaton file".format(path))
+
+    magic, version, kind, byte_order_flag, padding, num_sections = HEADER.unpack_from(view)
+
+    if magic != MAGIC:
+        raise ValueError("{} is not an automaton file".format(path))
+    if version != FORMAT_VERSION:
+        raise ValueError("{} has format version {}, expected {}".format(path, version, FORMAT_VERSION))
+    if byte_order_flag != BYTE_ORDER_FLAG:
+        raise ValueError("{} was written on a machine with a different byte order".format(path))
+
+    sections = []
+    for i in range(num_sections):
+        offset, length = SECTION_ENTRY.unpack_from(view, HEADER.size + SECTION_ENTRY.size * i)
+        sections.append(view[offset:offset + length])
+
+    # every section but the symbols text holds int64 values
+    symbols = get_symbols(sections[0], sections[1].cast("q"), sections[2].cast("q"))
+    tables = [section.cast("q") for section in sections[3:]]
+
+    if kind == KIND_DFA:
+        symbol_columns, table, accept_states, packed_patterns = tables
+        symbol_index = dict(zip(symbols, symbol_columns))
+        width = len(set(symbol_columns))
+
+        accept_patterns = {}
+        i = 0
+        while i < len(packed_patterns):
+            state, count = packed_patterns[i], packed_patterns[i + 1]
+            accept_patterns[state] = frozenset(packed_patterns[i + 2:i + 2 + count])
+            i += 2 + count
+
+        return DFA(symbols[:width], table, set(accept_states), accept_patterns, symbol_index)
+    elif kind == KIND_COMPACT_NFA:
+        state_ids, offsets, columns, targets, accept_states = tables
+        return CompactNFA(state_ids, symbols, offsets, columns, targets, accept_states)
+
+    raise ValueError("{} holds an unknown kind of automaton ({})".format(path, kind))
+
+
+def get_cache_path(regex, cache_dir, use_dfa=True):
+    """Returns the path a compiled regex is cached at, named after a hash of the regex text"""
+    key = "{}\0{}\0{}".format(FORMAT_VERSION, "dfa" if use_dfa else "nfa", regex)
+    name = hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+    return os.path.join(cache_dir, name + ".rxa")
+
+
+def load_regex(regex, cache_dir, use_dfa=True):
+    """
+    Returns a compiled automaton for a regex, loading it from the cache directory if it has
+    been compiled before, and otherwise compiling it and saving it there for next time
+
+    :param use_dfa: If true, the regex is compiled to a DFA, otherwise to a CompactNFA
+    """
+    path = get_cache_path(regex, cache_dir, use_dfa)
+
+    if os.path.exists(path):
+        return load(path)
+
+    nfa = nfa_utils.get_regex_nfa(regex)
+    automaton = nfa_utils.get_dfa(nfa) if use_dfa else nfa_utils.get_compact_nfa(nfa)
+
+    os.makedirs(cache_dir, exist_ok=True)
+    save(automaton, path)
+
+    return automaton
@@ -0,0 +1,109 @@
+import collections
+import concurrent.futures
+import itertools
+import os
+import nfa_utils
+import prefilter
+import regex_parser
+
+# automaton (and prefilter) used by each worker process, set once when the worker starts
+worker_automaton = None
+worker_prefilter = None
+
+
+def init_worker(automaton, required=None):
+    """Process pool initializer; stores the automaton and prefilter sent to this worker"""
+    global worker_automaton, worker_prefilter
+    worker_automaton = automaton
+    worker_prefilter = required
+
+
+def match_chunk(strings, automaton=None, required=None):
+    """
+    Matches a list of strings against an automaton (the worker's automaton and prefilter by default)
+
+    :param required: Optional prefilter.Prefilter; strings it rejects are not run through the automaton
+    :return: List of booleans, true for each string that was accepted
+    """
+    if automaton is None:
+        automaton = worker_automaton
+        required = worker_prefilter
+
+    results = []
+
+    for string in strings:
+        if required is not None and not required.might_match(string):
+            results.append(False)
+            continue
+
+        automaton.reset()
+        automaton.feed_symbols(string, return_if_dies=True)
+        results.append(automaton.is_accepting())
+
+    return results
+
+
+def get_chunks(strings, chunk_size):
+    """Generates lists of up to chunk_size strings from an iterable, without reading it all in"""
+    strings = iter(strings)
+
+    while True:
+        chunk = list(itertools.islice(strings, chunk_size))
+
+        if len(chunk) == 0:
+            return
+
+        yield chunk
+
+
+def match_many(pattern, strings, workers=None, chunk_size=10000, use_dfa=True, use_prefilter=False):
+    """
+    Matches every string of an iterable against a regex, spreading the work over several processes.
+
+    The regex is compiled once, and the (picklable) compiled automaton is sent to each worker
+    process when it starts. Strings are then sent to the workers in chunks, with only a few
+    chunks in flight at a time, so the iterable can be much larger than memory.
+
+    :param pattern: Regex string
+    :param strings: Iterable of strings to match
+    :param workers: Number of worker processes (defaults to the number of CPUs).
+    With 1 worker, the strings are matched in this process.
+    :param chunk_size: Number of strings sent to a worker at once
+    :param use_dfa: If true, the workers match with a DFA, otherwise with a CompactNFA
+    (for patterns whose DFA would be too large)
+    :param use_prefilter: If true, strings missing the literals every match of the pattern contains
+    are rejected before they reach the automaton (see prefilter.py). This only pays off for patterns
+    whose leading part is ~*, as the automaton rejects most strings of an anchored pattern at their
+    first few symbols.
+    :return: Generator of booleans, one for each string in input order, true if the string was accepted
+    """
+    syntax_tree = regex_parser.parse(pattern)
+    nfa = nfa_utils.get_syntax_tree_nfa(syntax_tree)
+    automaton = nfa_utils.get_dfa(nfa) if use_dfa else nfa_utils.get_compact_nfa(nfa)
+
+    required = prefilter.get_prefilter(syntax_tree) if use_prefilter else None
+    if required is not None and not required.is_useful():
+        required = None
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    if workers == 1:
+        for chunk in get_chunks(strings, chunk_size):
+            yield from match_chunk(chunk, automaton, required)
+        return
+
+    with concurrent.futures.ProcessPoolExecutor(workers, initializer=init_worker,
+                                                initargs=(automaton, required)) as executor:
+        # results are collected in the order the chunks were sent, keeping the input order
+        pending = collections.deque()
+
+        for chunk in get_chunks(strings, chunk_size):
+            pending.append(executor.submit(match_chunk, chunk))
+
+            # keep every worker busy, without queuing up the whole input
+            if len(pending) >= workers * 2:
+                yield from pending.popleft().result()
+
+        while pending:
+            yield from pending.popleft().result()
@@ -0,0 +1,665 @@
+"""
+Benchmarks for the regex NFA.
+
+Run all of them with:
+    python benchmarks.py
+or just some of them by name, eg.
+    python benchmarks.py tracing construction
+
+Results are printed, and with --json they are also written to a file as JSON, eg.
+    python benchmarks.py --json results.json
+so runs from before and after a change can be compared.
+"""
+
+import argparse
+import concurrent.futures
+import contextlib
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+import automaton_file
+import batch
+import dfa_utils
+import lockstep
+import nfa_utils
+import pattern
+import prefilter
+import search
+import stream
+
+
+def time_call(function, repeat=5):
+    """Returns the best time taken (in seconds) out of several calls to function"""
+    best = None
+
+    for i in range(repeat):
+        start_time = time.perf_counter()
+        function()
+        taken = time.perf_counter() - start_time
+
+        if best is None or taken < best:
+            best = taken
+
+    return best
+
+
+def benchmark_tracing():
+    """Compares NFA construction time with build tracing switched off and on"""
+    regex = "|".join(["python", "java", "C#", "o+k then", "c?loud", "H?A?h?a?*!*"] * 20)
+    results = {}
+
+    results["trace off"] = time_call(lambda: nfa_utils.get_regex_nfa(regex))
+
+    # trace output is thrown away, so this only measures the cost of producing it
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        results["trace on"] = time_call(lambda: nfa_utils.get_regex_nfa(regex, trace=nfa_utils.print_trace))
+
+    print("Construction of a {} symbol regex:".format(len(regex)))
+    for name, taken in results.items():
+        print("    {}: {:.3f} ms".format(name, taken * 1000))
+
+    return results
+
+
+def benchmark_multi_pattern():
+    """
+    Compares matching lines against many patterns one NFA at a time, with
+    matching them against a single NFA (and DFA) built from all of the patterns
+    """
+    patterns = ["rule{}.a*.b+".format(i) for i in range(200)]
+    lines = ["rule{}{}b".format(i * 7 % 250, "a" * (i % 10)) for i in range(200)]
+    results = {}
+
+    separate_nfas = [nfa_utils.get_regex_nfa(pattern) for pattern in patterns]
+
+    def match_separately():
+        for line in lines:
+            for nfa in separate_nfas:
+                nfa.reset()
+                nfa.feed_symbols(line, return_if_dies=True)
+                nfa.is_accepting()
+
+    multi_nfa = nfa_utils.get_multi_regex_nfa(patterns)
+    multi_dfa = nfa_utils.get_dfa(multi_nfa)
+
+    def match_all(automaton):
+        for line in lines:
+            automaton.reset()
+            automaton.feed_symbols(line, return_if_dies=True)
+            automaton.get_matched_patterns()
+
+    results["separate NFAs"] = time_call(match_separately, repeat=3)
+    results["multi pattern NFA"] = time_call(lambda: match_all(multi_nfa), repeat=3)
+    results["multi pattern DFA"] = time_call(lambda: match_all(multi_dfa), repeat=3)
+
+    print("Matching {} lines against {} patterns:".format(len(lines), len(patterns)))
+    for name, taken in results.items():
+        print("    {}: {:.3f} ms".format(name, taken * 1000))
+
+    return results
+
+
+def benchmark_streaming(size=1 << 26):
+    """
+    Measures throughput of matching a large file in chunks with the DFA,
+    with both read() and mmap
+
+    :param size: Size of the generated input file, in bytes
+    """
+    dfa = nfa_utils.get_regex_dfa("ab+c")
+    results = {}
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "input.txt")
+
+        # the whole input matches, so every byte has to be fed through the DFA
+        with open(path, "w") as file:
+            block = "ab" * (1 << 15)
+            for i in range(size // len(block)):
+                file.write(block)
+            file.write("c")
+
+        for use_mmap in [False, True]:
+            taken = time_call(lambda: stream.match_file(dfa, path, use_mmap=use_mmap), repeat=1)
+            results["mmap" if use_mmap else "read"] = size / taken
+
+    print("Streaming a {} MiB file through a DFA:".format(size >> 20))
+    for name, throughput in results.items():
+        print("    {}: {:.1f} MiB/s".format(name, throughput / (1 << 20)))
+
+    return results
+
+
+def benchmark_batch(num_lines=200000):
+    """
+    Measures batch matching throughput over a line-delimited file,
+    with 1 worker process up to one per CPU
+
+    :param num_lines: Number of lines in the generated input file
+    """
+    pattern = "python|java|C#|o+k then|c?loud"
+    words = ["python", "java", "perl", "ok then", "oooook then", "cloud", "loud", "C++"]
+    results = {}
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "input.txt")
+
+        with open(path, "w") as file:
+            for i in range(num_lines):
+                file.write(words[i % len(words)] + "\n")
+
+        workers = 1
+        while True:
+            def match_lines():
+                with open(path) as file:
+                    lines = (line.rstrip("\n") for line in file)
+                    for accepted in batch.match_many(pattern, lines, workers=workers):
+                        pass
+
+            results["{} workers".format(workers)] = num_lines / time_call(match_lines, repeat=1)
+
+            if workers >= (os.cpu_count() or 1):
+                break
+            workers = min(workers * 2, os.cpu_count())
+
+    print("Batch matching {} lines:".format(num_lines))
+    for name, throughput in results.items():
+        print("    {}: {:.0f} lines/s".format(name, throughput))
+
+    return results
+
+
+def benchmark_lockstep(num_strings=100000):
+    """
+    Compares matching a batch of short strings one at a time with matching them all in lockstep
+
+    :param num_strings: Number of strings in the batch
+    """
+    if lockstep.numpy is None:
+        print("Lockstep matching: skipped, NumPy is not installed")
+        return {}
+
+    regex = "H?A?h?a?*!*|H?E?h?e?*!*"
+    words = ["Ha", "ha", "He", "he", "HaHa", "hehe"]
+    strings = [words[i % len(words)] * (1 + i % 7) + "!" * (i % 3) for i in range(num_strings)]
+
+    nfa = nfa_utils.get_regex_nfa(regex)
+    compact_nfa = nfa_utils.get_compact_nfa(nfa)
+    lockstep_nfa = lockstep.LockstepNFA(nfa)
+
+    def match_one_at_a_time(automaton):
+        for string in strings:
+            automaton.reset()
+            automaton.feed_symbols(string, return_if_dies=True)
+            automaton.is_accepting()
+
+    results = {
+        "nfa": num_strings / time_call(lambda: match_one_at_a_time(nfa), repeat=1),
+        "compact nfa": num_strings / time_call(lambda: match_one_at_a_time(compact_nfa), repeat=1),
+        "lockstep nfa": num_strings / time_call(lambda: lockstep_nfa.match(strings), repeat=3),
+    }
+
+    print("Lockstep matching {} strings:".format(num_strings))
+    for name, throughput in results.items():
+        print("    {}: {:.0f} strings/s ({:.1f}x the NFA)".format(name, throughput, throughput / results["nfa"]))
+
+    return results
+
+
+def benchmark_minimization():
+    """Reports DFA state counts before and after minimization, and the time minimization takes"""
+    regexes = ["python|java|C#", "H?A?h?a?*!*|H?E?h?e?*!*", "a*.a*.a*.b+",
+               "|".join("keyword{}".format(i) for i in range(500))]
+    results = {}
+
+    for regex in regexes:
+        dfa = nfa_utils.get_regex_dfa(regex)
+        taken = time_call(lambda: dfa_utils.get_minimized_dfa(dfa), repeat=1)
+        minimized_dfa = dfa_utils.get_minimized_dfa(dfa)
+
+        results[regex] = {
+            "states before": dfa.num_states(),
+            "states after": minimized_dfa.num_states(),
+            "seconds": taken,
+        }
+
+        name = regex if len(regex) < 40 else regex[:37] + "..."
+        print("{}: {} -> {} states in {:.3f} ms".format(name, dfa.num_states(),
+                                                        minimized_dfa.num_states(), taken * 1000))
+
+    return results
+
+
+def benchmark_symbol_classes(size=1 << 22):
+    """
+    Reports DFA table sizes with and without symbol classes, and compares feeding a string
+    through a compressed DFA with feeding the same bytes
+
+    :param size: Number of symbols fed in
+    """
+    regexes = ["python|java|C#", "H?A?h?a?*!*|H?E?h?e?*!*",
+               "|".join("keyword{}".format(i) for i in range(500))]
+    results = {}
+
+    for regex in regexes:
+        dfa = nfa_utils.get_regex_dfa(regex, minimize=True)
+        compressed_dfa = dfa_utils.get_compressed_dfa(dfa)
+
+        results[regex[:40]] = {
+            "symbols": len(dfa.symbols),
+            "classes": len(compressed_dfa.symbols),
+            "table entries": len(dfa.table),
+            "compressed table entries": len(compressed_dfa.table),
+        }
+
+    dfa = nfa_utils.get_regex_dfa("H?A?h?a?*!*|H?E?h?e?*!*", minimize=True, compress=True)
+    symbols = ("Haha" * (size // 4 + 1))[:size]
+    data = symbols.encode("latin-1")
+
+    def feed(method, symbol_input):
+        dfa.reset()
+        method(symbol_input)
+
+    results["feed_symbols"] = size / time_call(lambda: feed(dfa.feed_symbols, symbols), repeat=3)
+    results["feed_bytes"] = size / time_call(lambda: feed(dfa.feed_bytes, data), repeat=3)
+
+    print("Symbol classes:")
+    for regex in [regex[:40] for regex in regexes]:
+        result = results[regex]
+        print("    {}: {} symbols in {} classes, table {} -> {} entries"
+              .format(regex, result["symbols"], result["classes"], result["table entries"],
+                      result["compressed table entries"]))
+    print("    feed_symbols: {:.0f} symbols/s, feed_bytes: {:.0f} bytes/s"
+          .format(results["feed_symbols"], results["feed_bytes"]))
+
+    return results
+
+
+def benchmark_char_classes(num_strings=100000):
+    """
+    Compares a character class with the equivalent union of every character in it.
+    Without brackets a union cannot be repeated, so both match a single character.
+
+    :param num_strings: Number of (one character) strings matched
+    """
+    characters = "abcdefghijklmnopqrstuvwxyz0123456789"
+    regexes = {
+        "class": "[a-z0-9]",
+        "union": "|".join(characters),
+    }
+    strings = [(characters + "-_")[i % 38] for i in range(num_strings)]
+    results = {}
+
+    for name, regex in regexes.items():
+        nfa = nfa_utils.get_regex_nfa(regex)
+        dfa = nfa_utils.get_dfa(nfa)
+
+        def match(automaton):
+            for string in strings:
+                automaton.reset()
+                automaton.feed_symbols(string, return_if_dies=True)
+                automaton.is_accepting()
+
+        results[name] = {
+            "build seconds": time_call(lambda: nfa_utils.get_regex_nfa(regex)),
+            "nfa states": len(nfa.states),
+            "nfa transitions": sum(len(to_states) for to_states in nfa.transition_function.values()),
+            "dfa columns": len(dfa.symbols),
+            "nfa match seconds": time_call(lambda: match(nfa), repeat=3),
+            "dfa match seconds": time_call(lambda: match(dfa), repeat=3),
+        }
+
+    print("Character class against a 36 way union:")
+    for name, result in results.items():
+        print("    {}: built in {:.3f} ms, {} NFA states, {} transitions, {} DFA columns; "
+              "match NFA {:.3f} ms, DFA {:.3f} ms"
+              .format(name, result["build seconds"] * 1000, result["nfa states"], result["nfa transitions"],
+                      result["dfa columns"], result["nfa match seconds"] * 1000, result["dfa match seconds"] * 1000))
+
+    return results
+
+
+def benchmark_counted_repetition():
+    """Compares building and matching counted repetitions unrolled into states and with counters"""
+    results = {}
+
+    for count in [10, 100, 1000, 10000]:
+        regex = "x.[0-9]{{{}}}.y".format(count)
+        symbols = "x" + "7" * count + "y"
+        result = {}
+
+        for name, get_nfa in [("unrolled", nfa_utils.get_regex_nfa), ("counter", nfa_utils.get_counting_nfa)]:
+            nfa = get_nfa(regex)
+
+            def match():
+                nfa.reset()
+                nfa.feed_symbols(symbols)
+                nfa.is_accepting()
+
+            result[name] = {
+                "states": len(nfa.states),
+                "build seconds": time_call(lambda: get_nfa(regex), repeat=3),
+                "match seconds": time_call(match, repeat=3),
+            }
+
+        results[count] = result
+
+    print("Counted repetition x.[0-9]{n}.y:")
+    for count, result in results.items():
+        print("    n={}: {}".format(count, "; ".join(
+            "{} {} states, built in {:.3f} ms, matched in {:.3f} ms".format(
+                name, times["states"], times["build seconds"] * 1000, times["match seconds"] * 1000)
+            for name, times in result.items())))
+
+    return results
+
+
+def benchmark_file_cache():
+    """
+    Compares compiling a regex to a DFA or CompactNFA with loading it from the file cache
+    """
+    regex = "|".join("keyword{}.a*.b?".format(i) for i in range(500))
+    results = {}
+
+    with tempfile.TemporaryDirectory() as directory:
+        for use_dfa in [True, False]:
+            kind = "dfa" if use_dfa else "compact nfa"
+            compile_regex = (nfa_utils.get_regex_dfa if use_dfa else
+                             lambda regex: nfa_utils.get_compact_nfa(nfa_utils.get_regex_nfa(regex)))
+            results["compile " + kind] = time_call(lambda: compile_regex(regex), repeat=3)
+
+            # the first call fills the cache
+            automaton_file.load_regex(regex, directory, use_dfa)
+            results["load " + kind] = time_call(lambda: automaton_file.load_regex(regex, directory, use_dfa),
+                                                repeat=3)
+
+    print("Getting an automaton for a {} symbol regex:".format(len(regex)))
+    for name, taken in results.items():
+        print("    {}: {:.3f} ms".format(name, taken * 1000))
+
+    return results
+
+
+def benchmark_prefilter(num_lines=100000):
+    """
+    Compares searching log lines, batch matching them and matching them against an anchored
+    Pattern with and without the required-literal prefilter, when almost every line can't match.
+    Pattern.matches leaves the prefilter out for anchored regexes, so it should not be slower
+    than checking the prefilter first.
+
+    :param num_lines: Number of log lines in each run
+    """
+    regex = "ERROR.~*.timeout"
+    nfa = nfa_utils.get_regex_nfa(regex)
+    required = prefilter.get_regex_prefilter(regex)
+    # whole string matching rejects most lines at their first symbol, so the batch runs
+    # match lines that contain the literals anywhere, as grep would
+    grep_regex = "~*.ERROR.~*.timeout.~*"
+    # only 1 line in 50 has both literals
+    lines = ["INFO request {} served in {} ms".format(i, i % 97) if i % 50 else
+             "ERROR request {} failed with a timeout".format(i) for i in range(num_lines)]
+    compiled = pattern.Pattern(regex)
+    results = {}
+
+    def search_all(use_prefilter):
+        for line in lines:
+            search.search(nfa, line, prefilter=required if use_prefilter else None)
+
+    def match_all(use_prefilter):
+        for matched in batch.match_many(grep_regex, lines, workers=1, use_prefilter=use_prefilter):
+            pass
+
+    def anchored_match_all(use_prefilter):
+        for line in lines:
+            if not use_prefilter or required.might_match(line):
+                compiled.matches(line)
+
+    for name, function in [("search", search_all), ("batch", match_all), ("anchored matches", anchored_match_all)]:
+        results[name] = {
+            "without prefilter": num_lines / time_call(lambda: function(False), repeat=1),
+            "with prefilter": num_lines / time_call(lambda: function(True), repeat=3),
+        }
+
+    print("{} log lines against {} (98% can't match):".format(num_lines, regex))
+    for name, result in results.items():
+        print("    {}: {}".format(name, ", ".join("{} {:.0f} lines/s".format(key, throughput)
+                                                  for key, throughput in result.items())))
+
+    return results
+
+
+def benchmark_threads(num_strings=200000):
+    """
+    Measures throughput of matching strings against one shared Pattern from a thread pool.
+    On builds of Python with the GIL, threads can't speed up this CPU bound work;
+    on free-threaded builds they should scale with the number of cores.
+
+    :param num_strings: Number of strings matched in each run
+    """
+    compiled = pattern.Pattern("python|java|C#|o+k then|c?loud")
+    words = ["python", "java", "perl", "ok then", "oooook then", "cloud", "loud", "C++"]
+    strings = [words[i % len(words)] for i in range(num_strings)]
+    # sys._is_gil_enabled only exists on Python 3.13 and later
+    gil_enabled = sys._is_gil_enabled() if hasattr(sys, "_is_gil_enabled") else True
+    results = {}
+
+    def match_chunk(chunk):
+        matcher = compiled.matcher()
+        for string in chunk:
+            matcher.reset()
+            matcher.feed_symbols(string)
+            matcher.is_accepting()
+
+    for num_threads in sorted({1, 2, 4, os.cpu_count() or 1}):
+        chunk_size = -(-num_strings // num_threads)
+        chunks = [strings[i:i + chunk_size] for i in range(0, num_strings, chunk_size)]
+
+        def match_all():
+            with concurrent.futures.ThreadPoolExecutor(num_threads) as executor:
+                list(executor.map(match_chunk, chunks))
+
+        results["{} threads".format(num_threads)] = num_strings / time_call(match_all, repeat=3)
+
+    print("Matching {} strings from a thread pool (GIL {}):".format(num_strings,
+                                                                    "enabled" if gil_enabled else "disabled"))
+    for name, throughput in results.items():
+        print("    {}: {:.0f} strings/s".format(name, throughput))
+
+    results["gil enabled"] = gil_enabled
+    return results
+
+
+def benchmark_construction():
+    """Measures NFA and DFA construction time as regexes get longer and more deeply nested"""
+    results = {"literal": {}, "union": {}, "nesting": {}}
+
+    for length in [100, 1000, 10000]:
+        # a long literal string, and a union of many short alternatives
+        literal = "ab" * (length // 2)
+        union = "|".join("kw{}".format(i) for i in range(length // 5))
+
+        for name, regex in [("literal", literal), ("union", union)]:
+            results[name][length] = {
+                "nfa seconds": time_call(lambda: nfa_utils.get_regex_nfa(regex), repeat=3),
+                "dfa seconds": time_call(lambda: nfa_utils.get_regex_dfa(regex), repeat=1),
+            }
+
+    # without brackets, the deepest nesting the grammar allows is ? inside + inside *,
+    # so nesting is measured as a growing chain of nested segments
+    for depth in [10, 100, 1000]:
+        regex = "a?b+c*" * depth
+        results["nesting"][depth] = {
+            "nfa seconds": time_call(lambda: nfa_utils.get_regex_nfa(regex), repeat=3),
+            "dfa seconds": time_call(lambda: nfa_utils.get_regex_dfa(regex), repeat=1),
+        }
+
+    print("Construction time:")
+    for name, sizes in results.items():
+        for size, times in sizes.items():
+            print("    {} {}: NFA {:.3f} ms, DFA {:.3f} ms".format(name, size, times["nfa seconds"] * 1000,
+                                                                   times["dfa seconds"] * 1000))
+
+    return results
+
+
+def benchmark_matching():
+    """Measures matching throughput of each engine as the input gets longer"""
+    nfa = nfa_utils.get_regex_nfa("H?A?h?a?*!*|H?E?h?e?*!*")
+    engines = {
+        "nfa": nfa,
+        "compact nfa": nfa_utils.get_compact_nfa(nfa),
+        "dfa": nfa_utils.get_dfa(nfa),
+        "pattern": pattern.Pattern("H?A?h?a?*!*|H?E?h?e?*!*").matcher(),
+    }
+    results = {}
+
+    for name, automaton in engines.items():
+        results[name] = {}
+
+        for length in [10, 1000, 100000]:
+            # the input matches, so every symbol has to be fed in
+            symbols = ("Haha" * length)[:length]
+
+            def match():
+                automaton.reset()
+                automaton.feed_symbols(symbols, return_if_dies=True)
+                automaton.is_accepting()
+
+            results[name][length] = length / time_call(match, repeat=3)
+
+    print("Matching throughput:")
+    for name, lengths in results.items():
+        print("    {}: {}".format(name, ", ".join("{} symbols {:.0f}/s".format(length, throughput)
+                                                  for length, throughput in lengths.items())))
+
+    return results
+
+
+def benchmark_pathological():
+    """
+    Measures patterns which are slow for backtracking matchers or for DFA construction:
+    (a?)^n a^n matched against a^n
+    """
+    results = {}
+
+    for n in [5, 10, 20, 40]:
+        regex = "a?" * n + "a" * n
+        symbols = "a" * n
+
+        nfa = nfa_utils.get_regex_nfa(regex)
+        dfa = nfa_utils.get_dfa(nfa)
+
+        def match():
+            nfa.reset()
+            nfa.feed_symbols(symbols)
+            nfa.is_accepting()
+
+        results[n] = {
+            "nfa states": len(nfa.states),
+            "dfa states": dfa.num_states(),
+            "nfa match seconds": time_call(match, repeat=3),
+            "dfa build seconds": time_call(lambda: nfa_utils.get_dfa(nfa), repeat=1),
+        }
+
+    print("Pathological (a?)^n a^n:")
+    for n, result in results.items():
+        print("    n={}: NFA {} states, match {:.3f} ms; DFA {} states, built in {:.3f} ms"
+              .format(n, result["nfa states"], result["nfa match seconds"] * 1000,
+                      result["dfa states"], result["dfa build seconds"] * 1000))
+
+    return results
+
+
+def get_allocated_size(function):
+    """Returns the result of calling function, and the number of bytes it allocated that are still in use"""
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        result = function()
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+
+    return result, after - before
+
+
+def benchmark_memory():
+    """Measures memory used per state by each kind of automaton"""
+    regex = "|".join("keyword{}".format(i) for i in range(1000))
+    nfa = nfa_utils.get_regex_nfa(regex)
+    results = {}
+
+    built_nfa, size = get_allocated_size(lambda: nfa_utils.get_regex_nfa(regex))
+    results["nfa"] = {"states": len(built_nfa.states), "bytes": size}
+
+    compact_nfa, size = get_allocated_size(lambda: nfa_utils.get_compact_nfa(nfa))
+    results["compact nfa"] = {"states": len(compact_nfa.state_ids), "bytes": size}
+
+    dfa, size = get_allocated_size(lambda: nfa_utils.get_dfa(nfa))
+    results["dfa"] = {"states": dfa.num_states(), "bytes": size}
+
+    minimized_dfa, size = get_allocated_size(lambda: dfa_utils.get_minimized_dfa(dfa))
+    results["minimized dfa"] = {"states": minimized_dfa.num_states(), "bytes": size}
+
+    print("Memory for a 1000 keyword union:")
+    for name, result in results.items():
+        result["bytes per state"] = result["bytes"] / result["states"]
+        print("    {}: {} states, {:.0f} bytes per state".format(name, result["states"], result["bytes per state"]))
+
+    return results
+
+
+# every benchmark, by name
+BENCHMARKS = {
+    "construction": benchmark_construction,
+    "matching": benchmark_matching,
+    "pathological": benchmark_pathological,
+    "memory": benchmark_memory,
+    "tracing": benchmark_tracing,
+    "multi_pattern": benchmark_multi_pattern,
+    "streaming": benchmark_streaming,
+    "batch": benchmark_batch,
+    "lockstep": benchmark_lockstep,
+    "minimization": benchmark_minimization,
+    "symbol_classes": benchmark_symbol_classes,
+    "char_classes": benchmark_char_classes,
+    "counted_repetition": benchmark_counted_repetition,
+    "file_cache": benchmark_file_cache,
+    "threads": benchmark_threads,
+    "prefilter": benchmark_prefilter,
+}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Runs regex NFA benchmarks")
+    parser.add_argument("names", nargs="*", help="benchmarks to run (all of them by default): " + ", ".join(BENCHMARKS))
+    parser.add_argument("--json", metavar="PATH", help="also write the results to this file as JSON")
+    parser.add_argument("--size", type=int, metavar="BYTES",
+                        help="size of the input file of the streaming benchmark (64 MiB by default)")
+    args = parser.parse_args()
+
+    for name in args.names:
+        if name not in BENCHMARKS:
+            parser.error("unknown benchmark {!r}".format(name))
+
+    results = {
+        "python": sys.version,
+        "platform": platform.platform(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "benchmarks": {},
+    }
+
+    for name in args.names or list(BENCHMARKS):
+        if name == "streaming" and args.size is not None:
+            results["benchmarks"][name] = benchmark_streaming(args.size)
+        else:
+            results["benchmarks"][name] = BENCHMARKS[name]()
+        print()
+
+    if args.json is not None:
+        with open(args.json, "w") as file:
+            json.dump(results, file, indent=2)
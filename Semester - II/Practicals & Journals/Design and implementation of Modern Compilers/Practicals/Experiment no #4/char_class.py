@@ -0,0 +1,204 @@
+"""
+Character classes: sets of characters (eg. [a-z0-9], [^"] or the ~ wildcard) used as a single
+transition label, instead of one transition for every character in the set.
+
+A class is stored as sorted, non-overlapping ranges of code points, and membership is
+tested with a binary search over the range starts.
+
+Transition tables (DFA, CompactNFA) need every input character to fall in exactly one column,
+so get_columns splits the labels of an NFA into disjoint columns: one for each literal symbol,
+and one for each range of characters that every class treats the same way.
+"""
+
+import bisect
+
+MAX_CODE_POINT = 0x10FFFF
+
+
+def format_code_point(code_point):
+    """Returns how a code point is shown in a character class"""
+    symbol = chr(code_point)
+
+    if symbol.isprintable() and symbol not in "[]^-\\":
+        return symbol
+
+    return "\\u{{{:x}}}".format(code_point)
+
+
+class CharClass:
+    """Class representing an immutable set of characters, as sorted ranges of code points"""
+
+    __slots__ = ("ranges", "starts")
+
+    def __init__(self, ranges, negated=False):
+        """
+        :param ranges: Iterable of (first, last) code points, both included. They may overlap
+        and be in any order.
+        :param negated: If true, the class holds every character NOT in the ranges
+        """
+        merged = []
+
+        for start, end in sorted(ranges):
+            if merged and start <= merged[-1][1] + 1:
+                # overlaps or touches the previous range
+                merged[-1] = (merged[-1][0], max(end, merged[-1][1]))
+            else:
+                merged.append((start, end))
+
+        if negated:
+            # the gaps between the ranges, and either side of them
+            gaps = []
+            next_start = 0
+
+            for start, end in merged:
+                if start > next_start:
+                    gaps.append((next_start, start - 1))
+                next_start = end + 1
+
+            if next_start <= MAX_CODE_POINT:
+                gaps.append((next_start, MAX_CODE_POINT))
+
+            merged = gaps
+
+        self.ranges = tuple(merged)
+        self.starts = [start for start, end in merged]
+
+    def __contains__(self, symbol):
+        if not isinstance(symbol, str) or len(symbol) != 1:
+            return False
+
+        code_point = ord(symbol)
+        i = bisect.bisect_right(self.starts, code_point) - 1
+
+        return i >= 0 and code_point <= self.ranges[i][1]
+
+    def __eq__(self, other):
+        return isinstance(other, CharClass) and self.ranges == other.ranges
+
+    def __hash__(self):
+        return hash(self.ranges)
+
+    def __repr__(self):
+        if self.ranges == ((0, MAX_CODE_POINT),):
+            return "~"
+
+        parts = []
+        for start, end in self.ranges:
+            if start == end:
+                parts.append(format_code_point(start))
+            else:
+                parts.append("{}-{}".format(format_code_point(start), format_code_point(end)))
+
+        return "[{}]".format("".join(parts))
+
+
+# matches any single character
+WILDCARD = CharClass([(0, MAX_CODE_POINT)])
+
+
+def parse_class(text):
+    """
+    Returns the CharClass for the text between the brackets of a character class, eg. "a-z0-9"
+    or "^0-9". A leading ^ negates the class, and a - between two characters makes a range.
+    Any other character (including ] straight after the opening bracket, and - at either end)
+    stands for itself.
+    """
+    negated = text.startswith("^")
+    if negated:
+        text = text[1:]
+
+    ranges = []
+    i = 0
+
+    while i < len(text):
+        if i + 2 < len(text) and text[i + 1] == "-":
+            start, end = ord(text[i]), ord(text[i + 2])
+
+            if start > end:
+                raise ValueError("Bad character class range: {}-{}".format(text[i], text[i + 2]))
+
+            ranges.append((start, end))
+            i += 3
+        else:
+            ranges.append((ord(text[i]), ord(text[i])))
+            i += 1
+
+    return CharClass(ranges, negated)
+
+
+def get_columns(labels):
+    """
+    Splits the transition labels of an NFA (symbols and CharClasses) into the disjoint columns
+    of a transition table
+
+    :return: List of (column label, labels) pairs, where column label is a literal symbol or a
+    CharClass holding one range of characters, and labels lists every transition label that a
+    symbol in the column takes. Single character symbols are kept out of the class ranges,
+    so no character falls in two columns.
+    """
+    literals = sorted(label for label in labels if not isinstance(label, CharClass) and label != "")
+    classes = sorted({label for label in labels if isinstance(label, CharClass)}, key=lambda label: label.ranges)
+
+    columns = [(literal, [literal] + [label for label in classes if literal in label]) for literal in literals]
+
+    # split the classes into ranges at every class boundary and around every single character literal
+    literal_code_points = {ord(literal) for literal in literals if len(literal) == 1}
+    boundaries = set()
+
+    for label in classes:
+        for start, end in label.ranges:
+            boundaries.add(start)
+            boundaries.add(end + 1)
+
+    for code_point in literal_code_points:
+        boundaries.add(code_point)
+        boundaries.add(code_point + 1)
+
+    boundaries = sorted(boundaries)
+
+    for start, next_start in zip(boundaries, boundaries[1:]):
+        if start in literal_code_points and next_start == start + 1:
+            # the literal already has it's own column
+            continue
+
+        taken = [label for label in classes if chr(start) in label]
+
+        if taken:
+            columns.append((CharClass([(start, next_start - 1)]), taken))
+
+    return columns
+
+
+class RangeIndex:
+    """Maps characters to columns through sorted, non-overlapping ranges of code points"""
+
+    def __init__(self, symbol_index):
+        """:param symbol_index: Dict mapping column labels to columns; only the CharClass labels are used"""
+        entries = sorted((start, end, column)
+                         for label, column in symbol_index.items() if isinstance(label, CharClass)
+                         for start, end in label.ranges)
+
+        self.starts = [start for start, end, column in entries]
+        self.ends = [end for start, end, column in entries]
+        self.columns = [column for start, end, column in entries]
+
+    def get(self, symbol):
+        """Returns the column of a character, or None if no range holds it"""
+        if not isinstance(symbol, str) or len(symbol) != 1:
+            return None
+
+        code_point = ord(symbol)
+        i = bisect.bisect_right(self.starts, code_point) - 1
+
+        if i >= 0 and code_point <= self.ends[i]:
+            return self.columns[i]
+
+        return None
+
+
+def get_range_index(symbol_index):
+    """Returns a RangeIndex for the CharClass labels of a symbol index, or None if it has none"""
+    if any(isinstance(label, CharClass) for label in symbol_index):
+        return RangeIndex(symbol_index)
+
+    return None
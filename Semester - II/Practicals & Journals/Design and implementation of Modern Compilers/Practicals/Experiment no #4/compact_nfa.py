@@ -0,0 +1,299 @@
+from array import array
+import bisect
+import char_class
+from dfa import get_table
+from nfa import NFA
+
+
+# bitsets with more bits than this have their set bits found by searching their binary digits
+WIDE_BITSET = 256
+
+
+def get_bitset(states):
+    """Returns the bitset of an iterable of dense states"""
+    # set the bits in a byte array, so each state costs the same however large the bitset is
+    bits = bytearray()
+
+    for state in states:
+        byte = state >> 3
+        if byte >= len(bits):
+            bits.extend(bytes(byte + 1 - len(bits)))
+
+        bits[byte] |= 1 << (state & 7)
+
+    return int.from_bytes(bits, "little")
+
+
+class CompactNFA:
+    """
+    Class representing a frozen, compact form of an NFA.
+
+    States are numbered densely from 0, and symbols are interned to small ints, with
+    column 0 standing for the empty string. Transitions are stored sparsely, in compressed
+    sparse row form: the transitions of dense state s are entries offsets[s] to offsets[s + 1]
+    of the columns and targets arrays, sorted by column, so a state's empty string
+    transitions come first. Memory is linear in the number of states and transitions.
+
+    Sets of states are Python ints used as bitsets (bit i set means dense state i is in the set),
+    so feeding a symbol does not make any sets. The bitset of states reached from each
+    (state, column) pair, closures included, is worked out from the sparse arrays the first
+    time it is needed, and cached shifted down to it's lowest state, so it only takes space for
+    the states it spans. The cache is cleared when it gets too large, keeping memory bounded
+    however many pairs are used. The bitset of states with a transition on each column
+    is also worked out on first use, so a step only visits the current states that can take it.
+    """
+
+    def __init__(self, state_ids, symbols, offsets, columns, targets, accept_states, max_cache_size=1 << 16):
+        """
+        Creates a compact NFA from its transition arrays. Use nfa_utils.get_compact_nfa
+        to build one from an NFA.
+
+        Each of the arrays may be any iterable of ints, or a memoryview of 64 bit ints, which is used in place.
+
+        :param state_ids: Original NFA state of each dense state, in increasing order
+        :param symbols: Symbol of each column; symbols[0] must be the empty string. A column may also
+        be labelled by a char_class.CharClass, for every character in the class.
+        :param offsets: Start of each state's transitions in the columns and targets arrays,
+        plus a final end offset
+        :param columns: Column of every transition, one state after the other, each state's sorted
+        :param targets: Dense target state of every transition
+        :param accept_states: Iterable of accepting dense states
+        :param max_cache_size: Most entries and 64 bit words of bitsets held in the step cache
+        before it is cleared
+        """
+
+        self.state_ids = get_table(state_ids)
+        self.symbols = list(symbols)
+        self.symbol_index = {symbol: column for column, symbol in enumerate(self.symbols)}
+        self.range_index = char_class.get_range_index(self.symbol_index)
+        self.offsets = get_table(offsets)
+        self.columns = get_table(columns)
+        self.targets = get_table(targets)
+        self.accept_states = frozenset(accept_states)
+        # dense state of the NFA's initial state 0
+        self.start = bisect.bisect_left(self.state_ids, 0)
+
+        # the step each dense state was last reached in, so a state is only added once per step
+        self.marks = array("q", bytes(8 * len(self.state_ids)))
+        self.step = 0
+
+        # maps state * len(symbols) + column to the dense states reached, closures included, as
+        # (lowest state, bitset shifted down by the lowest state)
+        self.step_cache = {}
+        # number of entries, plus the 64 bit words of their bitsets, held in the step cache
+        self.cache_size = 0
+        self.max_cache_size = max_cache_size
+        # maps each column to the bitset of dense states with a transition on it
+        self.sources = {}
+
+        self.start_states = tuple(self.get_closure([self.start]))
+        self.start_bitset = get_bitset(self.start_states)
+        self.accept_bitset = get_bitset(self.accept_states)
+        # bitset of dense states that the NFA is currently in
+        self.in_states = self.start_bitset
+
+    def add_closure(self, states):
+        """
+        Extends a list of dense states, all marked with the current step, with every state
+        reachable from them through the empty string
+        """
+        offsets, columns, targets, marks = self.offsets, self.columns, self.targets, self.marks
+        step = self.step
+
+        # states appended to the list are visited by the same loop
+        for state in states:
+            for i in range(offsets[state], offsets[state + 1]):
+                if columns[i] != 0:
+                    # empty string transitions come first
+                    break
+
+                to_state = targets[i]
+                if marks[to_state] != step:
+                    marks[to_state] = step
+                    states.append(to_state)
+
+    def get_closure(self, states):
+        """Returns a list of the given dense states and every state reachable from them through the empty string"""
+        self.step += 1
+        closure = []
+
+        for state in states:
+            if self.marks[state] != self.step:
+                self.marks[state] = self.step
+                closure.append(state)
+
+        self.add_closure(closure)
+        return closure
+
+    def get_step(self, state, column):
+        """Returns a list of the dense states reached from one state on a column, including their closures"""
+        return self.get_closure([self.targets[i] for i in range(self.offsets[state], self.offsets[state + 1])
+                                 if self.columns[i] == column])
+
+    def cache_step(self, state, column):
+        """
+        Works out the dense states reached from one state on a column, and adds them to the step cache
+
+        :return: (lowest state, bitset of the states shifted down by the lowest state)
+        """
+        states = self.get_step(state, column)
+        lowest = min(states, default=0)
+        step = (lowest, get_bitset(to_state - lowest for to_state in states))
+        size = (step[1].bit_length() + 63) // 64 + 1
+
+        if self.cache_size + size > self.max_cache_size:
+            self.step_cache.clear()
+            self.cache_size = 0
+
+        self.step_cache[state * len(self.symbols) + column] = step
+        self.cache_size += size
+
+        return step
+
+    def get_sources(self, column):
+        """Returns the bitset of dense states with a transition on a column, and saves it in sources"""
+        offsets, columns = self.offsets, self.columns
+        sources = get_bitset(state for state in range(len(self.state_ids))
+                             if column in columns[offsets[state]:offsets[state + 1]])
+
+        self.sources[column] = sources
+        return sources
+
+    def feed_symbol(self, symbol):
+        """
+        Feeds a symbol into the NFA, calculating which states the
+        NFA is now in, based on which states it used to be in
+        """
+        self.feed_symbols((symbol,))
+
+    def feed_symbols(self, symbols, return_if_dies=False):
+        """
+        Feeds an iterable of symbols through the NFA
+
+        :param symbols: Iterable of symbols to feed through the NFA
+        :param return_if_dies: If true, ignore any further symbols after the NFA dies (for efficiency),
+        since a dead NFA will never accept, regardless of any further input.
+        """
+
+        # local variables keep the loop down to a few lookups per symbol and current state
+        symbol_index = self.symbol_index
+        range_index = self.range_index
+        all_sources = self.sources
+        step_cache = self.step_cache
+        width = len(self.symbols)
+        in_states = self.in_states
+
+        for symbol in symbols:
+            column = symbol_index.get(symbol)
+
+            if column is None and range_index is not None:
+                column = range_index.get(symbol)
+
+            if column is None:
+                # no state has a transition for a symbol outside the alphabet
+                in_states = 0
+            else:
+                sources = all_sources.get(column)
+                if sources is None:
+                    sources = self.get_sources(column)
+
+                # only states with a transition on this column can contribute new states
+                old_states = in_states & sources
+                in_states = 0
+
+                if old_states.bit_length() <= WIDE_BITSET:
+                    # visit each set bit of the old states, lowest first
+                    while old_states:
+                        lowest = old_states & -old_states
+                        state = lowest.bit_length() - 1
+                        step = step_cache.get(state * width + column)
+
+                        if step is None:
+                            step = self.cache_step(state, column)
+
+                        in_states |= step[1] << step[0]
+                        old_states ^= lowest
+                else:
+                    # for a wide bitset, find the set bits by searching it's binary digits (most
+                    # significant first) instead of rebuilding the whole bitset for every bit
+                    digits = format(old_states, "b")
+                    top = len(digits) - 1
+                    position = digits.find("1")
+
+                    while position >= 0:
+                        step = step_cache.get((top - position) * width + column)
+
+                        if step is None:
+                            step = self.cache_step(top - position, column)
+
+                        in_states |= step[1] << step[0]
+                        position = digits.find("1", position + 1)
+
+            if return_if_dies and in_states == 0:
+                break
+
+        self.in_states = in_states
+
+    def is_accepting(self):
+        return self.in_states & self.accept_bitset != 0
+
+    def is_dead(self):
+        """
+        Returns true if the NFA is not in ANY states.
+        A "dead" NFA can never be in any states again.
+        """
+        return self.in_states == 0
+
+    def reset(self):
+        """Resets the NFA by putting it back into the epsilon closure of it's initial state"""
+        self.in_states = self.start_bitset
+
+    def get_states(self, bitset):
+        """Returns the set of original NFA states in the given bitset of dense states"""
+        states = set()
+
+        while bitset:
+            lowest = bitset & -bitset
+            states.add(self.state_ids[lowest.bit_length() - 1])
+            bitset ^= lowest
+
+        return states
+
+    def to_nfa(self):
+        """
+        Converts this compact NFA back into an NFA, using the original state numbers.
+        The result compares equal to the NFA this was built from, unless it had character class
+        transitions, which come back split into disjoint ranges.
+        """
+        nfa = NFA()
+        nfa.states = set(self.state_ids)
+        nfa.accept_states = self.get_states(self.accept_bitset)
+        nfa.alphabet = set(self.symbols[1:])
+
+        for state in range(len(self.state_ids)):
+            from_state = self.state_ids[state]
+
+            for i in range(self.offsets[state], self.offsets[state + 1]):
+                pair = (from_state, self.symbols[self.columns[i]])
+                nfa.transition_function.setdefault(pair, set()).add(self.state_ids[self.targets[i]])
+
+        return nfa
+
+    def __str__(self):
+        """
+        String representation of this compact NFA.
+        Useful for debugging.
+        """
+        return "Compact NFA:\n" \
+               "Symbols: {}\n" \
+               "States: {}\n" \
+               "Transitions: {}\n" \
+               "Accept States: {}\n" \
+               "In states: {}\n" \
+               "Accepting: {}\n"\
+            .format(self.symbols,
+                    len(self.state_ids),
+                    len(self.targets),
+                    self.get_states(self.accept_bitset),
+                    self.get_states(self.in_states),
+                    "Yes" if self.is_accepting() else "No")
@@ -0,0 +1,109 @@
+from char_class import CharClass
+from nfa import NFA
+
+
+class CountingNFA(NFA):
+    """
+    Class representing an NFA with counters, for counted repetition of a single symbol or
+    character class (eg. [0-9]{1000}) without a state for every repetition.
+
+    A counter runs from an entry state to an exit state. Rather than keeping a state for each
+    count, the counts reached by every thread of matching inside the counter are kept as the bits
+    of an int (bit k set means some thread has matched k symbols since it entered), so feeding a
+    symbol moves every thread on at once with a single shift.
+
+    Counters are only understood by this class's own simulation; nfa_utils.get_dfa etc. need an
+    NFA built without them.
+    """
+
+    def __init__(self):
+        """Creates a blank counting NFA"""
+        super().__init__()
+
+        # list of (entry state, symbol or CharClass, minimum count, maximum count or None, exit state)
+        self.counters = []
+        # bitset of the counts currently reached in each counter
+        self.counts = []
+
+    def add_counter(self, entry, symbol, minimum, maximum, exit_state):
+        """
+        Adds a counter, which matches symbol between minimum and maximum times (at least minimum
+        times if maximum is None) on the way from the entry state to the exit state
+        """
+        self.counters.append((entry, symbol, minimum, maximum, exit_state))
+        self.counts.append(0)
+        self.alphabet.add(symbol)
+
+    def step_counts(self, symbol):
+        """Moves every counter on by one symbol"""
+        for i, (entry, counter_symbol, minimum, maximum, exit_state) in enumerate(self.counters):
+            counts = self.counts[i]
+
+            if counts == 0:
+                continue
+
+            if symbol == counter_symbol or (isinstance(counter_symbol, CharClass) and symbol in counter_symbol):
+                counts <<= 1
+
+                if maximum is None:
+                    # with no upper bound, every count past the minimum behaves the same,
+                    # so they are all kept as the minimum
+                    if counts >> (minimum + 1):
+                        counts = counts & ((1 << minimum) - 1) | (1 << minimum)
+                else:
+                    # threads that have gone past the maximum die
+                    counts &= (1 << (maximum + 1)) - 1
+            else:
+                counts = 0
+
+            self.counts[i] = counts
+
+    def update_counters(self):
+        """
+        Starts a thread in every counter whose entry state the NFA is in, and moves the NFA
+        into the exit state of every counter that has reached it's minimum count. Repeats until
+        nothing changes, since leaving one counter can lead straight into another.
+        """
+        closures = self.get_epsilon_closures()
+        changed = True
+
+        while changed:
+            changed = False
+
+            for i, (entry, symbol, minimum, maximum, exit_state) in enumerate(self.counters):
+                if entry in self.in_states and not self.counts[i] & 1:
+                    self.counts[i] |= 1
+                    changed = True
+
+                if self.counts[i] >> minimum and exit_state not in self.in_states:
+                    self.in_states = self.in_states | closures[exit_state]
+                    changed = True
+
+    def feed_symbol(self, symbol):
+        """
+        Feeds a symbol into the NFA, calculating which states the NFA is now in,
+        and how far each counter has counted
+        """
+        if self.is_dead():
+            return
+
+        super().feed_symbol(symbol)
+        self.step_counts(symbol)
+        self.update_counters()
+
+    def feed_empty(self):
+        super().feed_empty()
+        self.update_counters()
+
+    def is_dead(self):
+        """
+        Returns true if the NFA is not in ANY states, and no counter is counting.
+        A "dead" NFA can never be in any states again.
+        """
+        return len(self.in_states) == 0 and not any(self.counts)
+
+    def reset(self):
+        """Resets the NFA and all of it's counters"""
+        super().reset()
+        self.counts = [0] * len(self.counters)
+        self.update_counters()
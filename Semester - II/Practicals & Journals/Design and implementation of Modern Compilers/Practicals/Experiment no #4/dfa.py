@@ -0,0 +1,225 @@
+from array import array
+import char_class
+
+# table entry used for a missing transition; once a DFA is in this state it never leaves it
+DEAD_STATE = -1
+
+# entry of a byte class table for bytes outside the alphabet
+UNKNOWN_BYTE = 255
+
+
+def get_table(values):
+    """
+    Returns an array of signed 64 bit ints holding the given values.
+    Memoryviews (eg. of a memory mapped file) are used as they are, without copying.
+    """
+    if isinstance(values, memoryview):
+        return values
+
+    return array("q", values)
+
+
+class DFA:
+    """Class representing a deterministic finite automaton, stored as a flat transition table"""
+
+    def __init__(self, symbols, table, accept_states, accept_patterns=None, symbol_index=None):
+        """
+        Creates a DFA from a transition table. State 0 is the initial state.
+
+        :param symbols: List of input symbols, symbol i labels column i of the table. A column may
+        also be labelled by a char_class.CharClass, for every character in the class.
+        :param table: Flat table of next states, indexed by (state * len(symbols) + column).
+        DEAD_STATE marks a missing transition. A memoryview of 64 bit ints (eg. of a memory
+        mapped file) is used in place, anything else is copied into an array.
+        :param accept_states: Set of accepting states
+        :param accept_patterns: For DFAs built from several patterns, a dict mapping each
+        accepting state to the set of pattern ids it accepts
+        :param symbol_index: Dict mapping every input symbol to its column, for DFAs where several
+        symbols share a column (see dfa_utils.get_compressed_dfa). By default each symbol has its own column.
+        """
+
+        self.symbols = list(symbols)
+        # maps each input symbol to its column in the transition table
+        if symbol_index is None:
+            self.symbol_index = {symbol: column for column, symbol in enumerate(self.symbols)}
+        else:
+            self.symbol_index = dict(symbol_index)
+        self.alphabet = set(self.symbol_index)
+        # looks up characters of the CharClass labels, which are not in symbol_index themselves
+        self.range_index = char_class.get_range_index(self.symbol_index)
+        # symbol_index, plus the Latin-1 characters of the CharClass labels, so the most
+        # common characters never need the range index
+        self.symbol_columns = dict(self.symbol_index)
+        if self.range_index is not None:
+            for byte in range(256):
+                column = self.range_index.get(chr(byte))
+
+                if column is not None:
+                    self.symbol_columns.setdefault(chr(byte), column)
+
+        self.table = get_table(table)
+        self.accept_states = set(accept_states)
+        self.accept_patterns = accept_patterns or {}
+
+        # for feed_bytes, maps each byte to its column, or UNKNOWN_BYTE if it is not in the alphabet;
+        # None if there are too many columns
+        self.byte_classes = None
+        if len(self.symbols) < UNKNOWN_BYTE:
+            byte_classes = bytearray([UNKNOWN_BYTE] * 256)
+            for byte in range(256):
+                column = self.get_column(chr(byte))
+
+                if column is not None:
+                    byte_classes[byte] = column
+
+            self.byte_classes = bytes(byte_classes)
+
+        # state that the DFA is currently in
+        self.state = 0
+
+    def num_states(self):
+        """Returns the number of (live) states in the DFA"""
+        if len(self.symbols) == 0:
+            # a DFA with an empty alphabet only has its initial state
+            return 1
+
+        return len(self.table) // len(self.symbols)
+
+    def get_column(self, symbol):
+        """Returns the column of an input symbol, or None if it is not in the alphabet"""
+        column = self.symbol_columns.get(symbol)
+
+        if column is None and self.range_index is not None:
+            column = self.range_index.get(symbol)
+
+        return column
+
+    def get_transition(self, state, symbol):
+        """Returns the state reached from the given state on the given symbol"""
+        column = self.get_column(symbol)
+
+        if state == DEAD_STATE or column is None:
+            return DEAD_STATE
+
+        return self.table[state * len(self.symbols) + column]
+
+    def feed_symbol(self, symbol):
+        """Feeds a symbol into the DFA, moving it into the next state"""
+        self.state = self.get_transition(self.state, symbol)
+
+    def feed_symbols(self, symbols, return_if_dies=False):
+        """
+        Feeds an iterable of symbols through the DFA
+
+        :param symbols: Iterable of symbols to feed through the DFA
+        :param return_if_dies: Kept for compatibility with NFA.feed_symbols. The DFA always stops
+        once it dies, since the dead state can never be left again.
+        """
+
+        # local variables keep the loop down to one table lookup per symbol
+        state = self.state
+        symbol_columns = self.symbol_columns
+        range_index = self.range_index
+        table = self.table
+        width = len(self.symbols)
+
+        if state == DEAD_STATE:
+            return
+
+        for symbol in symbols:
+            column = symbol_columns.get(symbol)
+
+            if column is None and range_index is not None:
+                column = range_index.get(symbol)
+
+            if column is None:
+                # symbol is not in the alphabet; no transition can be taken
+                state = DEAD_STATE
+                break
+
+            state = table[state * width + column]
+
+            if state == DEAD_STATE:
+                break
+
+        self.state = state
+
+    def feed_bytes(self, data):
+        """
+        Feeds bytes through the DFA, each byte standing for the Latin-1 character with the same value.
+
+        When the alphabet allows it, every byte is first turned into its column with one
+        bytes.translate call, so the loop does no dict lookups.
+        """
+        if self.byte_classes is None:
+            self.feed_symbols(data.decode("latin-1"))
+            return
+
+        state = self.state
+        table = self.table
+        width = len(self.symbols)
+
+        if state == DEAD_STATE:
+            return
+
+        for column in data.translate(self.byte_classes):
+            if column == UNKNOWN_BYTE:
+                state = DEAD_STATE
+                break
+
+            state = table[state * width + column]
+
+            if state == DEAD_STATE:
+                break
+
+        self.state = state
+
+    def is_accepting(self):
+        return self.state in self.accept_states
+
+    def get_matched_patterns(self):
+        """
+        Returns the set of ids of the patterns that accept, for a DFA built
+        from several patterns (see nfa_utils.get_multi_regex_nfa)
+        """
+        return set(self.accept_patterns.get(self.state, ()))
+
+    def is_dead(self):
+        """
+        Returns true if the DFA is in the dead state.
+        A "dead" DFA can never accept again.
+        """
+        return self.state == DEAD_STATE
+
+    def reset(self):
+        """Resets the DFA by putting it back to it's initial state"""
+        self.state = 0
+
+    def __str__(self):
+        """
+        String representation of this DFA.
+        Useful for debugging.
+        """
+        transitions = {}
+        width = len(self.symbols)
+
+        for state in range(self.num_states()):
+            for symbol, column in self.symbol_index.items():
+                to_state = self.table[state * width + column]
+
+                if to_state != DEAD_STATE:
+                    transitions[(state, symbol)] = to_state
+
+        return "DFA:\n" \
+               "Alphabet: {}\n" \
+               "States: {}\n" \
+               "Transition Function: {}\n" \
+               "Accept States: {}\n" \
+               "In state: {}\n" \
+               "Accepting: {}\n"\
+            .format(self.alphabet,
+                    set(range(self.num_states())),
+                    transitions,
+                    self.accept_states,
+                    self.state,
+                    "Yes" if self.is_accepting() else "No")
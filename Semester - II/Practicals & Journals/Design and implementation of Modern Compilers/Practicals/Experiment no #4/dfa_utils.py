@@ -0,0 +1,154 @@
+from dfa import DFA, DEAD_STATE
+
+
+def get_minimized_dfa(dfa):
+    """
+    Returns the smallest DFA accepting the same strings as the given DFA,
+    using Hopcroft's partition refinement algorithm (O(n log n) for n states).
+
+    States that can never reach an accept state are merged into the dead state.
+    For multi-pattern DFAs, only states accepting the same set of patterns are merged.
+    """
+    num_states = dfa.num_states()
+    width = len(dfa.symbols)
+    # the dead state gets a real number during minimization, so it can be split from like any other
+    dead = num_states
+
+    def get_target(state, column):
+        if state == dead:
+            return dead
+
+        to_state = dfa.table[state * width + column]
+        return dead if to_state == DEAD_STATE else to_state
+
+    # for each column, the states with a transition into each state
+    sources = [[[] for to_state in range(num_states + 1)] for column in range(width)]
+    for state in range(num_states + 1):
+        for column in range(width):
+            sources[column][get_target(state, column)].append(state)
+
+    # start with the non-accepting states in one block, and the accepting states
+    # grouped by the patterns they accept
+    initial_blocks = {}
+    for state in range(num_states + 1):
+        if state in dfa.accept_states:
+            key = frozenset(dfa.accept_patterns.get(state, ()))
+        else:
+            key = None
+
+        initial_blocks.setdefault(key, set()).add(state)
+
+    blocks = list(initial_blocks.values())
+    block_of = [0] * (num_states + 1)
+    for block_id, block in enumerate(blocks):
+        for state in block:
+            block_of[state] = block_id
+
+    # blocks still to split the others by; leaving out the largest initial block is enough
+    largest = max(range(len(blocks)), key=lambda block_id: len(blocks[block_id]))
+    waiting = set(range(len(blocks))) - {largest}
+
+    while waiting:
+        # the splitter's states, as they are now; blocks are split in place below
+        splitter = list(blocks[waiting.pop()])
+
+        for column in range(width):
+            # states which move into the splitter block on this column, grouped by their block
+            movers = {}
+            for to_state in splitter:
+                for state in sources[column][to_state]:
+                    movers.setdefault(block_of[state], set()).add(state)
+
+            for block_id, moving in movers.items():
+                block = blocks[block_id]
+
+                if len(moving) == len(block):
+                    # the whole block moves into the splitter; nothing to split
+                    continue
+
+                # split the moving states off into a new block, leaving the rest in place, so a
+                # split costs time proportional to the moving states, not the whole block
+                block.difference_update(moving)
+                new_block_id = len(blocks)
+                blocks.append(moving)
+
+                for state in moving:
+                    block_of[state] = new_block_id
+
+                if block_id in waiting:
+                    waiting.add(new_block_id)
+                else:
+                    # only the smaller half needs to be a splitter
+                    waiting.add(new_block_id if len(moving) <= len(block) else block_id)
+
+    # number the new states in the order they are reached from the initial state
+    dead_block = block_of[dead]
+    start_block = block_of[0]
+
+    if start_block == dead_block:
+        # the DFA accepts nothing at all
+        return DFA(dfa.symbols, [DEAD_STATE] * width, set(), symbol_index=dfa.symbol_index)
+
+    new_states = {start_block: 0}
+    representatives = [0]
+    table = []
+
+    for representative in representatives:
+        for column in range(width):
+            to_block = block_of[get_target(representative, column)]
+
+            if to_block == dead_block:
+                table.append(DEAD_STATE)
+                continue
+
+            if to_block not in new_states:
+                new_states[to_block] = len(representatives)
+                representatives.append(next(iter(blocks[to_block])))
+
+            table.append(new_states[to_block])
+
+    accept_states = set()
+    accept_patterns = {}
+
+    for new_state, representative in enumerate(representatives):
+        if representative in dfa.accept_states:
+            accept_states.add(new_state)
+
+            if representative in dfa.accept_patterns:
+                accept_patterns[new_state] = dfa.accept_patterns[representative]
+
+    return DFA(dfa.symbols, table, accept_states, accept_patterns, dfa.symbol_index)
+
+
+def get_compressed_dfa(dfa):
+    """
+    Returns a DFA accepting the same strings as the given DFA, with one column per class of
+    symbols rather than one per symbol.
+
+    Symbols whose columns are the same in every state can never be told apart by the DFA,
+    so they are put in the same class and share one column. Patterns often treat many symbols
+    alike, so this can make the rows of the table much shorter.
+    """
+    num_states = dfa.num_states()
+    width = len(dfa.symbols)
+
+    # the class of each column, found by grouping columns with the same transitions
+    classes = {}
+    column_classes = []
+    for column in range(width):
+        transitions = tuple(dfa.table[state * width + column] for state in range(num_states))
+        column_classes.append(classes.setdefault(transitions, len(classes)))
+
+    # the first column of each class stands for the whole class
+    representatives = {}
+    for column, symbol_class in enumerate(column_classes):
+        representatives.setdefault(symbol_class, column)
+
+    table = [dfa.table[state * width + column]
+             for state in range(num_states)
+             for column in representatives.values()]
+
+    symbols = [dfa.symbols[column] for column in representatives.values()]
+    symbol_index = {symbol: column_classes[column] for symbol, column in dfa.symbol_index.items()}
+
+    return DFA(symbols, table, dfa.accept_states, dfa.accept_patterns, symbol_index)
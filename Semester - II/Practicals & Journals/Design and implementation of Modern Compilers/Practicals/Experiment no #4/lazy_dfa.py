@@ -0,0 +1,193 @@
+class LazyDFA:
+    """
+    Class representing a DFA which is built from an NFA on demand.
+
+    Each DFA state is the frozenset of NFA states the NFA could be in at once. Unlike
+    nfa_utils.get_dfa, states and transitions are only worked out when input first reaches
+    them, and are kept in a cache of bounded size, so patterns whose full DFA would be
+    exponentially large can still be matched.
+    """
+
+    def __init__(self, nfa, max_states=1000, min_symbols_per_state=10, max_transitions_per_state=256):
+        """
+        Creates a lazy DFA for the given NFA
+
+        :param nfa: NFA to simulate. It must not be changed while the lazy DFA is in use.
+        :param max_states: Maximum number of DFA states kept in the cache. The whole cache is
+        flushed when it is full. Must be at least 2.
+        :param min_symbols_per_state: If the cache fills up again after fewer than
+        (max_states * min_symbols_per_state) symbols, the cache is thrashing, and the lazy DFA
+        falls back to plain NFA simulation. Caching is tried again after the same number of
+        symbols have been simulated; the fallback carries on across resets, so it works for
+        many short inputs as well as one long one.
+        :param max_transitions_per_state: Maximum number of transitions cached for each DFA state.
+        Character classes (eg. ~) can take any symbol, so without a limit a state could cache
+        a transition for every distinct symbol of the input. Further symbols are worked out
+        each time they are fed in.
+        :raises ValueError: If max_states is less than 2
+        """
+        if max_states < 2:
+            raise ValueError("max_states must be at least 2, not {}".format(max_states))
+
+        self.nfa = nfa
+        self.max_states = max_states
+        self.min_symbols_per_state = min_symbols_per_state
+        self.max_transitions_per_state = max_transitions_per_state
+        self.closures = nfa.get_epsilon_closures()
+        self.class_transitions = nfa.get_class_transitions()
+        self.start = self.closures[0]
+
+        # maps each cached DFA state to a dict of its known transitions (symbol -> DFA state)
+        self.cache = {}
+        # set when the cache thrashes; no DFA states are cached while it is set
+        self.fallback = False
+        # set once the cache has been flushed, so the next time it fills up is a refill; the
+        # first fill (from empty) says nothing about thrashing
+        self.refilling = False
+        self.fallback_symbols = 0
+
+        # counters for sizing max_states
+        self.hits = 0
+        self.misses = 0
+        self.flushes = 0
+        self.symbols_since_flush = 0
+
+        # set of NFA states that the lazy DFA is currently in
+        self.in_states = self.start
+
+    def get_next_states(self, states, symbol):
+        """Returns the set of NFA states reached from the given states on the given symbol"""
+        to_states = set()
+
+        for state in states:
+            pair = (state, symbol)
+
+            if pair in self.nfa.transition_function:
+                for to_state in self.nfa.transition_function[pair]:
+                    to_states |= self.closures[to_state]
+
+            if state in self.class_transitions:
+                for char_class, class_to_states in self.class_transitions[state]:
+                    if symbol in char_class:
+                        for to_state in class_to_states:
+                            to_states |= self.closures[to_state]
+
+        return frozenset(to_states)
+
+    def flush(self):
+        """Empties the cache, falling back to NFA simulation if the cache is thrashing"""
+        if self.refilling and self.symbols_since_flush < self.max_states * self.min_symbols_per_state:
+            self.fallback = True
+            self.fallback_symbols = 0
+
+        self.cache = {}
+        self.flushes += 1
+        self.symbols_since_flush = 0
+        self.refilling = True
+
+    def stop_fallback(self):
+        """
+        Starts caching DFA states again. The cache was flushed when the fallback started, so
+        filling it up again soon is still thrashing.
+        """
+        self.fallback = False
+        self.symbols_since_flush = 0
+
+    def feed_symbol(self, symbol):
+        """Feeds a symbol into the lazy DFA, building the transition taken if it is not cached"""
+
+        # a dead DFA will not have any transitions after a symbol is fed in
+        if self.is_dead():
+            return
+
+        if self.fallback:
+            self.in_states = self.get_next_states(self.in_states, symbol)
+            self.fallback_symbols += 1
+
+            if self.fallback_symbols >= self.max_states * self.min_symbols_per_state:
+                self.stop_fallback()
+            return
+
+        self.symbols_since_flush += 1
+        transitions = self.cache.get(self.in_states)
+
+        if transitions is not None and symbol in transitions:
+            self.hits += 1
+            self.in_states = transitions[symbol]
+            return
+
+        self.misses += 1
+        to_states = self.get_next_states(self.in_states, symbol)
+
+        if transitions is None or to_states not in self.cache:
+            # a new DFA state is needed; make room for it first
+            if len(self.cache) + 2 > self.max_states:
+                self.flush()
+
+                if self.fallback:
+                    self.in_states = to_states
+                    return
+
+            transitions = self.cache.setdefault(self.in_states, {})
+            self.cache.setdefault(to_states, {})
+
+        if len(transitions) < self.max_transitions_per_state:
+            transitions[symbol] = to_states
+
+        self.in_states = to_states
+
+    def feed_symbols(self, symbols, return_if_dies=False):
+        """
+        Feeds an iterable into the lazy DFAs feed_symbol method
+
+        :param symbols: Iterable of symbols to feed through the lazy DFA
+        :param return_if_dies: If true, ignore any further symbols after the DFA dies (for efficiency),
+        since a dead DFA will never accept, regardless of any further input.
+        """
+
+        for symbol in symbols:
+            self.feed_symbol(symbol)
+
+            if return_if_dies and self.is_dead():
+                return
+
+    def is_accepting(self):
+        return len(self.in_states & self.nfa.accept_states) > 0
+
+    def is_dead(self):
+        """
+        Returns true if the lazy DFA is not in ANY NFA states.
+        A "dead" DFA can never be in any states again.
+        """
+        return len(self.in_states) == 0
+
+    def reset(self):
+        """
+        Resets the lazy DFA by putting it back to it's initial state. The cache is kept, and
+        so is any fallback to NFA simulation, until it has simulated enough symbols.
+        """
+        self.in_states = self.start
+
+    def cache_info(self):
+        """Returns a dict of cache statistics, useful for choosing max_states"""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "flushes": self.flushes,
+            "cached_states": len(self.cache),
+            "max_states": self.max_states,
+            "fallback": self.fallback,
+        }
+
+    def __str__(self):
+        """
+        String representation of this lazy DFA.
+        Useful for debugging.
+        """
+        return "Lazy DFA:\n" \
+               "Cache: {}\n" \
+               "In states: {}\n" \
+               "Accepting: {}\n"\
+            .format(self.cache_info(),
+                    set(self.in_states),
+                    "Yes" if self.is_accepting() else "No")
@@ -0,0 +1,211 @@
+"""
+Batched NFA simulation with NumPy: many strings are run through one NFA in lockstep.
+
+The active states of every string are kept together as an N x W matrix of uint64 words,
+where bit i of a row is set if that string's NFA is in dense state i. Each step feeds the
+next symbol of every string at once, with vectorized gathers from a table of the states each
+(state, symbol) pair leads to. The epsilon closures are already folded into that table
+(worked out once with CompactNFA), so no separate closure step is needed.
+
+Rather than one gather per state, the table is indexed by a whole byte of the state bitset at
+a time: for each group of 8 states, it holds the states reached from every one of the 256
+subsets of the group. A step then takes one gather per 8 states.
+
+Strings are sorted by length and matched in chunks, so the strings run together have similar
+lengths and little time is spent on padding.
+
+The table takes 256 * (symbols + 1) * (states / 64) words for every 8 states, so it grows with
+the square of the number of states (about 72 MB at 1000 states). Above a size limit, LockstepNFA
+matches one string at a time with a CompactNFA instead.
+
+NumPy is optional; LockstepNFA raises ImportError if it is not installed.
+"""
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from char_class import CharClass
+import nfa_utils
+
+
+# default limit on the size of the lockstep table, in bytes
+MAX_TABLE_BYTES = 1 << 25
+
+
+class LockstepNFA:
+    """
+    Class for matching many strings at once against one NFA.
+
+    The lockstep table is O(symbols * states^2) in size, so it is only built when it fits in
+    max_table_bytes. For larger NFAs, fallback is set and strings are matched one at a time
+    with a CompactNFA, which is much slower but only needs memory linear in the NFA.
+    """
+
+    def __init__(self, nfa, chunk_size=10000, max_table_bytes=MAX_TABLE_BYTES):
+        """
+        :param nfa: NFA to match with. Every symbol of it's alphabet must be a single character.
+        :param chunk_size: Number of strings run in lockstep at once
+        :param max_table_bytes: Largest lockstep table (in bytes) to build
+        """
+        if numpy is None:
+            raise ImportError("LockstepNFA needs NumPy, which is not installed")
+
+        compact_nfa = nfa_utils.get_compact_nfa(nfa)
+
+        for symbol in compact_nfa.symbols[1:]:
+            if not isinstance(symbol, CharClass) and len(symbol) != 1:
+                raise ValueError("LockstepNFA only supports single character symbols, not {!r}".format(symbol))
+
+        self.chunk_size = chunk_size
+        self.num_states = len(compact_nfa.state_ids)
+        self.num_words = (self.num_states + 63) // 64
+
+        width = len(compact_nfa.symbols)
+        # input columns: 0 for symbols outside the alphabet (column 0 of the compact NFA is the
+        # empty string, which never appears in input), 1 to width - 1 for the alphabet,
+        # and width for the padding after the end of a shorter string
+        self.pad_column = width
+
+        # ranges of code points of the alphabet (a single character is a range of one), sorted,
+        # and the column of each; the columns never overlap (see char_class.get_columns).
+        # The last entry is a sentinel above every real code point.
+        ranges = []
+        for column, symbol in enumerate(compact_nfa.symbols):
+            if isinstance(symbol, CharClass):
+                ranges.extend((start, end, column) for start, end in symbol.ranges)
+            elif column > 0:
+                ranges.append((ord(symbol), ord(symbol), column))
+
+        ranges.sort()
+        ranges.append((0xFFFFFFFF, 0xFFFFFFFF, 0))
+        self.range_starts = numpy.array([start for start, end, column in ranges], dtype=numpy.uint32)
+        self.range_ends = numpy.array([end for start, end, column in ranges], dtype=numpy.uint32)
+        self.range_columns = numpy.array([column for start, end, column in ranges], dtype=numpy.intp)
+
+        self.num_columns = width + 1
+
+        # 256 subsets of each group of 8 states, by every column, of num_words uint64 words
+        self.table_bytes = (self.num_states + 7) // 8 * 256 * self.num_columns * self.num_words * 8
+        self.fallback = self.table_bytes > max_table_bytes
+
+        if self.fallback:
+            self.compact_nfa = compact_nfa
+            self.byte_steps = None
+            return
+
+        # steps[state][column] is the bitset of states reached from state on that column
+        steps = numpy.zeros((self.num_states, self.num_columns, self.num_words), dtype=numpy.uint64)
+        for state in range(self.num_states):
+            for column in range(1, width):
+                steps[state, column] = self.get_words(compact_nfa.get_step(state, column))
+
+            # padding leaves the state unchanged
+            steps[state, self.pad_column] = self.get_words([state])
+
+        # byte_steps[group][subset * num_columns + column] is the bitset of states reached on that
+        # column from the subset (a byte) of the states 8 * group to 8 * group + 7
+        self.byte_steps = []
+        for group in range((self.num_states + 7) // 8):
+            byte_step = numpy.zeros((256, self.num_columns, self.num_words), dtype=numpy.uint64)
+
+            for subset in range(1, 256):
+                # the subset's lowest state, joined with the rest of the subset (already worked out)
+                lowest = (subset & -subset).bit_length() - 1
+                state = group * 8 + lowest
+
+                byte_step[subset] = byte_step[subset & (subset - 1)]
+                if state < self.num_states:
+                    byte_step[subset] |= steps[state]
+
+            self.byte_steps.append(byte_step.reshape(256 * self.num_columns, self.num_words))
+
+        self.start = self.get_words(compact_nfa.start_states)
+        self.accept_states = self.get_words(compact_nfa.accept_states)
+
+    def get_words(self, states):
+        """Returns a bitset of dense states as an array of uint64 words"""
+        words = numpy.zeros(self.num_words, dtype=numpy.uint64)
+
+        for state in states:
+            words[state >> 6] |= numpy.uint64(1) << numpy.uint64(state & 63)
+
+        return words
+
+    def get_symbol_columns(self, strings):
+        """Returns an array of the input column of every symbol of every string, one string after the other"""
+        # decode all the strings at once, and look each code point up in the alphabet
+        code_points = numpy.frombuffer("".join(strings).encode("utf-32-le"), dtype=numpy.uint32)
+        # the last range starting at or before each code point
+        indexes = numpy.maximum(numpy.searchsorted(self.range_starts, code_points, side="right") - 1, 0)
+        found = (self.range_starts[indexes] <= code_points) & (code_points <= self.range_ends[indexes])
+
+        return numpy.where(found, self.range_columns[indexes], 0)
+
+    def match_chunk(self, symbol_columns, starts, lengths):
+        """
+        Runs a chunk of strings through the NFA in lockstep
+
+        :param symbol_columns: Input columns of the symbols of every string (see get_symbol_columns)
+        :param starts: Start of each string of the chunk in symbol_columns
+        :param lengths: Length of each string of the chunk
+        :return: Boolean array, true for each string that the NFA accepts
+        """
+        num_strings = len(lengths)
+
+        # lay the strings out as rows of a matrix, padded to the longest one
+        columns = numpy.full((num_strings, lengths.max(initial=0)), self.pad_column, dtype=numpy.intp)
+        rows = numpy.repeat(numpy.arange(num_strings), lengths)
+        positions = numpy.arange(len(rows)) - numpy.repeat(numpy.cumsum(lengths) - lengths, lengths)
+        columns[rows, positions] = symbol_columns[numpy.repeat(starts, lengths) + positions]
+
+        in_states = numpy.tile(self.start, (num_strings, 1))
+
+        for step in range(columns.shape[1]):
+            step_columns = columns[:, step]
+            new_states = numpy.zeros_like(in_states)
+
+            for group, byte_step in enumerate(self.byte_steps):
+                subsets = (in_states[:, group >> 3] >> (8 * (group & 7))) & 0xFF
+                new_states |= byte_step[subsets.astype(numpy.intp) * self.num_columns + step_columns]
+
+            in_states = new_states
+
+            if not in_states.any():
+                # every string's NFA is dead
+                break
+
+        return (in_states & self.accept_states).any(axis=1)
+
+    def match_one(self, string):
+        """Matches one string with the CompactNFA, for an NFA too large for the lockstep table"""
+        self.compact_nfa.reset()
+        self.compact_nfa.feed_symbols(string, return_if_dies=True)
+        return self.compact_nfa.is_accepting()
+
+    def match(self, strings):
+        """
+        Matches every string of a list against the NFA
+
+        :return: Boolean NumPy array, true for each string that the NFA accepts
+        """
+        strings = list(strings)
+
+        if self.fallback:
+            return numpy.fromiter(map(self.match_one, strings), dtype=bool, count=len(strings))
+
+        symbol_columns = self.get_symbol_columns(strings)
+        lengths = numpy.fromiter(map(len, strings), dtype=numpy.intp, count=len(strings))
+        starts = numpy.cumsum(lengths) - lengths
+
+        results = numpy.zeros(len(strings), dtype=bool)
+
+        # run strings of similar length together
+        order = numpy.argsort(lengths, kind="stable")
+
+        for start in range(0, len(strings), self.chunk_size):
+            indexes = order[start:start + self.chunk_size]
+            results[indexes] = self.match_chunk(symbol_columns, starts[indexes], lengths[indexes])
+
+        return results
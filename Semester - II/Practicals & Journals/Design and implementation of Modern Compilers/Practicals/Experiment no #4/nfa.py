@@ -1,3 +1,6 @@
+from char_class import CharClass
+
+
 class NFA:
     """Class representing a non-deterministic finite automaton"""
 
@@ -9,22 +12,90 @@ class NFA:
         self.states = {0}
         self.transition_function = {}
         self.accept_states = set()
+        # for NFAs built from several patterns at once, maps each accept state
+        # to the set of pattern ids it accepts
+        self.accept_patterns = {}
 
         # set of states that the NFA is currently in
         self.in_states = {0}
 
+        # maps each state to its epsilon closure; built on first use, and
+        # set back to None whenever the states or transitions change
+        self.epsilon_closures = None
+        # maps each state with character class transitions to a list of (CharClass, to_states);
+        # built on first use, and set back to None whenever the transitions change
+        self.class_transitions = None
+
     def add_state(self, state, accepts=False):
         self.states.add(state)
+        self.epsilon_closures = None
 
         if accepts:
             self.accept_states.add(state)
 
     def add_transition(self, from_state, symbol, to_states):
         self.transition_function[(from_state, symbol)] = to_states
+        self.epsilon_closures = None
+        self.class_transitions = None
 
         if symbol != "":
             self.alphabet.add(symbol)
 
+    def get_epsilon_closures(self):
+        """
+        Returns a dict mapping every state to its epsilon closure
+        (the frozenset of states reachable from it using only empty string transitions).
+
+        The closures are only worked out once, and reused until the NFA is changed.
+        """
+        if self.epsilon_closures is not None:
+            return self.epsilon_closures
+
+        # include states that are only mentioned as transition targets
+        all_states = set(self.states)
+        for to_states in self.transition_function.values():
+            all_states |= to_states
+
+        closures = {}
+
+        for state in all_states:
+            closure = {state}
+            # states whose empty string transitions still need following
+            unproc_states = [state]
+
+            while unproc_states:
+                pair = (unproc_states.pop(), "")
+
+                if pair in self.transition_function:
+                    for to_state in self.transition_function[pair]:
+                        if to_state not in closure:
+                            closure.add(to_state)
+                            unproc_states.append(to_state)
+
+            closures[state] = frozenset(closure)
+
+        self.epsilon_closures = closures
+        return closures
+
+    def get_class_transitions(self):
+        """
+        Returns a dict mapping each state with transitions labelled by a character class
+        (see char_class.CharClass) to a list of (CharClass, to_states) pairs.
+
+        Like the epsilon closures, this is only worked out once, and reused until the NFA is changed.
+        """
+        if self.class_transitions is not None:
+            return self.class_transitions
+
+        class_transitions = {}
+
+        for (state, symbol), to_states in self.transition_function.items():
+            if isinstance(symbol, CharClass):
+                class_transitions.setdefault(state, []).append((symbol, to_states))
+
+        self.class_transitions = class_transitions
+        return class_transitions
+
     def feed_symbol(self, symbol):
         """
         Feeds a symbol into the NFA, calculating which states the
@@ -35,6 +106,8 @@ class NFA:
         if self.is_dead():
             return
 
+        closures = self.get_epsilon_closures()
+        class_transitions = self.get_class_transitions()
         new_states = set()
 
         # process each old state in turn
@@ -44,14 +117,20 @@ class NFA:
             # check for a legal transition from the old state to a
             # new state, based on what symbol was fed in
             if pair in self.transition_function:
-                # add the corresponding new state to the updated states list
-                new_states |= self.transition_function[pair]
+                # add the corresponding new states, and every state they reach
+                # through the empty string, to the updated states list
+                for to_state in self.transition_function[pair]:
+                    new_states |= closures[to_state]
+
+            # and the same for any character classes holding the symbol
+            if state in class_transitions:
+                for char_class, to_states in class_transitions[state]:
+                    if symbol in char_class:
+                        for to_state in to_states:
+                            new_states |= closures[to_state]
 
         self.in_states = new_states
 
-        # feed the empty string through the nfa
-        self.feed_empty()
-
     def feed_symbols(self, symbols, return_if_dies=False):
         """
         Feeds an iterable into the NFAs feed_symbol method
@@ -70,46 +149,40 @@ class NFA:
 
     def feed_empty(self):
         """
-        Continuously feeds empty strings into the NFA until they fail
-        to cause any further state transitions
+        Feeds the empty string into the NFA, moving it into every state
+        reachable from its current states through empty string transitions
         """
 
         # a dead NFA will not have any empty string transitions
         if self.is_dead():
             return
 
-        old_states_len = None
-        # set of states that will be fed the empty string on the next pass
-        unproc_states = self.in_states
-        first_run = True
-
-        # keep feeding the empty string until no more new states are transitioned into
-        while first_run or len(self.in_states) > old_states_len:
-            old_states_len = len(self.in_states)
-            # set of new states transitioned into after the empty string was fed
-            new_states = set()
-
-            # process each state in turn
-            for state in unproc_states:
-                pair = (state, "")
+        closures = self.get_epsilon_closures()
+        new_states = set()
 
-                # check if this state has a transition using the empty string
-                # to another state
-                if pair in self.transition_function:
-                    # add the new state to a set to be added to self.in_states later
-                    new_states |= self.transition_function[pair]
+        for state in self.in_states:
+            new_states |= closures[state]
 
-            # merge new states back into "in" states
-            self.in_states |= new_states
-            # all new states discovered will be fed the empty string on the next pass
-            unproc_states = new_states
-            first_run = False
+        self.in_states = new_states
 
     def is_accepting(self):
         # accepts if we are in ANY accept states
         # ie. if in_states and accept_states share any states in common
         return len(self.in_states & self.accept_states) > 0
 
+    def get_matched_patterns(self):
+        """
+        Returns the set of ids of the patterns that accept, for an NFA built
+        from several patterns (see nfa_utils.get_multi_regex_nfa)
+        """
+        matched = set()
+
+        for state in self.in_states & self.accept_states:
+            if state in self.accept_patterns:
+                matched |= self.accept_patterns[state]
+
+        return matched
+
     def is_dead(self):
         """
         Returns true if the NFA is not in ANY states.
@@ -122,8 +195,7 @@ class NFA:
         Resets the NFA by putting it back to it's initial state,
         and feeding the empty string through it
         """
-        self.in_states = {0}
-        self.feed_empty()
+        self.in_states = set(self.get_epsilon_closures()[0])
 
     def __str__(self):
         """
@@ -1,5 +1,10 @@
 from nfa import NFA
-import copy
+from dfa import DFA, DEAD_STATE
+from compact_nfa import CompactNFA
+from counting_nfa import CountingNFA
+import char_class
+import dfa_utils
+import regex_parser
 
 
 def get_single_symbol_regex(symbol):
@@ -44,6 +49,8 @@ def shift(nfa, inc):
         new_transition_function[new_key] = new_to_set
 
     nfa.transition_function = new_transition_function
+    nfa.epsilon_closures = None
+    nfa.class_transitions = None
 
 
 def merge(a, b):
@@ -52,6 +59,19 @@ def merge(a, b):
     a.states |= b.states
     a.transition_function.update(b.transition_function)
     a.alphabet |= b.alphabet
+    a.epsilon_closures = None
+    a.class_transitions = None
+
+
+def copy_nfa(nfa):
+    """Returns a copy of an NFA's states and transitions (its current states are not copied)"""
+    nfa_copy = NFA()
+    nfa_copy.alphabet = set(nfa.alphabet)
+    nfa_copy.states = set(nfa.states)
+    nfa_copy.accept_states = set(nfa.accept_states)
+    nfa_copy.transition_function = {pair: set(to_states) for pair, to_states in nfa.transition_function.items()}
+
+    return nfa_copy
 
 
 def get_concat(a, b):
@@ -136,7 +156,7 @@ def get_one_or_more_of_nfa(nfa):
 
     # must make a copy of the nfa,
     # these functions operate on the nfa passed in, they do not make a copy
-    return get_concat(copy.deepcopy(nfa), get_kleene_star_nfa(nfa))
+    return get_concat(copy_nfa(nfa), get_kleene_star_nfa(nfa))
 
 def get_zero_or_one_of_nfa(nfa):
     """
@@ -148,99 +168,333 @@ def get_zero_or_one_of_nfa(nfa):
 
     return get_union(get_single_symbol_regex(""), nfa)
 
-def get_regex_nfa(regex, indent=""):
-    """Recursively builds an NFA based on the given regex string"""
-
-    print("{0}Building NFA for regex:\n{0}({1})".format(indent, regex))
-    indent += " " * 4
-
-    # special symbols: +*.| (in order of precedence highest to lowest, symbols coming before that
-
-    # union operator
-    bar_pos = regex.find("|")
-    if bar_pos != -1:
-        # there is a bar in the string; union both sides
-        # (uses the leftmost bar if there are more than 1)
-        return get_union(
-            get_regex_nfa(regex[:bar_pos], indent),
-            get_regex_nfa(regex[bar_pos + 1:], indent)
-        )
-
-    # concatenation operator
-    dot_pos = regex.find(".")
-    if dot_pos != -1:
-        # there is a dot in the string; concatenate both sides
-        # (uses the leftmost dot if there are more than 1)
-        return get_concat(
-            get_regex_nfa(regex[:dot_pos], indent),
-            get_regex_nfa(regex[dot_pos + 1:], indent)
-        )
-
-    # kleene star operator
-    star_pos = regex.find("*")
-    if star_pos != -1:
-        # there is an asterisk in the string; wrap everything before it in a kleene star expression
-        # (uses the leftmost dot if there are more than 1)
-        star_part = regex[:star_pos]
-        trailing_part = regex[star_pos + 1:]
-        kleene_nfa = get_kleene_star_nfa(get_regex_nfa(star_part, indent))
-
-        if len(trailing_part) > 0:
-            return get_concat(
-                kleene_nfa,
-                get_regex_nfa(trailing_part, indent)
-            )
-        else:
-            return kleene_nfa
-
-    # "one or more of" operator ('+' symbol)
-    plus_pos = regex.find("+")
-    if plus_pos != -1:
-        # there is a plus in the string; wrap everything before it in the "one or more of" expression
-        # (uses the leftmost plus if there are more than 1)
-
-        plus_part = regex[:plus_pos]
-        trailing_part = regex[plus_pos + 1:]
-        plus_nfa = get_one_or_more_of_nfa(get_regex_nfa(plus_part, indent))
-
-        if len(trailing_part) > 0:
-            return get_concat(
-                plus_nfa,
-                get_regex_nfa(trailing_part, indent)
-            )
-        else:
-            return plus_nfa
-
-    # "zero or one of" operator ('?' symbol)
-    qmark_pos = regex.find("?")
-    if qmark_pos != -1:
-        # there is a question mark in the string; wrap everything before it in the "zero or one of" expression
-        # (uses the leftmost question mark if there are more than 1)
-
-        leading_part = regex[:qmark_pos]
-        trailing_part = regex[qmark_pos + 1:]
-        zero_or_one_of_nfa = get_zero_or_one_of_nfa(get_regex_nfa(leading_part, indent))
-
-        if len(trailing_part) > 0:
-            return get_concat(
-                zero_or_one_of_nfa,
-                get_regex_nfa(trailing_part, indent)
-            )
+def print_trace(node, depth):
+    """
+    Build trace callback that prints each syntax tree node as its NFA is built,
+    indented by its depth in the tree
+    """
+    indent = " " * 4 * depth
+
+    if node[0] == regex_parser.SYMBOL:
+        print("{}Building NFA for symbol: {}".format(indent, node[1]))
+    elif node[0] == regex_parser.CLASS:
+        print("{}Building NFA for character class: {}".format(indent, node[1]))
+    else:
+        print("{}Building NFA for {}".format(indent, node[0]))
+
+
+class NFABuilder:
+    """
+    Builds an NFA for a syntax tree in place, using Thompson's construction.
+
+    States are handed out by a single counter, and each node's part of the NFA (its fragment)
+    is added straight onto the NFA being built, so nothing is ever shifted or copied.
+    Every fragment runs from a given start state to an end state, and keeps to these rules:
+        - no transitions lead back into its start state
+        - no transitions leave its end state
+        - its end state is the highest numbered state so far (or its start state,
+          if the fragment only matches the empty string and needs no states of its own)
+    The last rule keeps NFAs made by the builder compatible with get_concat, get_union, etc.
+
+    Counted repetition is built by building the repeated node's fragment once for each copy,
+    straight from the syntax tree, so each copy costs time in proportion to it's size.
+    """
+
+    def __init__(self, trace=None, max_unrolled=None):
+        """
+        :param trace: Optional callback, called as trace(node, depth) before each node's fragment is built
+        :param max_unrolled: If given, counted repetitions of a single symbol or character class
+        with counts above this are built as counters of a CountingNFA, instead of one copy per count
+        """
+        self.nfa = NFA() if max_unrolled is None else CountingNFA()
+        self.trace = trace
+        self.max_unrolled = max_unrolled
+        # next unused state number; state 0 is the initial state of every NFA
+        self.next_state = 1
+
+    def new_state(self):
+        """Adds a new state to the NFA, and returns it"""
+        state = self.next_state
+        self.next_state += 1
+        self.nfa.states.add(state)
+
+        return state
+
+    def add_transition(self, from_state, symbol, to_state):
+        """Adds a transition to the NFA, keeping any existing transitions for the same symbol"""
+        pair = (from_state, symbol)
+
+        if pair in self.nfa.transition_function:
+            self.nfa.transition_function[pair].add(to_state)
         else:
-            return zero_or_one_of_nfa
+            self.nfa.transition_function[pair] = {to_state}
+
+        if symbol != "":
+            self.nfa.alphabet.add(symbol)
+
+    def build(self, node, start, depth=0):
+        """
+        Adds the fragment for a syntax tree node, starting at the given state
+
+        :return: The fragment's end state
+        """
+        if self.trace is not None:
+            self.trace(node, depth)
+
+        node_type = node[0]
+        depth += 1
+
+        if node_type == "empty":
+            # the empty string needs no states at all
+            return start
+        elif node_type in (regex_parser.SYMBOL, regex_parser.CLASS):
+            # a character class is a single transition, labelled with the whole class
+            end = self.new_state()
+            self.add_transition(start, node[1], end)
+            return end
+        elif node_type == "concat":
+            # each part starts where the one before it ended
+            end = start
+            for child in node[1]:
+                end = self.build(child, end, depth)
+            return end
+        elif node_type == "union":
+            # every alternative starts at the same state, and they are joined at a new end state
+            child_ends = [self.build(child, start, depth) for child in node[1]]
+            end = self.new_state()
+            for child_end in child_ends:
+                self.add_transition(child_end, "", end)
+            return end
+        elif node_type in ("star", "plus"):
+            # the node is wrapped in a loop between a new inner start state and the child's end
+            inner_start = self.new_state()
+            self.add_transition(start, "", inner_start)
+            inner_end = self.build(node[1], inner_start, depth)
+            self.add_transition(inner_end, "", inner_start)
+
+            end = self.new_state()
+            self.add_transition(inner_end, "", end)
+            if node_type == "star":
+                # the kleene star may also skip the loop entirely
+                self.add_transition(start, "", end)
+            return end
+        elif node_type == "qmark":
+            end = self.build(node[1], start, depth)
+            if end != start:
+                self.add_transition(start, "", end)
+            return end
+        elif node_type == "repeat":
+            child, minimum, maximum = node[1], node[2], node[3]
+
+            if self.max_unrolled is not None and child[0] in (regex_parser.SYMBOL, regex_parser.CLASS) \
+                    and (minimum if maximum is None else maximum) > self.max_unrolled:
+                # count with a counter, between a new entry state and a new end state
+                entry = self.new_state()
+                self.add_transition(start, "", entry)
+                end = self.new_state()
+                self.nfa.add_counter(entry, child[1], minimum, maximum, end)
+                return end
+
+            # the required copies one after the other, then either a loop or the optional copies
+            end = start
+            for i in range(minimum):
+                end = self.build(child, end, depth)
+
+            if maximum is None:
+                return self.build(("star", child), end, depth)
+
+            for i in range(maximum - minimum):
+                end = self.build(("qmark", child), end, depth)
+            return end
+
+        raise ValueError("Unknown syntax tree node: {}".format(node_type))
+
+
+def get_syntax_tree_nfa(node, trace=None):
+    """
+    Builds an NFA from a syntax tree made by regex_parser.parse
 
-    # no special symbols left at this point
+    :param trace: Optional callback, called as trace(node, depth) before each node's NFA is built
+    """
+    builder = NFABuilder(trace)
+    end = builder.build(node, 0)
+    builder.nfa.accept_states.add(end)
 
-    if len(regex) == 0:
-        # base case: empty nfa for empty regex
-        return NFA()
-    elif len(regex) == 1:
-        # base case: single symbol is directly turned into an NFA
-        return get_single_symbol_regex(regex)
-    else:
-        # multiple characters left; apply implicit concatenation between the first character
-        # and the remaining characters
-        return get_concat(
-            get_regex_nfa(regex[0], indent),
-            get_regex_nfa(regex[1:], indent)
-        )
+    return builder.nfa
+
+
+def get_regex_nfa(regex, trace=None):
+    """
+    Builds an NFA based on the given regex string
+
+    :param trace: Optional callback, called as trace(node, depth) for every syntax tree node
+    as its NFA is built, eg. print_trace. Nothing is printed by default.
+    """
+    return get_syntax_tree_nfa(regex_parser.parse(regex), trace)
+
+
+def get_counting_nfa(regex, max_unrolled=64, trace=None):
+    """
+    Builds a CountingNFA based on the given regex string. Counted repetitions of a single symbol
+    or character class above max_unrolled, eg. [0-9]{1000}, use a counter instead of a state
+    for every count.
+    """
+    builder = NFABuilder(trace, max_unrolled)
+    end = builder.build(regex_parser.parse(regex), 0)
+    builder.nfa.accept_states.add(end)
+
+    return builder.nfa
+
+
+def get_multi_regex_nfa(patterns, trace=None):
+    """
+    Builds a single NFA recognizing all of a list of regex strings, so one pass over
+    an input finds every pattern that matches it.
+
+    Each pattern gets its own accept state, tagged with the pattern's index in the list.
+    After feeding in an input, get_matched_patterns returns the indexes of the patterns that matched.
+    """
+    builder = NFABuilder(trace)
+
+    for pattern_id, pattern in enumerate(patterns):
+        # every pattern starts from the initial state, like the alternatives of a union
+        end = builder.build(regex_parser.parse(pattern), 0)
+
+        builder.nfa.accept_states.add(end)
+        builder.nfa.accept_patterns.setdefault(end, set()).add(pattern_id)
+
+    return builder.nfa
+
+
+def get_dfa(nfa):
+    """
+    Compiles an NFA into an equivalent DFA using the subset construction.
+
+    Every DFA state stands for the set of NFA states the NFA could be in at once,
+    so matching only needs a single table lookup per symbol.
+    """
+    closures = nfa.get_epsilon_closures()
+    # each column is a symbol or a range of characters, along with the transition labels it takes
+    columns = char_class.get_columns(nfa.alphabet)
+    symbols = [label for label, labels in columns]
+
+    # DFA state 0 is the set of states the NFA is in after a reset
+    start = closures[0]
+    subsets = [start]
+    subset_index = {start: 0}
+    table = []
+    accept_states = set()
+
+    accept_patterns = {}
+
+    # subsets grows as new DFA states are discovered, so this visits every reachable state once
+    for dfa_state, subset in enumerate(subsets):
+        if subset & nfa.accept_states:
+            accept_states.add(dfa_state)
+
+            # an accepting DFA state accepts every pattern any of its NFA states accept
+            patterns = set()
+            for state in subset & nfa.accept_states:
+                if state in nfa.accept_patterns:
+                    patterns |= nfa.accept_patterns[state]
+
+            if patterns:
+                accept_patterns[dfa_state] = frozenset(patterns)
+
+        for symbol, labels in columns:
+            to_states = set()
+
+            for state in subset:
+                for label in labels:
+                    pair = (state, label)
+
+                    if pair in nfa.transition_function:
+                        for to_state in nfa.transition_function[pair]:
+                            to_states |= closures[to_state]
+
+            if len(to_states) == 0:
+                table.append(DEAD_STATE)
+                continue
+
+            to_subset = frozenset(to_states)
+
+            if to_subset not in subset_index:
+                subset_index[to_subset] = len(subsets)
+                subsets.append(to_subset)
+
+            table.append(subset_index[to_subset])
+
+    return DFA(symbols, table, accept_states, accept_patterns)
+
+
+def get_regex_dfa(regex, minimize=False, compress=False):
+    """
+    Builds a DFA that recognizes the same strings as the given regex string
+
+    :param minimize: If true, the DFA is minimized with dfa_utils.get_minimized_dfa
+    :param compress: If true, symbols the DFA treats alike share a column (see dfa_utils.get_compressed_dfa)
+    """
+    dfa = get_dfa(get_regex_nfa(regex))
+
+    if minimize:
+        dfa = dfa_utils.get_minimized_dfa(dfa)
+
+    if compress:
+        dfa = dfa_utils.get_compressed_dfa(dfa)
+
+    return dfa
+
+
+def get_compact_nfa(nfa):
+    """
+    Freezes an NFA into a CompactNFA, which uses dense state numbers, interned symbols
+    and sparse, flat transition arrays.
+
+    Transitions to an empty set of states are left out, since they can never be taken.
+    Character class transitions are split into disjoint columns (see char_class.get_columns).
+    """
+
+    # include states that are only mentioned as transition targets
+    all_states = set(nfa.states)
+    for to_states in nfa.transition_function.values():
+        all_states |= to_states
+
+    state_ids = sorted(all_states)
+    dense_states = {state: dense_state for dense_state, state in enumerate(state_ids)}
+
+    # column 0 is always the empty string
+    columns = [("", [""])] + char_class.get_columns({pair[1] for pair in nfa.transition_function} | nfa.alphabet)
+    symbols = [label for label, labels in columns]
+
+    # the columns each transition label falls in
+    label_columns = {}
+    for column, (symbol, labels) in enumerate(columns):
+        for label in labels:
+            label_columns.setdefault(label, []).append(column)
+
+    # the labels of each state's transitions
+    state_labels = {}
+    for state, label in nfa.transition_function:
+        state_labels.setdefault(state, []).append(label)
+
+    offsets = [0]
+    transition_columns = []
+    targets = []
+
+    for state in state_ids:
+        transitions = set()
+
+        for label in state_labels.get(state, []):
+            for to_state in nfa.transition_function[(state, label)]:
+                for column in label_columns[label]:
+                    transitions.add((column, dense_states[to_state]))
+
+        for column, to_state in sorted(transitions):
+            transition_columns.append(column)
+            targets.append(to_state)
+
+        offsets.append(len(targets))
+
+    accept_states = [dense_states[state] for state in nfa.accept_states]
+
+    return CompactNFA(state_ids, symbols, offsets, transition_columns, targets, accept_states)
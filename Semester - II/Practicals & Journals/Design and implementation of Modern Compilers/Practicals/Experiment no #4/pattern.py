@@ -0,0 +1,241 @@
+import collections
+import threading
+import types
+from dfa import DEAD_STATE
+import dfa_utils
+import nfa_utils
+import prefilter
+import regex_parser
+
+
+class Pattern:
+    """
+    Class representing an immutable compiled regex.
+
+    Unlike NFA and DFA objects, a Pattern does not hold the state of a match in progress,
+    so one Pattern can be shared safely between callers and threads.
+    """
+
+    __slots__ = ("regex", "symbol_index", "range_index", "table", "width", "accept_states", "prefilter")
+
+    def __init__(self, regex):
+        """Compiles a regex string. Use compile to get a cached Pattern instead."""
+        syntax_tree = regex_parser.parse(regex)
+        dfa = nfa_utils.get_dfa(nfa_utils.get_syntax_tree_nfa(syntax_tree))
+        dfa = dfa_utils.get_compressed_dfa(dfa_utils.get_minimized_dfa(dfa))
+        # literals a string must contain to match, checked before running the DFA (None if there are
+        # none, or the regex is anchored, so the DFA rejects most strings sooner than the check would)
+        required = prefilter.get_prefilter(syntax_tree)
+        if not prefilter.has_unanchored_start(syntax_tree):
+            required = None
+
+        # attributes can only be set here, through object.__setattr__
+        object.__setattr__(self, "regex", regex)
+        object.__setattr__(self, "symbol_index", types.MappingProxyType(dfa.symbol_columns))
+        object.__setattr__(self, "range_index", dfa.range_index)
+        object.__setattr__(self, "table", memoryview(dfa.table).toreadonly())
+        object.__setattr__(self, "width", len(dfa.symbols))
+        object.__setattr__(self, "accept_states", frozenset(dfa.accept_states))
+        object.__setattr__(self, "prefilter",
+                           required if required is not None and required.is_useful() else None)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Pattern objects are immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("Pattern objects are immutable")
+
+    def matches(self, symbols):
+        """Returns true if the regex matches the whole of the given iterable of symbols"""
+        if self.prefilter is not None and isinstance(symbols, str) and not self.prefilter.might_match(symbols):
+            return False
+
+        symbol_index = self.symbol_index
+        range_index = self.range_index
+        table = self.table
+        width = self.width
+        state = 0
+
+        for symbol in symbols:
+            column = symbol_index.get(symbol)
+
+            if column is None and range_index is not None:
+                column = range_index.get(symbol)
+
+            if column is None:
+                return False
+
+            state = table[state * width + column]
+
+            if state == DEAD_STATE:
+                return False
+
+        return state in self.accept_states
+
+    def matcher(self):
+        """Returns a new Matcher, for feeding symbols into this Pattern a few at a time"""
+        return Matcher(self)
+
+    def __repr__(self):
+        return "Pattern({!r})".format(self.regex)
+
+
+class Matcher:
+    """
+    Class representing one match in progress against a Pattern.
+
+    A Matcher only holds its current state, so any number of Matchers (eg. one per thread or
+    asyncio task) can run against one shared Pattern without copies or locks.
+    It has the same interface as NFA and DFA objects.
+    """
+
+    __slots__ = ("pattern", "state")
+
+    def __init__(self, pattern):
+        self.pattern = pattern
+        # state of the pattern's DFA that this match is currently in
+        self.state = 0
+
+    def feed_symbol(self, symbol):
+        """Feeds a symbol into the match, moving it into the next state"""
+        column = self.pattern.symbol_index.get(symbol)
+
+        if column is None and self.pattern.range_index is not None:
+            column = self.pattern.range_index.get(symbol)
+
+        if self.state == DEAD_STATE or column is None:
+            self.state = DEAD_STATE
+        else:
+            self.state = self.pattern.table[self.state * self.pattern.width + column]
+
+    def feed_symbols(self, symbols, return_if_dies=False):
+        """
+        Feeds an iterable of symbols into the match
+
+        :param symbols: Iterable of symbols to feed in
+        :param return_if_dies: Kept for compatibility with NFA.feed_symbols. The Matcher always
+        stops once it dies, since the dead state can never be left again.
+        """
+        pattern = self.pattern
+        symbol_index = pattern.symbol_index
+        range_index = pattern.range_index
+        table = pattern.table
+        width = pattern.width
+        state = self.state
+
+        for symbol in symbols:
+            if state == DEAD_STATE:
+                break
+
+            column = symbol_index.get(symbol)
+
+            if column is None and range_index is not None:
+                column = range_index.get(symbol)
+            state = DEAD_STATE if column is None else table[state * width + column]
+
+        self.state = state
+
+    def is_accepting(self):
+        return self.state in self.pattern.accept_states
+
+    def is_dead(self):
+        """
+        Returns true if the match is in the dead state.
+        A "dead" match can never accept again.
+        """
+        return self.state == DEAD_STATE
+
+    def reset(self):
+        """Resets the match back to the start of the pattern"""
+        self.state = 0
+
+
+class PatternCache:
+    """Thread-safe cache of compiled Patterns, keyed by regex string, with least recently used eviction"""
+
+    def __init__(self, capacity=512):
+        """
+        :param capacity: Maximum number of Patterns kept; the least recently used one is
+        evicted when the cache is full
+        """
+        self.capacity = capacity
+        self.patterns = collections.OrderedDict()
+        self.lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, regex):
+        """Returns the compiled Pattern for a regex, compiling it if it is not cached"""
+        with self.lock:
+            if regex in self.patterns:
+                self.hits += 1
+                self.patterns.move_to_end(regex)
+                return self.patterns[regex]
+
+            self.misses += 1
+
+        # compile without holding the lock, so other threads are not held up;
+        # if two threads compile the same regex at once, the first one cached is kept
+        pattern = Pattern(regex)
+
+        with self.lock:
+            if regex in self.patterns:
+                return self.patterns[regex]
+
+            self.patterns[regex] = pattern
+            self.evict()
+
+        return pattern
+
+    def evict(self):
+        """Evicts least recently used Patterns until the cache is within its capacity. Call with the lock held."""
+        while len(self.patterns) > self.capacity:
+            self.patterns.popitem(last=False)
+
+    def set_capacity(self, capacity):
+        """Changes the capacity of the cache, evicting Patterns if it is now too full"""
+        with self.lock:
+            self.capacity = capacity
+            self.evict()
+
+    def clear(self):
+        """Empties the cache and resets its statistics"""
+        with self.lock:
+            self.patterns.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def info(self):
+        """Returns a dict of cache statistics"""
+        with self.lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self.patterns),
+                "capacity": self.capacity,
+            }
+
+
+# process-wide cache used by compile
+pattern_cache = PatternCache()
+
+
+def compile(regex):
+    """Returns a compiled, immutable Pattern for a regex string, reusing it if it was compiled recently"""
+    return pattern_cache.get(regex)
+
+
+def set_cache_capacity(capacity):
+    """Sets how many compiled Patterns the process-wide cache keeps"""
+    pattern_cache.set_capacity(capacity)
+
+
+def cache_info():
+    """Returns hit/miss statistics of the process-wide Pattern cache"""
+    return pattern_cache.info()
+
+
+def clear_cache():
+    """Empties the process-wide Pattern cache"""
+    pattern_cache.clear()
@@ -0,0 +1,242 @@
+"""
+Required-literal prefilters: a quick check, using only str.find, that rules out inputs a regex
+can never match, before any automaton is run over them.
+
+The literals are worked out from the regex's syntax tree. Every match of "python|java" must
+contain "python" or "java", and every match of "c?loud" must contain "loud", so an input
+containing neither can be rejected straight away. Any match (of the whole input, or of part of it
+with search) must contain the literals, so the check works for both.
+
+A condition is one of:
+    None                        nothing is known; anything might match
+    a string                    the input must contain the string
+    ("and", [conditions])       the input must meet every condition
+    ("or", [conditions])        the input must meet at least one condition
+"""
+
+from char_class import WILDCARD
+import regex_parser
+
+# largest set of strings kept for a node that can only match a few exact strings
+MAX_EXACT = 16
+# largest character class treated as a set of exact strings
+MAX_CLASS_SIZE = 4
+
+
+def get_and_condition(conditions):
+    """Returns a condition met when all of a list of conditions are met"""
+    flat = []
+
+    for condition in conditions:
+        if condition is None:
+            # always met, so it adds nothing
+            continue
+
+        if isinstance(condition, tuple) and condition[0] == "and":
+            flat.extend(condition[1])
+        else:
+            flat.append(condition)
+
+    if len(flat) == 0:
+        return None
+    if len(flat) == 1:
+        return flat[0]
+
+    return "and", flat
+
+
+def get_or_condition(conditions):
+    """Returns a condition met when any of a list of conditions is met"""
+    flat = []
+
+    for condition in conditions:
+        if condition is None:
+            # one alternative is always met, so the whole condition is
+            return None
+
+        if isinstance(condition, tuple) and condition[0] == "or":
+            flat.extend(condition[1])
+        else:
+            flat.append(condition)
+
+    if len(flat) == 1:
+        return flat[0]
+
+    return "or", flat
+
+
+def get_exact_condition(exact):
+    """Returns the condition for a node which can only match one of a set of exact strings"""
+    if "" in exact:
+        # the empty string is in every input
+        return None
+
+    # an input containing a string also contains every string inside it, so only the
+    # strings not containing any of the others are needed
+    strings = sorted(exact, key=len)
+    kept = []
+    for string in strings:
+        if not any(shorter in string for shorter in kept):
+            kept.append(string)
+
+    return get_or_condition(sorted(kept))
+
+
+def get_class_strings(char_class):
+    """Returns the set of characters in a small character class, or None if it is too big"""
+    size = sum(end - start + 1 for start, end in char_class.ranges)
+
+    if size > MAX_CLASS_SIZE:
+        return None
+
+    return {chr(code_point) for start, end in char_class.ranges for code_point in range(start, end + 1)}
+
+
+def get_node_info(node):
+    """
+    Works out what is known about the strings a syntax tree node matches
+
+    :return: (exact, condition), where exact is the set of every string the node can match if
+    there are only a few of them (otherwise None), and condition is met by every string it matches
+    """
+    node_type = node[0]
+
+    if node_type == "empty":
+        return {""}, None
+    elif node_type == regex_parser.SYMBOL:
+        return {node[1]}, node[1]
+    elif node_type == regex_parser.CLASS:
+        exact = get_class_strings(node[1])
+        return exact, None if exact is None else get_exact_condition(exact)
+    elif node_type == "concat":
+        conditions = []
+        # exact strings of the run of children since the last child that was not exact
+        exact = {""}
+        all_exact = True
+
+        for child in node[1]:
+            child_exact, child_condition = get_node_info(child)
+
+            if child_exact is not None and len(exact) * len(child_exact) <= MAX_EXACT:
+                exact = {start + end for start in exact for end in child_exact}
+                continue
+
+            # the run is finished; what it must contain becomes one of the conditions
+            all_exact = False
+            conditions.append(get_exact_condition(exact))
+
+            if child_exact is not None:
+                exact = child_exact
+            else:
+                conditions.append(child_condition)
+                exact = {""}
+
+        if all_exact:
+            return exact, get_exact_condition(exact)
+
+        conditions.append(get_exact_condition(exact))
+        return None, get_and_condition(conditions)
+    elif node_type == "union":
+        infos = [get_node_info(child) for child in node[1]]
+
+        if all(exact is not None for exact, condition in infos):
+            exact = set().union(*(exact for exact, condition in infos))
+
+            if len(exact) <= MAX_EXACT:
+                return exact, get_exact_condition(exact)
+
+        return None, get_or_condition([condition for exact, condition in infos])
+    elif node_type == "qmark":
+        exact, condition = get_node_info(node[1])
+        return None if exact is None else exact | {""}, None
+    elif node_type == "star":
+        return None, None
+    elif node_type == "plus":
+        # the child must be matched at least once
+        exact, condition = get_node_info(node[1])
+        return None, condition
+    elif node_type == "repeat":
+        exact, condition = get_node_info(node[1])
+        minimum, maximum = node[2], node[3]
+
+        if minimum == 0:
+            return None, None
+
+        if exact is not None and minimum == maximum and len(exact) ** minimum <= MAX_EXACT:
+            repeated = {""}
+            for i in range(minimum):
+                repeated = {start + end for start in repeated for end in exact}
+
+            return repeated, get_exact_condition(repeated)
+
+        return None, condition
+
+    raise ValueError("Unknown syntax tree node: {}".format(node_type))
+
+
+def meets(condition, text):
+    """Returns true if text meets a condition"""
+    if condition is None:
+        return True
+    if isinstance(condition, str):
+        return condition in text
+    if condition[0] == "and":
+        return all(meets(part, text) for part in condition[1])
+
+    return any(meets(part, text) for part in condition[1])
+
+
+class Prefilter:
+    """Class representing the literals an input must contain for a regex to match it"""
+
+    def __init__(self, condition):
+        """:param condition: Condition on the literals (see the module docstring)"""
+        self.condition = condition
+
+    def might_match(self, text):
+        """
+        Returns false if the regex can never match text (or any part of it),
+        and true if it might
+        """
+        return meets(self.condition, text)
+
+    def is_useful(self):
+        """Returns true if the prefilter can ever reject an input"""
+        return self.condition is not None
+
+    def __repr__(self):
+        return "Prefilter({!r})".format(self.condition)
+
+
+def has_unanchored_start(node):
+    """
+    Returns true if a syntax tree node can start by skipping over any prefix (ie. it's leading
+    part is ~*, in at least one alternative)
+
+    A whole string match of an anchored regex like "ERROR.~*.timeout" rejects most inputs at their
+    first few symbols, which is quicker than the prefilter's scans of the whole input, so the
+    prefilter only pays off before whole string matches of unanchored regexes.
+    """
+    node_type = node[0]
+
+    if node_type == "star":
+        return node[1] == (regex_parser.CLASS, WILDCARD)
+    elif node_type == "concat":
+        return has_unanchored_start(node[1][0])
+    elif node_type == "union":
+        return any(has_unanchored_start(child) for child in node[1])
+    elif node_type in ("plus", "qmark", "repeat"):
+        return has_unanchored_start(node[1])
+
+    return False
+
+
+def get_prefilter(node):
+    """Returns a Prefilter for a syntax tree made by regex_parser.parse"""
+    exact, condition = get_node_info(node)
+    return Prefilter(condition)
+
+
+def get_regex_prefilter(regex):
+    """Returns a Prefilter for a regex string"""
+    return get_prefilter(regex_parser.parse(regex))
@@ -0,0 +1,222 @@
+"""
+Tokenizer and parser for the regex strings understood by nfa_utils.get_regex_nfa.
+
+Special symbols, in order of precedence from lowest to highest: | . * + ? {}
+Any other character is a literal symbol, and literals next to each other are implicitly
+concatenated. The postfix operators (* + ?) apply to everything before them, back to the
+previous operator of the same or lower precedence, so "ab*" means "(ab)*" and "a?b+" means "(a?b)+".
+Counted repetition binds tightest: {m} repeats exactly m times, {m,} at least m times, and {m,n}
+between m and n times, so "a?b{3}" means "a?(b{3})".
+
+A character class in square brackets, eg. [a-z0-9] or [^0-9], matches any one of it's
+characters (see char_class.parse_class), and ~ matches any single character. Special symbols
+stand for themselves inside the brackets, so [~] is a literal tilde.
+
+The parser builds a syntax tree of tuples:
+    ("empty",)                  an empty operand, eg. either side of "|" in "a|"
+    ("symbol", symbol)          a single literal symbol
+    ("class", char_class)       a single character from a char_class.CharClass
+    ("concat", [nodes])         concatenation of two or more nodes
+    ("union", [nodes])          union of two or more nodes
+    ("star", node), ("plus", node), ("qmark", node)
+    ("repeat", node, minimum, maximum)  counted repetition; maximum is None if there is no upper bound
+"""
+
+from char_class import WILDCARD, parse_class
+
+# token types; each operator token's type is the operator symbol itself
+SYMBOL = "symbol"
+CLASS = "class"
+OPERATORS = "|.*+?"
+WILDCARD_SYMBOL = "~"
+REPEAT = "{"
+
+
+def parse_count(text):
+    """Returns the (minimum, maximum) of the text between the braces of a counted repetition, eg. "2,5" """
+    parts = text.split(",")
+
+    if len(parts) > 2 or not all(part.isdigit() for part in parts if part) or not parts[0]:
+        raise ValueError("Bad counted repetition: {{{}}}".format(text))
+
+    minimum = int(parts[0])
+
+    if len(parts) == 1:
+        maximum = minimum
+    elif parts[1]:
+        maximum = int(parts[1])
+    else:
+        maximum = None
+
+    if maximum is not None and maximum < minimum:
+        raise ValueError("Bad counted repetition, maximum is less than minimum: {{{}}}".format(text))
+
+    return minimum, maximum
+
+
+def tokenize(regex):
+    """
+    Generates (token type, symbol) pairs for a regex string, in a single pass.
+    The symbol of a CLASS token is a CharClass, and of a REPEAT token a (minimum, maximum) pair.
+    """
+    i = 0
+
+    while i < len(regex):
+        symbol = regex[i]
+
+        if symbol == "[":
+            # a ] straight after the opening bracket (or a leading ^) is part of the class
+            body_start = i + 2 if regex.startswith("^", i + 1) else i + 1
+            end = regex.find("]", body_start + 1)
+
+            if end == -1:
+                raise ValueError("Unterminated character class at position {} of regex: {}".format(i, regex))
+
+            yield CLASS, parse_class(regex[i + 1:end])
+            i = end + 1
+            continue
+
+        if symbol == REPEAT:
+            end = regex.find("}", i + 1)
+
+            if end == -1:
+                raise ValueError("Unterminated counted repetition at position {} of regex: {}".format(i, regex))
+
+            yield REPEAT, parse_count(regex[i + 1:end])
+            i = end + 1
+            continue
+
+        if symbol == WILDCARD_SYMBOL:
+            yield CLASS, WILDCARD
+        elif symbol in OPERATORS:
+            yield symbol, symbol
+        else:
+            yield SYMBOL, symbol
+
+        i += 1
+
+
+def get_concat_node(nodes):
+    """Returns a node for the concatenation of a list of nodes, flattening nested concatenations"""
+    flat_nodes = []
+
+    for node in nodes:
+        if node[0] == "concat":
+            flat_nodes.extend(node[1])
+        else:
+            flat_nodes.append(node)
+
+    if len(flat_nodes) == 1:
+        return flat_nodes[0]
+
+    return "concat", flat_nodes
+
+
+class RegexParser:
+    """
+    Precedence parser which builds a syntax tree from a regex in one left to right pass.
+
+    Each precedence level keeps a list of the pieces finished so far at that level. An operator
+    closes every level above its own, and appends the result to its own level, so every
+    token is handled in constant (amortized) time.
+    """
+
+    def __init__(self):
+        # finished pieces at each level, from lowest to highest precedence
+        self.alternatives = []
+        self.dot_pieces = []
+        self.star_pieces = []
+        self.plus_pieces = []
+        self.qmark_pieces = []
+        self.repeat_pieces = []
+        # nodes of the literal symbols (and character classes) since the last operator
+        self.symbols = []
+
+    def close_symbols(self):
+        """Finishes the current run of literal symbols"""
+        symbols = self.symbols
+        self.symbols = []
+
+        if len(symbols) == 0:
+            return ("empty",)
+
+        return get_concat_node(symbols)
+
+    def close_postfix_level(self, pieces, has_trailing_part, close_higher_level):
+        """
+        Finishes the current piece of a postfix operator level: the wrapped pieces,
+        followed by whatever comes after the last operator (if there is anything)
+        """
+        if len(pieces) == 0:
+            return close_higher_level()
+
+        if has_trailing_part:
+            pieces.append(close_higher_level())
+
+        return get_concat_node(pieces)
+
+    def close_repeat_level(self):
+        pieces = self.repeat_pieces
+        self.repeat_pieces = []
+        return self.close_postfix_level(pieces, len(self.symbols) > 0, self.close_symbols)
+
+    def close_qmark_level(self):
+        pieces = self.qmark_pieces
+        self.qmark_pieces = []
+        has_trailing_part = len(self.repeat_pieces) > 0 or len(self.symbols) > 0
+        return self.close_postfix_level(pieces, has_trailing_part, self.close_repeat_level)
+
+    def close_plus_level(self):
+        pieces = self.plus_pieces
+        self.plus_pieces = []
+        has_trailing_part = len(self.qmark_pieces) > 0 or len(self.repeat_pieces) > 0 or len(self.symbols) > 0
+        return self.close_postfix_level(pieces, has_trailing_part, self.close_qmark_level)
+
+    def close_star_level(self):
+        pieces = self.star_pieces
+        self.star_pieces = []
+        has_trailing_part = len(self.plus_pieces) > 0 or len(self.qmark_pieces) > 0 \
+            or len(self.repeat_pieces) > 0 or len(self.symbols) > 0
+        return self.close_postfix_level(pieces, has_trailing_part, self.close_plus_level)
+
+    def close_dot_level(self):
+        self.dot_pieces.append(self.close_star_level())
+        pieces = self.dot_pieces
+        self.dot_pieces = []
+        return get_concat_node(pieces)
+
+    def close_union_level(self):
+        self.alternatives.append(self.close_dot_level())
+        alternatives = self.alternatives
+        self.alternatives = []
+
+        if len(alternatives) == 1:
+            return alternatives[0]
+
+        return "union", alternatives
+
+    def parse(self, regex):
+        """Returns the syntax tree for a regex string"""
+        for token_type, symbol in tokenize(regex):
+            if token_type in (SYMBOL, CLASS):
+                self.symbols.append((token_type, symbol))
+            elif token_type == REPEAT:
+                minimum, maximum = symbol
+                self.repeat_pieces.append(("repeat", self.close_symbols(), minimum, maximum))
+            elif token_type == "?":
+                self.qmark_pieces.append(("qmark", self.close_repeat_level()))
+            elif token_type == "+":
+                self.plus_pieces.append(("plus", self.close_qmark_level()))
+            elif token_type == "*":
+                self.star_pieces.append(("star", self.close_plus_level()))
+            elif token_type == ".":
+                self.dot_pieces.append(self.close_star_level())
+            elif token_type == "|":
+                self.alternatives.append(self.close_dot_level())
+
+        return self.close_union_level()
+
+
+def parse(regex):
+    """Returns the syntax tree for a regex string"""
+    return RegexParser().parse(regex)
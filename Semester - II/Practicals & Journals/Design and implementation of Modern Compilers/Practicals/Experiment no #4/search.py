@@ -0,0 +1,107 @@
+"""
+Unanchored searching with an NFA: finding where in a string a regex matches,
+rather than only whether the whole string matches.
+
+The search runs like a Pike VM: the NFA is restarted at every position (as if its initial
+state had a self loop on every symbol), and each active state remembers the earliest position
+its thread of matching started from. This finds the leftmost match in one pass over the input,
+instead of trying every start position separately.
+"""
+
+
+def search(nfa, text, pos=0, longest=False, prefilter=None):
+    """
+    Finds the leftmost match of an NFA in text
+
+    :param nfa: NFA to search with. Its current states are not used or changed.
+    :param text: String (or other sequence of symbols) to search
+    :param pos: Position in text to start searching from
+    :param longest: If false, the shortest match at the leftmost position is returned,
+    otherwise the longest
+    :param prefilter: Optional prefilter.Prefilter for the regex the NFA was built from.
+    Text without the literals it needs is rejected without running the NFA.
+    :return: (start, end) span of the match, so text[start:end] is the matched string,
+    or None if there is no match
+    """
+    if prefilter is not None and not prefilter.might_match(text[pos:] if pos else text):
+        return None
+
+    closures = nfa.get_epsilon_closures()
+    start_closure = closures[0]
+    transition_function = nfa.transition_function
+    class_transitions = nfa.get_class_transitions()
+    accept_states = nfa.accept_states
+
+    # maps each active state to the earliest position a thread in that state started from
+    threads = {}
+    best = None
+
+    for i in range(pos, len(text) + 1):
+        if best is None:
+            # start a new thread here; states already active keep their earlier start
+            for state in start_closure:
+                if state not in threads:
+                    threads[state] = i
+
+        for state, start in threads.items():
+            if state in accept_states:
+                if best is None or start < best[0] or (longest and start == best[0]):
+                    best = (start, i)
+
+        if best is not None:
+            # only threads that could still find a match further left (or a longer one) are kept
+            threads = {state: start for state, start in threads.items()
+                       if start < best[0] or (longest and start == best[0])}
+
+            if len(threads) == 0:
+                break
+
+        if i == len(text):
+            break
+
+        # feed the next symbol through every thread
+        symbol = text[i]
+        new_threads = {}
+
+        for state, start in threads.items():
+            pair = (state, symbol)
+            to_states = transition_function.get(pair, ())
+
+            if state in class_transitions:
+                to_states = set(to_states)
+                for char_class, class_to_states in class_transitions[state]:
+                    if symbol in char_class:
+                        to_states |= class_to_states
+
+            for to_state in to_states:
+                for closure_state in closures[to_state]:
+                    if closure_state not in new_threads or start < new_threads[closure_state]:
+                        new_threads[closure_state] = start
+
+        threads = new_threads
+
+    return best
+
+
+def finditer(nfa, text, longest=False, prefilter=None):
+    """
+    Generates the (start, end) spans of every non-overlapping match of an NFA in text,
+    from left to right
+
+    :param prefilter: Optional prefilter.Prefilter, checked once against the whole text
+    """
+    if prefilter is not None and not prefilter.might_match(text):
+        return
+
+    pos = 0
+
+    while pos <= len(text):
+        span = search(nfa, text, pos, longest)
+
+        if span is None:
+            return
+
+        yield span
+
+        # carry on after the match; an empty match must still move forward
+        pos = span[1] if span[1] > span[0] else span[1] + 1
@@ -0,0 +1,146 @@
+import codecs
+import mmap
+from dfa import UNKNOWN_BYTE
+
+# encodings whose bytes below 128 are the ASCII characters, and every other byte is part of a
+# character above 127 (so, for an ASCII alphabet, kills the automaton like it's Latin-1 reading would)
+ASCII_COMPATIBLE_ENCODINGS = ("ascii", "utf-8")
+
+
+class StreamMatcher:
+    """
+    Matches an input that arrives in chunks (eg. read from a file or socket) against an automaton.
+
+    Works with any automaton with the feed_symbols/is_accepting/is_dead/reset interface
+    (NFA, DFA, LazyDFA or CompactNFA). Only the automaton's current states are kept between
+    chunks, so memory use does not grow with the size of the input.
+
+    Bytes chunks are fed straight through a DFA's feed_bytes, without being decoded, when that
+    gives the same result: for Latin-1, or for UTF-8 or ASCII when the alphabet is ASCII only.
+    In the second case, a byte above 127 kills the DFA straight away, even if it is not valid
+    in the encoding.
+    """
+
+    def __init__(self, automaton, encoding="utf-8"):
+        """
+        :param automaton: Automaton to feed the input through. It is reset first.
+        :param encoding: Encoding used to decode bytes chunks. A character split across
+        two chunks is decoded once the rest of it arrives.
+        """
+        self.automaton = automaton
+        self.encoding = encoding
+        self.feeds_bytes = can_feed_bytes(automaton, encoding)
+        self.reset()
+
+    def reset(self):
+        """Resets the matcher, ready for a new input"""
+        self.automaton.reset()
+        self.decoder = codecs.getincrementaldecoder(self.encoding)()
+        # number of symbols fed through the automaton so far
+        self.symbols_fed = 0
+
+    def feed(self, chunk):
+        """
+        Feeds the next chunk of the input through the automaton
+
+        :param chunk: str, or bytes-like object decoded with the matcher's encoding
+        :return: False if the automaton has died, so no further input can make it accept
+        """
+        if self.automaton.is_dead():
+            # a dead automaton will never accept, regardless of any further input
+            return False
+
+        if isinstance(chunk, str):
+            self.automaton.feed_symbols(chunk, return_if_dies=True)
+        elif self.feeds_bytes:
+            self.automaton.feed_bytes(chunk if isinstance(chunk, (bytes, bytearray)) else bytes(chunk))
+        else:
+            chunk = self.decoder.decode(chunk)
+            self.automaton.feed_symbols(chunk, return_if_dies=True)
+
+        self.symbols_fed += len(chunk)
+
+        return not self.automaton.is_dead()
+
+    def finish(self):
+        """
+        Ends the input, and returns true if the whole input was accepted
+
+        :raises UnicodeDecodeError: If the input ended part way through an encoded character
+        """
+        if not self.automaton.is_dead():
+            self.feed(self.decoder.decode(b"", final=True))
+
+        return self.automaton.is_accepting()
+
+    def is_dead(self):
+        """Returns true if the input can no longer be accepted, whatever comes next"""
+        return self.automaton.is_dead()
+
+
+def can_feed_bytes(automaton, encoding):
+    """
+    Returns true if bytes in the given encoding can be fed through the automaton's feed_bytes
+    (which reads each byte as a Latin-1 character) instead of being decoded first
+    """
+    byte_classes = getattr(automaton, "byte_classes", None)
+
+    if byte_classes is None:
+        return False
+
+    name = codecs.lookup(encoding).name
+
+    if name == "iso8859-1":
+        return True
+
+    return name in ASCII_COMPATIBLE_ENCODINGS and all(column == UNKNOWN_BYTE for column in byte_classes[128:])
+
+
+def match_chunks(automaton, chunks, encoding="utf-8"):
+    """
+    Matches an input given as an iterable of str or bytes chunks.
+    Stops reading chunks as soon as the automaton dies.
+
+    :return: True if the whole input was accepted
+    """
+    matcher = StreamMatcher(automaton, encoding)
+
+    for chunk in chunks:
+        if not matcher.feed(chunk):
+            break
+
+    return matcher.finish()
+
+
+def read_chunks(file, chunk_size=1 << 16):
+    """Generates chunks read from a file object opened in binary or text mode"""
+    while True:
+        chunk = file.read(chunk_size)
+
+        if len(chunk) == 0:
+            return
+
+        yield chunk
+
+
+def match_file(automaton, path, chunk_size=1 << 16, encoding="utf-8", use_mmap=False):
+    """
+    Matches the contents of a file, reading it in chunks so files larger than memory can be matched
+
+    :param use_mmap: If true, the file is memory mapped and chunks are sliced from the
+    mapping, instead of being read with file.read
+    :return: True if the whole file was accepted
+    """
+    with open(path, "rb") as file:
+        if not use_mmap:
+            return match_chunks(automaton, read_chunks(file, chunk_size), encoding)
+
+        try:
+            mapping = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # empty files can't be memory mapped
+            return match_chunks(automaton, [], encoding)
+
+        with mapping:
+            chunks = (mapping[start:start + chunk_size] for start in range(0, len(mapping), chunk_size))
+            return match_chunks(automaton, chunks, encoding)
@@ -1,5 +1,21 @@
+import concurrent.futures
+import os
+import tempfile
+import threading
 import unittest
+import automaton_file
+import batch
+import benchmarks
+import char_class
+import dfa_utils
 import nfa_utils
+import pattern
+import prefilter
+import stream
+from lazy_dfa import LazyDFA
+import lockstep
+import regex_parser
+import search
 
 
 class TestNFA(unittest.TestCase):
@@ -389,3 +405,1098 @@ class TestNFA(unittest.TestCase):
             nfa.feed_symbols(symbol_input)
             self.assertFalse(nfa.is_accepting())
             nfa.reset()
+
+
+class TestDFA(unittest.TestCase):
+
+    # regex strings paired with strings that should be accepted and rejected
+    examples = [
+        ("python|java|C#", ["python", "java", "C#"], ["", "perl", "C++", "Go"]),
+        ("o+k then", ["ok then", "ooook then"], ["", "k then", "okay"]),
+        ("c?loud", ["cloud", "loud"], ["oud", "ccloud"]),
+        ("H?A?h?a?*!*|H?E?h?e?*!*",
+         ["Hah", "heh", "AAAAAAAAAAHAHAHAHAHA!!", "HEHEEE!"],
+         ["Heaha", "Haha!h!", "!haha", "I don't get it"]),
+    ]
+
+    def test_single_symbol_dfa(self):
+        print("Testing single symbol DFA")
+
+        dfa = nfa_utils.get_regex_dfa("x")
+        print(dfa)
+
+        self.assertEqual(dfa.alphabet, {"x"})
+        self.assertEqual(dfa.num_states(), 2)
+        self.assertFalse(dfa.is_accepting())
+
+        dfa.feed_symbol("x")
+        self.assertTrue(dfa.is_accepting())
+
+        dfa.feed_symbol("x")
+        self.assertFalse(dfa.is_accepting())
+        self.assertTrue(dfa.is_dead())
+
+        dfa.reset()
+        self.assertFalse(dfa.is_dead())
+
+    def test_dfa_matches_nfa(self):
+        print("Testing DFA accepts the same strings as the NFA it was compiled from")
+
+        for regex, accept_list, reject_list in self.examples:
+            nfa = nfa_utils.get_regex_nfa(regex)
+            dfa = nfa_utils.get_dfa(nfa)
+            print(dfa)
+
+            for symbol_input in accept_list + reject_list:
+                nfa.reset()
+                nfa.feed_symbols(symbol_input)
+                dfa.feed_symbols(symbol_input, return_if_dies=True)
+                self.assertEqual(dfa.is_accepting(), nfa.is_accepting())
+                self.assertEqual(dfa.is_accepting(), symbol_input in accept_list)
+                dfa.reset()
+
+    def test_dfa_unknown_symbol(self):
+        print("Testing DFA dies on a symbol outside its alphabet")
+
+        dfa = nfa_utils.get_regex_dfa("a*")
+        self.assertTrue(dfa.is_accepting())
+
+        dfa.feed_symbols("aab")
+        self.assertTrue(dfa.is_dead())
+        self.assertFalse(dfa.is_accepting())
+
+
+class TestLazyDFA(unittest.TestCase):
+
+    def test_lazy_dfa_matches_nfa(self):
+        print("Testing lazy DFA accepts the same strings as the NFA it simulates")
+
+        for regex, accept_list, reject_list in TestDFA.examples:
+            lazy_dfa = LazyDFA(nfa_utils.get_regex_nfa(regex))
+
+            # feed every string twice, so the second pass runs from the cache
+            for i in range(2):
+                for symbol_input in accept_list + reject_list:
+                    lazy_dfa.feed_symbols(symbol_input, return_if_dies=True)
+                    self.assertEqual(lazy_dfa.is_accepting(), symbol_input in accept_list)
+                    lazy_dfa.reset()
+
+            print(lazy_dfa)
+            self.assertGreater(lazy_dfa.hits, 0)
+            self.assertEqual(lazy_dfa.flushes, 0)
+
+    def test_lazy_dfa_cache_flush(self):
+        print("Testing lazy DFA flushes a full cache")
+
+        lazy_dfa = LazyDFA(nfa_utils.get_regex_nfa("H?A?h?a?*!*|H?E?h?e?*!*"),
+                           max_states=3, min_symbols_per_state=0)
+
+        lazy_dfa.feed_symbols("AAAAAAAAAAHAHAHAHAHA!!")
+        self.assertTrue(lazy_dfa.is_accepting())
+        self.assertGreater(lazy_dfa.flushes, 0)
+        self.assertLessEqual(len(lazy_dfa.cache), 3)
+        self.assertFalse(lazy_dfa.fallback)
+
+    def test_lazy_dfa_fallback(self):
+        print("Testing lazy DFA falls back to NFA simulation when its cache thrashes")
+
+        # every symbol reaches a new DFA state, so a cache of 2 states fills up again straight away
+        lazy_dfa = LazyDFA(nfa_utils.get_regex_nfa("abcdefgh"), max_states=2)
+
+        lazy_dfa.feed_symbols("abcd")
+        self.assertTrue(lazy_dfa.fallback)
+        self.assertEqual(lazy_dfa.flushes, 2)
+
+        # matching still works after falling back
+        lazy_dfa.feed_symbols("efgh")
+        self.assertTrue(lazy_dfa.is_accepting())
+
+    def test_lazy_dfa_first_fill_is_not_thrashing(self):
+        print("Testing lazy DFA only checks for thrashing when its cache fills up again")
+
+        lazy_dfa = LazyDFA(nfa_utils.get_regex_nfa("H?A?h?a?*!*|H?E?h?e?*!*"), max_states=4)
+
+        lazy_dfa.feed_symbols("Haha!")
+        self.assertTrue(lazy_dfa.is_accepting())
+        self.assertEqual(lazy_dfa.flushes, 1)
+        self.assertFalse(lazy_dfa.fallback)
+
+    def test_lazy_dfa_fallback_ends(self):
+        print("Testing lazy DFA starts caching again after falling back")
+
+        lazy_dfa = LazyDFA(nfa_utils.get_regex_nfa("abcdefgh"), max_states=2, min_symbols_per_state=2)
+
+        lazy_dfa.feed_symbols("abc")
+        self.assertTrue(lazy_dfa.fallback)
+
+        # after max_states * min_symbols_per_state symbols of NFA simulation, caching is tried again
+        lazy_dfa.feed_symbols("defg")
+        self.assertFalse(lazy_dfa.fallback)
+        lazy_dfa.feed_symbols("h")
+        self.assertTrue(lazy_dfa.is_accepting())
+        self.assertGreater(len(lazy_dfa.cache), 0)
+
+        # caching again after a fallback is still a refill, so thrashing falls back again
+        lazy_dfa.reset()
+        lazy_dfa.feed_symbols("abc")
+        self.assertTrue(lazy_dfa.fallback)
+
+    def test_lazy_dfa_fallback_across_resets(self):
+        print("Testing lazy DFA keeps falling back across resets, for many short inputs")
+
+        lazy_dfa = LazyDFA(nfa_utils.get_regex_nfa("abcdefgh"), max_states=2, min_symbols_per_state=5)
+        lazy_dfa.feed_symbols("abc")
+        self.assertTrue(lazy_dfa.fallback)
+
+        # the fallback lasts for max_states * min_symbols_per_state = 10 symbols, whatever the inputs
+        for i in range(3):
+            lazy_dfa.reset()
+            self.assertTrue(lazy_dfa.fallback)
+            lazy_dfa.feed_symbols("abc")
+
+        lazy_dfa.reset()
+        lazy_dfa.feed_symbols("a")
+        self.assertFalse(lazy_dfa.fallback)
+        lazy_dfa.feed_symbols("bcdefgh")
+        self.assertTrue(lazy_dfa.is_accepting())
+
+    def test_lazy_dfa_transition_limit(self):
+        print("Testing lazy DFA caches a limited number of transitions for each state")
+
+        lazy_dfa = LazyDFA(nfa_utils.get_regex_nfa("~*"), max_transitions_per_state=8)
+        symbols = "".join(chr(code_point) for code_point in range(100, 200))
+        lazy_dfa.feed_symbols(symbols)
+        self.assertTrue(lazy_dfa.is_accepting())
+
+        for transitions in lazy_dfa.cache.values():
+            self.assertLessEqual(len(transitions), 8)
+
+        # uncached symbols are still followed
+        lazy_dfa.reset()
+        lazy_dfa.feed_symbols(symbols)
+        self.assertTrue(lazy_dfa.is_accepting())
+
+    def test_lazy_dfa_max_states(self):
+        print("Testing lazy DFA needs room for at least 2 states")
+
+        with self.assertRaises(ValueError):
+            LazyDFA(nfa_utils.get_regex_nfa("a"), max_states=1)
+
+
+class TestEpsilonClosures(unittest.TestCase):
+
+    def test_epsilon_closures(self):
+        print("Testing epsilon closure index")
+
+        # construct an NFA equivalent to (a|<empty string>)b
+        nfa = nfa_utils.get_regex_nfa("a?b")
+        closures = nfa.get_epsilon_closures()
+
+        # every state is in its own closure
+        for state in nfa.states:
+            self.assertIn(state, closures[state])
+
+        # the index is reused until the NFA changes
+        self.assertIs(nfa.get_epsilon_closures(), closures)
+
+        nfa.reset()
+        self.assertEqual(nfa.in_states, set(closures[0]))
+
+    def test_epsilon_closures_invalidated(self):
+        print("Testing epsilon closure index is rebuilt after the NFA changes")
+
+        nfa = nfa_utils.get_single_symbol_regex("a")
+        nfa.reset()
+        self.assertFalse(nfa.is_accepting())
+
+        # adding an empty string transition to a new accept state must
+        # be picked up by the next reset
+        nfa.add_state(2, True)
+        nfa.add_transition(0, "", {2})
+        self.assertIsNone(nfa.epsilon_closures)
+
+        nfa.reset()
+        self.assertTrue(nfa.is_accepting())
+        self.assertEqual(nfa.in_states, {0, 2})
+
+
+class TestCompactNFA(unittest.TestCase):
+
+    def test_compact_nfa_round_trip(self):
+        print("Testing compact NFA converts back to an equal NFA")
+
+        for regex in ["x", "a.b|c", "a*b*c*", "o+k then", "H?A?h?a?*!*|H?E?h?e?*!*"]:
+            nfa = nfa_utils.get_regex_nfa(regex)
+            compact_nfa = nfa_utils.get_compact_nfa(nfa)
+            print(compact_nfa)
+
+            self.assertEqual(compact_nfa.to_nfa(), nfa)
+            self.assertEqual(compact_nfa.to_nfa().alphabet, nfa.alphabet)
+
+    def test_compact_nfa_matches_nfa(self):
+        print("Testing compact NFA accepts the same strings as the NFA")
+
+        for regex, accept_list, reject_list in TestDFA.examples:
+            nfa = nfa_utils.get_regex_nfa(regex)
+            compact_nfa = nfa_utils.get_compact_nfa(nfa)
+
+            for symbol_input in accept_list + reject_list:
+                nfa.reset()
+                nfa.feed_symbols(symbol_input)
+                compact_nfa.feed_symbols(symbol_input, return_if_dies=True)
+
+                self.assertEqual(compact_nfa.is_accepting(), symbol_input in accept_list)
+                if not compact_nfa.is_dead():
+                    self.assertEqual(compact_nfa.get_states(compact_nfa.in_states), nfa.in_states)
+
+                compact_nfa.reset()
+
+    def test_compact_nfa_is_smaller(self):
+        print("Testing compact NFA uses less memory than the NFA it was built from")
+
+        regex = "|".join("keyword{}".format(i) for i in range(300))
+        nfa, nfa_size = benchmarks.get_allocated_size(lambda: nfa_utils.get_regex_nfa(regex))
+        compact_nfa, compact_size = benchmarks.get_allocated_size(lambda: nfa_utils.get_compact_nfa(nfa))
+
+        self.assertEqual(len(compact_nfa.state_ids), len(nfa.states))
+        self.assertLess(compact_size, nfa_size)
+
+    def test_compact_nfa_step_cache(self):
+        print("Testing compact NFA keeps it's step cache within it's size limit")
+
+        keywords = ["keyword{}".format(i) for i in range(50)]
+        compact_nfa = nfa_utils.get_compact_nfa(nfa_utils.get_regex_nfa("|".join(keywords)))
+        compact_nfa.max_cache_size = 40
+
+        for keyword in keywords + ["keyword", "keyword50"]:
+            compact_nfa.reset()
+            compact_nfa.feed_symbols(keyword)
+            self.assertEqual(compact_nfa.is_accepting(), keyword in keywords)
+            self.assertLessEqual(compact_nfa.cache_size, 40)
+
+    def test_compact_nfa_dies(self):
+        print("Testing compact NFA dies on a symbol outside its alphabet")
+
+        compact_nfa = nfa_utils.get_compact_nfa(nfa_utils.get_regex_nfa("a*"))
+        self.assertTrue(compact_nfa.is_accepting())
+
+        compact_nfa.feed_symbols("ab")
+        self.assertTrue(compact_nfa.is_dead())
+        self.assertFalse(compact_nfa.is_accepting())
+
+
+class TestRegexParser(unittest.TestCase):
+
+    def test_parse_precedence(self):
+        print("Testing regex parser operator precedence")
+
+        self.assertEqual(regex_parser.parse("a"), ("symbol", "a"))
+        self.assertEqual(regex_parser.parse(""), ("empty",))
+
+        # postfix operators wrap everything back to the previous operator
+        self.assertEqual(regex_parser.parse("ab*"),
+                         ("star", ("concat", [("symbol", "a"), ("symbol", "b")])))
+        self.assertEqual(regex_parser.parse("a?b+c"),
+                         ("concat", [("plus", ("concat", [("qmark", ("symbol", "a")), ("symbol", "b")])),
+                                     ("symbol", "c")]))
+
+        # union binds loosest, then the dot
+        self.assertEqual(regex_parser.parse("a.b|c"),
+                         ("union", [("concat", [("symbol", "a"), ("symbol", "b")]), ("symbol", "c")]))
+
+    def test_long_literal(self):
+        print("Testing NFA for a 5000 symbol literal regex")
+
+        regex = "ab" * 2500
+        nfa = nfa_utils.get_regex_nfa(regex)
+        nfa.reset()
+
+        nfa.feed_symbols(regex)
+        self.assertTrue(nfa.is_accepting())
+
+        nfa.feed_symbol("a")
+        self.assertFalse(nfa.is_accepting())
+
+
+class TestCharClasses(unittest.TestCase):
+
+    # regex strings paired with strings that should be accepted and rejected
+    examples = [
+        ("[a-z0-9]+", ["a", "abc123", "z9"], ["", "A", "ab-c"]),
+        ("[^0-9]*", ["", "abc", "a b!"], ["1", "a1"]),
+        ("a~c", ["abc", "a c", "a~c", "aéc"], ["ac", "abbc"]),
+        ("[]a]|[-z]", ["]", "a", "-", "z"], ["", "b", "]a"]),
+        ("[~]|x", ["~", "x"], ["a", ""]),
+        ("[a-c]|b+|x", ["a", "b", "c", "bbb", "x"], ["d", "ab", "xx"]),
+    ]
+
+    def test_parse_class(self):
+        print("Testing parsing character classes")
+
+        self.assertEqual(char_class.parse_class("a-c0").ranges, ((48, 48), (97, 99)))
+        self.assertEqual(char_class.parse_class("^b").ranges, ((0, 97), (99, char_class.MAX_CODE_POINT)))
+        self.assertEqual(regex_parser.parse("a[bc]"),
+                         ("concat", [("symbol", "a"), ("class", char_class.CharClass([(98, 99)]))]))
+        self.assertEqual(regex_parser.parse("~"), ("class", char_class.WILDCARD))
+
+        self.assertRaises(ValueError, regex_parser.parse, "a[bc")
+        self.assertRaises(ValueError, regex_parser.parse, "[z-a]")
+
+    def test_class_is_one_transition(self):
+        print("Testing a character class is a single transition")
+
+        nfa = nfa_utils.get_regex_nfa("[a-z0-9]")
+        self.assertEqual(len(nfa.states), 2)
+        self.assertEqual(len(nfa.transition_function), 1)
+
+    def test_class_engines_agree(self):
+        print("Testing character classes in every engine")
+
+        for regex, accept_list, reject_list in self.examples:
+            nfa = nfa_utils.get_regex_nfa(regex)
+            automata = [nfa, nfa_utils.get_dfa(nfa), nfa_utils.get_regex_dfa(regex, minimize=True, compress=True),
+                        nfa_utils.get_compact_nfa(nfa), LazyDFA(nfa), pattern.Pattern(regex).matcher()]
+
+            for automaton in automata:
+                for symbol_input in accept_list + reject_list:
+                    automaton.reset()
+                    automaton.feed_symbols(symbol_input)
+                    self.assertEqual(automaton.is_accepting(), symbol_input in accept_list)
+
+    def test_class_dfa_columns(self):
+        print("Testing DFA columns for overlapping classes and symbols")
+
+        dfa = nfa_utils.get_regex_dfa("[a-z]|[m-p]1|n")
+
+        # columns: 1, n, a-l, m, o-p and q-z
+        self.assertEqual(len(dfa.symbols), 6)
+        self.assertEqual(dfa.get_column("b"), dfa.get_column("l"))
+        self.assertNotEqual(dfa.get_column("m"), dfa.get_column("n"))
+        self.assertIsNone(dfa.get_column("A"))
+
+    def test_class_search(self):
+        print("Testing searching with character classes")
+
+        nfa = nfa_utils.get_regex_nfa("[0-9]+")
+        self.assertEqual(list(search.finditer(nfa, "ab12c3", longest=True)), [(2, 4), (5, 6)])
+
+    def test_class_round_trip(self):
+        print("Testing saving and loading automata with character classes")
+
+        nfa = nfa_utils.get_regex_nfa("[a-z]+|[^a-z]")
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "automaton.rxa")
+
+            for automaton in [nfa_utils.get_dfa(nfa), nfa_utils.get_compact_nfa(nfa)]:
+                automaton_file.save(automaton, path)
+                loaded = automaton_file.load(path)
+
+                self.assertEqual(loaded.symbols, automaton.symbols)
+
+                for symbol_input, accepts in [("abc", True), ("7", True), ("ab7", False)]:
+                    loaded.reset()
+                    loaded.feed_symbols(symbol_input)
+                    self.assertEqual(loaded.is_accepting(), accepts)
+
+
+class TestCountedRepetition(unittest.TestCase):
+
+    # regex strings paired with strings that should be accepted and rejected
+    examples = [
+        ("a{3}", ["aaa"], ["", "aa", "aaaa"]),
+        ("a{2,}", ["aa", "aaaaa"], ["", "a"]),
+        ("a{1,3}.b", ["ab", "aaab"], ["b", "aaaab", "aa"]),
+        ("ab{2}", ["abab"], ["ab", "abb"]),
+        ("x?[0-9]{2,3}|z{0}", ["12", "x123", ""], ["x1", "1234", "z"]),
+        ("[ab]{2}*c", ["c", "abc", "abbac"], ["ac", "abac"]),
+    ]
+
+    def test_parse_count(self):
+        print("Testing parsing counted repetition")
+
+        self.assertEqual(regex_parser.parse("a{2,5}"), ("repeat", ("symbol", "a"), 2, 5))
+        self.assertEqual(regex_parser.parse("a?b{3,}"),
+                         ("concat", [("qmark", ("symbol", "a")), ("repeat", ("symbol", "b"), 3, None)]))
+
+        for regex in ["a{", "a{x}", "a{,3}", "a{3,2}", "a{1,2,3}"]:
+            self.assertRaises(ValueError, regex_parser.parse, regex)
+
+    def test_counted_repetition(self):
+        print("Testing counted repetition in NFAs, DFAs and counting NFAs")
+
+        for regex, accept_list, reject_list in self.examples:
+            automata = [nfa_utils.get_regex_nfa(regex), nfa_utils.get_regex_dfa(regex),
+                        nfa_utils.get_counting_nfa(regex, max_unrolled=1)]
+
+            for automaton in automata:
+                for symbol_input in accept_list + reject_list:
+                    automaton.reset()
+                    automaton.feed_symbols(symbol_input)
+                    self.assertEqual(automaton.is_accepting(), symbol_input in accept_list)
+
+    def test_large_count(self):
+        print("Testing a large count with a counter")
+
+        nfa = nfa_utils.get_counting_nfa("x.[0-9]{1000}.y|[a-z]{500,}")
+        self.assertLess(len(nfa.states), 20)
+
+        for symbol_input, accepts in [("x" + "5" * 1000 + "y", True), ("x" + "5" * 999 + "y", False),
+                                      ("x" + "5" * 1001 + "y", False), ("q" * 500, True),
+                                      ("q" * 2000, True), ("q" * 499, False)]:
+            nfa.reset()
+            nfa.feed_symbols(symbol_input, return_if_dies=True)
+            self.assertEqual(nfa.is_accepting(), accepts)
+
+        nfa.reset()
+        nfa.feed_symbols("x5y")
+        self.assertTrue(nfa.is_dead())
+
+
+class TestBuildTrace(unittest.TestCase):
+
+    def test_build_trace(self):
+        print("Testing NFA build trace callback")
+
+        traced = []
+        nfa_utils.get_regex_nfa("ab|c*", trace=lambda node, depth: traced.append((node[0], depth)))
+
+        self.assertEqual(traced, [("union", 0), ("concat", 1), ("symbol", 2),
+                                  ("symbol", 2), ("star", 1), ("symbol", 2)])
+
+
+class TestNFABuilder(unittest.TestCase):
+
+    def test_builder_states(self):
+        print("Testing NFA builder numbers states from a single counter")
+
+        nfa = nfa_utils.get_regex_nfa("python|java|C#")
+        print(nfa)
+
+        # states are numbered densely, and the accept state is the last one
+        self.assertEqual(nfa.states, set(range(len(nfa.states))))
+        self.assertEqual(nfa.accept_states, {max(nfa.states)})
+
+        # one state per symbol, plus the shared end state of the union
+        self.assertEqual(len(nfa.states), 1 + len("pythonjavaC#") + 1)
+
+    def test_builder_compatible_with_combinators(self):
+        print("Testing NFAs from the builder can be combined with get_concat")
+
+        nfa = nfa_utils.get_concat(nfa_utils.get_regex_nfa("a+"), nfa_utils.get_regex_nfa("b*"))
+        nfa.reset()
+
+        nfa.feed_symbols("aaabb")
+        self.assertTrue(nfa.is_accepting())
+        nfa.reset()
+
+        nfa.feed_symbols("b")
+        self.assertFalse(nfa.is_accepting())
+
+    def test_empty_operands(self):
+        print("Testing empty operands match the empty string")
+
+        for regex in ["", "a|", "a."]:
+            nfa = nfa_utils.get_regex_nfa(regex)
+            nfa.reset()
+            self.assertEqual(nfa.is_accepting(), regex != "a.")
+
+
+class TestMultiPattern(unittest.TestCase):
+
+    patterns = ["python|java|C#", "c?loud", "o+k then", "p*ython", "cloud"]
+
+    # inputs paired with the ids of the patterns that should match them
+    expected = {
+        "python": {0, 3},
+        "ython": {3},
+        "cloud": {1, 4},
+        "loud": {1},
+        "ok then": {2},
+        "perl": set(),
+        "": set(),
+    }
+
+    def test_multi_pattern_nfa(self):
+        print("Testing multi pattern NFA")
+
+        nfa = nfa_utils.get_multi_regex_nfa(self.patterns)
+        print(nfa)
+
+        for symbol_input, pattern_ids in self.expected.items():
+            nfa.reset()
+            nfa.feed_symbols(symbol_input, return_if_dies=True)
+            self.assertEqual(nfa.get_matched_patterns(), pattern_ids)
+            self.assertEqual(nfa.is_accepting(), len(pattern_ids) > 0)
+
+    def test_multi_pattern_dfa(self):
+        print("Testing multi pattern DFA")
+
+        dfa = nfa_utils.get_dfa(nfa_utils.get_multi_regex_nfa(self.patterns))
+        print(dfa)
+
+        for symbol_input, pattern_ids in self.expected.items():
+            dfa.reset()
+            dfa.feed_symbols(symbol_input, return_if_dies=True)
+            self.assertEqual(dfa.get_matched_patterns(), pattern_ids)
+
+
+class TestStreamMatcher(unittest.TestCase):
+
+    def test_match_chunks(self):
+        print("Testing matching an input split into chunks")
+
+        for automaton in [nfa_utils.get_regex_nfa("ab+c"), nfa_utils.get_regex_dfa("ab+c")]:
+            self.assertTrue(stream.match_chunks(automaton, ["ab", "abab", "", "c"]))
+            self.assertTrue(stream.match_chunks(automaton, [b"aba", b"bc"]))
+            self.assertFalse(stream.match_chunks(automaton, ["ab", "ab"]))
+            self.assertFalse(stream.match_chunks(automaton, []))
+
+    def test_early_death(self):
+        print("Testing stream matcher stops once the automaton dies")
+
+        matcher = stream.StreamMatcher(nfa_utils.get_regex_dfa("a*"))
+        self.assertTrue(matcher.feed("aaa"))
+        self.assertFalse(matcher.feed("ab"))
+        self.assertTrue(matcher.is_dead())
+
+        # later chunks are ignored
+        self.assertFalse(matcher.feed("aaaa"))
+        self.assertEqual(matcher.symbols_fed, 5)
+        self.assertFalse(matcher.finish())
+
+    def test_feeds_bytes(self):
+        print("Testing stream matcher feeds bytes straight through a DFA when decoding can be skipped")
+
+        dfa = nfa_utils.get_regex_dfa("ab+c")
+        self.assertTrue(stream.StreamMatcher(dfa).feeds_bytes)
+        self.assertTrue(stream.StreamMatcher(dfa, encoding="latin-1").feeds_bytes)
+        self.assertFalse(stream.StreamMatcher(dfa, encoding="utf-16").feeds_bytes)
+        self.assertFalse(stream.StreamMatcher(nfa_utils.get_regex_nfa("ab+c")).feeds_bytes)
+        # é is two bytes in UTF-8, which feed_bytes would read as two Latin-1 characters
+        self.assertFalse(stream.StreamMatcher(nfa_utils.get_regex_dfa("été")).feeds_bytes)
+
+        self.assertTrue(stream.match_chunks(dfa, [b"ab", bytearray(b"abab"), memoryview(b"c")]))
+        self.assertFalse(stream.match_chunks(dfa, [b"ab", "\xe9".encode("utf-8"), b"c"]))
+        self.assertTrue(stream.match_chunks(nfa_utils.get_regex_dfa("[\xe0-\xff]+"), [b"\xe9\xe0"], "latin-1"))
+
+    def test_split_characters(self):
+        print("Testing stream matcher decodes characters split between chunks")
+
+        encoded = "été".encode("utf-8")
+        chunks = [encoded[i:i + 1] for i in range(len(encoded))]
+
+        self.assertTrue(stream.match_chunks(nfa_utils.get_regex_nfa("été"), chunks))
+
+    def test_match_file(self):
+        print("Testing matching a file in chunks")
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "input.txt")
+            with open(path, "w") as file:
+                file.write("ab" * 1000 + "c")
+
+            dfa = nfa_utils.get_regex_dfa("ab+c")
+            self.assertTrue(stream.match_file(dfa, path, chunk_size=7))
+            self.assertTrue(stream.match_file(dfa, path, chunk_size=7, use_mmap=True))
+
+            # empty file
+            with open(path, "w") as file:
+                pass
+
+            self.assertFalse(stream.match_file(dfa, path, use_mmap=True))
+            self.assertTrue(stream.match_file(nfa_utils.get_regex_dfa("a*"), path, use_mmap=True))
+
+
+class TestBatchMatching(unittest.TestCase):
+
+    strings = ["python", "java", "perl", "C#", "", "Go", "javajava"] * 10
+
+    def test_match_many_in_process(self):
+        print("Testing batch matching in one process")
+
+        results = list(batch.match_many("python|java|C#", self.strings, workers=1, chunk_size=3))
+        self.assertEqual(results, [string in ("python", "java", "C#") for string in self.strings])
+
+    def test_match_many_process_pool(self):
+        print("Testing batch matching with a process pool")
+
+        for use_dfa in [True, False]:
+            results = list(batch.match_many("python|java|C#", self.strings, workers=2,
+                                            chunk_size=4, use_dfa=use_dfa))
+            self.assertEqual(results, [string in ("python", "java", "C#") for string in self.strings])
+
+
+class TestDFAMinimization(unittest.TestCase):
+
+    def test_minimized_dfa_matches(self):
+        print("Testing minimized DFA accepts the same strings")
+
+        for regex, accept_list, reject_list in TestDFA.examples:
+            dfa = nfa_utils.get_regex_dfa(regex)
+            minimized_dfa = dfa_utils.get_minimized_dfa(dfa)
+            print(minimized_dfa)
+
+            self.assertLessEqual(minimized_dfa.num_states(), dfa.num_states())
+
+            for symbol_input in accept_list + reject_list:
+                minimized_dfa.reset()
+                minimized_dfa.feed_symbols(symbol_input)
+                self.assertEqual(minimized_dfa.is_accepting(), symbol_input in accept_list)
+
+    def test_minimized_state_count(self):
+        print("Testing minimized DFA state counts")
+
+        # equivalent regexes minimize to the same number of states
+        self.assertEqual(nfa_utils.get_regex_dfa("a*", minimize=True).num_states(), 1)
+        self.assertEqual(nfa_utils.get_regex_dfa("a*.a*.a*", minimize=True).num_states(), 1)
+        self.assertEqual(nfa_utils.get_regex_dfa("ab|ac|ad", minimize=True).num_states(), 3)
+
+        # states that can never accept are merged into the dead state
+        self.assertEqual(nfa_utils.get_regex_dfa("abc|abd|abe", minimize=True).num_states(), 4)
+
+    def test_minimized_multi_pattern_dfa(self):
+        print("Testing minimization keeps states accepting different patterns apart")
+
+        dfa = nfa_utils.get_dfa(nfa_utils.get_multi_regex_nfa(["ab", "cb"]))
+        minimized_dfa = dfa_utils.get_minimized_dfa(dfa)
+
+        for symbol_input, pattern_ids in [("ab", {0}), ("cb", {1}), ("b", set())]:
+            minimized_dfa.reset()
+            minimized_dfa.feed_symbols(symbol_input)
+            self.assertEqual(minimized_dfa.get_matched_patterns(), pattern_ids)
+
+
+class TestSymbolClasses(unittest.TestCase):
+
+    def test_compressed_dfa_matches(self):
+        print("Testing compressed DFA accepts the same strings")
+
+        for regex, accept_list, reject_list in TestDFA.examples:
+            dfa = nfa_utils.get_regex_dfa(regex, minimize=True)
+            compressed_dfa = dfa_utils.get_compressed_dfa(dfa)
+            print(compressed_dfa)
+
+            self.assertLessEqual(len(compressed_dfa.symbols), len(dfa.symbols))
+            self.assertEqual(compressed_dfa.alphabet, dfa.alphabet)
+
+            for symbol_input in accept_list + reject_list:
+                compressed_dfa.reset()
+                compressed_dfa.feed_symbols(symbol_input)
+                self.assertEqual(compressed_dfa.is_accepting(), symbol_input in accept_list)
+
+                compressed_dfa.reset()
+                compressed_dfa.feed_bytes(symbol_input.encode("latin-1"))
+                self.assertEqual(compressed_dfa.is_accepting(), symbol_input in accept_list)
+
+    def test_symbol_classes(self):
+        print("Testing symbols treated alike share a column")
+
+        dfa = nfa_utils.get_regex_dfa("a|b|c|d.x", minimize=True, compress=True)
+
+        # a, b and c all go straight to the accept state
+        self.assertEqual(len(dfa.symbols), 3)
+        self.assertEqual(dfa.symbol_index["a"], dfa.symbol_index["b"])
+        self.assertEqual(dfa.symbol_index["a"], dfa.symbol_index["c"])
+        self.assertNotEqual(dfa.symbol_index["a"], dfa.symbol_index["d"])
+        self.assertEqual(dfa.byte_classes[ord("b")], dfa.symbol_index["b"])
+
+        # minimizing keeps the classes
+        self.assertEqual(dfa_utils.get_minimized_dfa(dfa).symbol_index, dfa.symbol_index)
+
+    def test_feed_bytes_unknown(self):
+        print("Testing feeding bytes outside the alphabet")
+
+        dfa = nfa_utils.get_regex_dfa("a*", compress=True)
+        dfa.feed_bytes(b"aaa")
+        self.assertTrue(dfa.is_accepting())
+
+        dfa.feed_bytes(b"a\xffa")
+        self.assertTrue(dfa.is_dead())
+
+    def test_compressed_dfa_round_trip(self):
+        print("Testing saving and loading a compressed DFA")
+
+        dfa = nfa_utils.get_regex_dfa("a|b|c|d.x", compress=True)
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "automaton.rxa")
+            automaton_file.save(dfa, path)
+            loaded_dfa = automaton_file.load(path)
+
+            self.assertEqual(loaded_dfa.symbols, dfa.symbols)
+            self.assertEqual(loaded_dfa.symbol_index, dfa.symbol_index)
+            self.assertEqual(list(loaded_dfa.table), list(dfa.table))
+
+
+class TestSearch(unittest.TestCase):
+
+    def test_search(self):
+        print("Testing unanchored search")
+
+        nfa = nfa_utils.get_regex_nfa("python|java|C#")
+
+        self.assertEqual(search.search(nfa, "I like java and python"), (7, 11))
+        self.assertEqual(search.search(nfa, "I like java and python", pos=8), (16, 22))
+        self.assertIsNone(search.search(nfa, "I like perl"))
+
+    def test_search_leftmost_longest(self):
+        print("Testing leftmost shortest and leftmost longest search")
+
+        nfa = nfa_utils.get_regex_nfa("o+k")
+
+        # the leftmost match wins, even though a match starting later ends sooner
+        self.assertEqual(search.search(nfa, "xoooook ok"), (1, 7))
+
+        nfa = nfa_utils.get_regex_nfa("ab+")
+        self.assertEqual(search.search(nfa, "xxababab"), (2, 4))
+        self.assertEqual(search.search(nfa, "xxababab", longest=True), (2, 8))
+
+    def test_finditer(self):
+        print("Testing finding every match")
+
+        nfa = nfa_utils.get_regex_nfa("c?loud")
+        text = "loud cloud ccloud"
+
+        spans = list(search.finditer(nfa, text))
+        self.assertEqual(spans, [(0, 4), (5, 10), (12, 17)])
+        self.assertEqual([text[start:end] for start, end in spans], ["loud", "cloud", "cloud"])
+
+        # empty matches still move the search forward
+        nfa = nfa_utils.get_regex_nfa("a*")
+        self.assertEqual(list(search.finditer(nfa, "ba")), [(0, 0), (1, 1), (2, 2)])
+        self.assertEqual(list(search.finditer(nfa, "ba", longest=True)), [(0, 0), (1, 2), (2, 2)])
+
+
+class TestPrefilter(unittest.TestCase):
+
+    def test_conditions(self):
+        print("Testing required literals worked out from regexes")
+
+        self.assertEqual(prefilter.get_regex_prefilter("python|java|C#").condition, ("or", ["C#", "java", "python"]))
+        self.assertEqual(prefilter.get_regex_prefilter("c?loud").condition, "loud")
+        self.assertEqual(prefilter.get_regex_prefilter("ERROR.~*.timeout").condition, ("and", ["ERROR", "timeout"]))
+        self.assertEqual(prefilter.get_regex_prefilter("[ab]c").condition, ("or", ["ac", "bc"]))
+
+        # nothing has to be in every match
+        self.assertFalse(prefilter.get_regex_prefilter("a*").is_useful())
+        self.assertFalse(prefilter.get_regex_prefilter("python|~*").is_useful())
+
+    def test_prefilter_is_sound(self):
+        print("Testing prefilters never reject a string the regex matches")
+
+        for regex, accept_list, reject_list in TestDFA.examples + TestCharClasses.examples:
+            required = prefilter.get_regex_prefilter(regex)
+
+            for string in accept_list:
+                self.assertTrue(required.might_match(string), (regex, string))
+                self.assertTrue(required.might_match("xx" + string + "yy"), (regex, string))
+
+    def test_prefilter_search_and_batch(self):
+        print("Testing search and batch matching with a prefilter")
+
+        regex = "python|java|C#"
+        nfa = nfa_utils.get_regex_nfa(regex)
+        required = prefilter.get_regex_prefilter(regex)
+
+        self.assertEqual(search.search(nfa, "I like java and python", prefilter=required), (7, 11))
+        self.assertEqual(search.search(nfa, "I like java and python", pos=8, prefilter=required), (16, 22))
+        self.assertIsNone(search.search(nfa, "I like perl", prefilter=required))
+        self.assertEqual(list(search.finditer(nfa, "java, C#", prefilter=required)), [(0, 4), (6, 8)])
+        self.assertEqual(list(search.finditer(nfa, "perl", prefilter=required)), [])
+
+        strings = ["python", "perl", "java", "javaa", "C#", ""]
+        expected = [True, False, True, False, True, False]
+        self.assertEqual(list(batch.match_many(regex, strings, workers=1)), expected)
+        self.assertEqual(list(batch.match_many(regex, strings, workers=1, use_prefilter=False)), expected)
+        self.assertEqual(list(batch.match_many(regex, strings, workers=1, use_prefilter=True)), expected)
+        self.assertEqual([pattern.Pattern(regex).matches(string) for string in strings], expected)
+
+    def test_unanchored_start(self):
+        print("Testing Patterns only use the prefilter for regexes starting with ~*")
+
+        self.assertTrue(prefilter.has_unanchored_start(regex_parser.parse("~*.ERROR")))
+        self.assertTrue(prefilter.has_unanchored_start(regex_parser.parse("java|~*.C#")))
+        self.assertFalse(prefilter.has_unanchored_start(regex_parser.parse("ERROR.~*.timeout")))
+        self.assertFalse(prefilter.has_unanchored_start(regex_parser.parse("a*.ERROR")))
+
+        # the DFA rejects most strings of an anchored regex sooner than the prefilter would
+        self.assertIsNone(pattern.Pattern("python|java|C#").prefilter)
+        self.assertIsNone(pattern.Pattern("ERROR.~*.timeout").prefilter)
+
+        compiled = pattern.Pattern("~*.ERROR.~*.timeout.~*")
+        self.assertEqual(compiled.prefilter.condition, ("and", ["ERROR", "timeout"]))
+        self.assertEqual([compiled.matches(string) for string in ["ERROR: timeout", "INFO: timeout", "ERROR"]],
+                         [True, False, False])
+
+
+class TestAutomatonFile(unittest.TestCase):
+
+    def assert_matches(self, automaton, accept_list, reject_list):
+        for symbol_input in accept_list + reject_list:
+            automaton.reset()
+            automaton.feed_symbols(symbol_input, return_if_dies=True)
+            self.assertEqual(automaton.is_accepting(), symbol_input in accept_list)
+
+    def test_save_and_load(self):
+        print("Testing saving and loading compiled automata")
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "automaton.rxa")
+
+            for regex, accept_list, reject_list in TestDFA.examples:
+                nfa = nfa_utils.get_regex_nfa(regex)
+
+                dfa = nfa_utils.get_dfa(nfa)
+                automaton_file.save(dfa, path)
+                loaded_dfa = automaton_file.load(path)
+
+                # the table is read from the file in place
+                self.assertIsInstance(loaded_dfa.table, memoryview)
+                self.assertEqual(list(loaded_dfa.table), list(dfa.table))
+                self.assertEqual(loaded_dfa.symbols, dfa.symbols)
+                self.assert_matches(loaded_dfa, accept_list, reject_list)
+
+                automaton_file.save(nfa_utils.get_compact_nfa(nfa), path)
+                loaded_nfa = automaton_file.load(path)
+
+                self.assertEqual(loaded_nfa.to_nfa(), nfa)
+                self.assert_matches(loaded_nfa, accept_list, reject_list)
+
+    def test_load_compact_nfa_in_place(self):
+        print("Testing loading a compact NFA uses it's tables in place")
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "automaton.rxa")
+            regex = "|".join("keyword{}".format(i) for i in range(300))
+            compact_nfa = nfa_utils.get_compact_nfa(nfa_utils.get_regex_nfa(regex))
+            automaton_file.save(compact_nfa, path)
+
+            loaded_nfa, size = benchmarks.get_allocated_size(lambda: automaton_file.load(path))
+
+            for name in ["state_ids", "offsets", "columns", "targets"]:
+                self.assertIsInstance(getattr(loaded_nfa, name), memoryview)
+
+            # nothing is worked out per pair of states, or even copied from the file
+            self.assertLess(size, os.path.getsize(path))
+            self.assert_matches(loaded_nfa, ["keyword0", "keyword299"], ["keyword", "keyword300"])
+
+    def test_multi_pattern_round_trip(self):
+        print("Testing saving and loading a multi pattern DFA")
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "automaton.rxa")
+            automaton_file.save(nfa_utils.get_dfa(nfa_utils.get_multi_regex_nfa(["été", "é+"])), path)
+
+            dfa = automaton_file.load(path)
+            dfa.feed_symbols("é")
+            self.assertEqual(dfa.get_matched_patterns(), {1})
+
+    def test_bad_file(self):
+        print("Testing loading a file which is not an automaton file")
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "automaton.rxa")
+            with open(path, "wb") as file:
+                file.write(b"not an automaton file at all")
+
+            with self.assertRaises(ValueError):
+                automaton_file.load(path)
+
+    def test_regex_cache(self):
+        print("Testing compiled regex file cache")
+
+        with tempfile.TemporaryDirectory() as directory:
+            dfa = automaton_file.load_regex("c?loud", directory)
+            self.assertNotIsInstance(dfa.table, memoryview)
+
+            # the second time, the DFA is loaded from the file saved the first time
+            dfa = automaton_file.load_regex("c?loud", directory)
+            self.assertIsInstance(dfa.table, memoryview)
+            self.assert_matches(dfa, ["cloud", "loud"], ["oud", "ccloud"])
+
+            self.assertEqual(len(os.listdir(directory)), 1)
+            automaton_file.load_regex("c?loud", directory, use_dfa=False)
+            self.assertEqual(len(os.listdir(directory)), 2)
+
+
+class TestPatternCache(unittest.TestCase):
+
+    def setUp(self):
+        pattern.clear_cache()
+        pattern.set_cache_capacity(2)
+
+    def tearDown(self):
+        pattern.clear_cache()
+        pattern.set_cache_capacity(512)
+
+    def test_pattern_matches(self):
+        print("Testing compiled patterns")
+
+        for regex, accept_list, reject_list in TestDFA.examples:
+            compiled = pattern.compile(regex)
+
+            for symbol_input in accept_list + reject_list:
+                self.assertEqual(compiled.matches(symbol_input), symbol_input in accept_list)
+
+    def test_pattern_immutable(self):
+        print("Testing compiled patterns can't be changed")
+
+        compiled = pattern.compile("c?loud")
+
+        with self.assertRaises(AttributeError):
+            compiled.regex = "python"
+        with self.assertRaises(TypeError):
+            compiled.table[0] = 1
+        with self.assertRaises(TypeError):
+            compiled.symbol_index["x"] = 0
+
+    def test_cache_hits_and_eviction(self):
+        print("Testing compiled pattern cache")
+
+        first = pattern.compile("python|java")
+        self.assertIs(pattern.compile("python|java"), first)
+        self.assertEqual(pattern.cache_info(), {"hits": 1, "misses": 1, "size": 1, "capacity": 2})
+
+        pattern.compile("c?loud")
+        # "python|java" was used most recently, so "c?loud" is evicted for this one
+        pattern.compile("python|java")
+        pattern.compile("o+k")
+        self.assertIs(pattern.compile("python|java"), first)
+
+        info = pattern.cache_info()
+        self.assertEqual(info["size"], 2)
+        self.assertEqual(info["misses"], 3)
+
+        pattern.compile("c?loud")
+        self.assertEqual(pattern.cache_info()["misses"], 4)
+
+    def test_cache_threads(self):
+        print("Testing compiled pattern cache from several threads")
+
+        regexes = ["a+", "b+", "c+"] * 20
+        results = []
+
+        def compile_all():
+            results.append([pattern.compile(regex) for regex in regexes])
+
+        threads = [threading.Thread(target=compile_all) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        info = pattern.cache_info()
+        self.assertEqual(info["hits"] + info["misses"], 4 * len(regexes))
+        for compiled_list in results:
+            for regex, compiled in zip(regexes, compiled_list):
+                self.assertEqual(compiled.regex, regex)
+
+
+class TestMatcher(unittest.TestCase):
+
+    def test_matcher(self):
+        print("Testing matchers against a shared pattern")
+
+        compiled = pattern.Pattern("o+k then")
+        first = compiled.matcher()
+        second = compiled.matcher()
+
+        # feeding one matcher does not affect the other
+        first.feed_symbols("oook")
+        second.feed_symbols("k")
+        first.feed_symbols(" then")
+
+        self.assertTrue(first.is_accepting())
+        self.assertFalse(second.is_accepting())
+        self.assertTrue(second.is_dead())
+
+        second.reset()
+        for symbol in "ok then":
+            second.feed_symbol(symbol)
+        self.assertTrue(second.is_accepting())
+
+    def test_matchers_in_threads(self):
+        print("Testing matching one pattern from several threads")
+
+        compiled = pattern.Pattern("python|java|C#")
+        strings = ["python", "java", "perl", "C#", "C++"] * 200
+        expected = [string in ("python", "java", "C#") for string in strings]
+
+        def match_all():
+            matcher = compiled.matcher()
+            results = []
+
+            for string in strings:
+                matcher.reset()
+                matcher.feed_symbols(string)
+                results.append(matcher.is_accepting())
+
+            return results
+
+        with concurrent.futures.ThreadPoolExecutor(4) as executor:
+            futures = [executor.submit(match_all) for i in range(8)]
+
+            for future in futures:
+                self.assertEqual(future.result(), expected)
+
+
+@unittest.skipIf(lockstep.numpy is None, "NumPy is not installed")
+class TestLockstepNFA(unittest.TestCase):
+
+    def test_lockstep_matches_nfa(self):
+        print("Testing lockstep NFA accepts the same strings as the NFA")
+
+        for regex, accept_list, reject_list in TestDFA.examples:
+            lockstep_nfa = lockstep.LockstepNFA(nfa_utils.get_regex_nfa(regex), chunk_size=3)
+            strings = accept_list + reject_list
+
+            results = lockstep_nfa.match(strings)
+            self.assertEqual(list(results), [string in accept_list for string in strings])
+
+    def test_lockstep_many_states(self):
+        print("Testing lockstep NFA with more states than fit in one word")
+
+        keywords = ["keyword{}".format(i) for i in range(20)]
+        nfa = nfa_utils.get_regex_nfa("|".join(keywords))
+        lockstep_nfa = lockstep.LockstepNFA(nfa)
+        self.assertGreater(lockstep_nfa.num_states, 64)
+
+        strings = keywords + ["keyword", "keyword20", "", "keyword1x"]
+        self.assertEqual(list(lockstep_nfa.match(strings)), [string in keywords for string in strings])
+
+    def test_lockstep_char_classes(self):
+        print("Testing lockstep NFA with character classes")
+
+        for regex, accept_list, reject_list in TestCharClasses.examples:
+            lockstep_nfa = lockstep.LockstepNFA(nfa_utils.get_regex_nfa(regex))
+            strings = accept_list + reject_list
+
+            self.assertEqual(list(lockstep_nfa.match(strings)), [string in accept_list for string in strings])
+
+    def test_lockstep_fallback(self):
+        print("Testing lockstep NFA falls back to a compact NFA when the table would be too large")
+
+        keywords = ["keyword{}".format(i) for i in range(20)]
+        nfa = nfa_utils.get_regex_nfa("|".join(keywords))
+        strings = keywords + ["keyword", "keyword20", "", "keyword1x"]
+
+        lockstep_nfa = lockstep.LockstepNFA(nfa)
+        self.assertFalse(lockstep_nfa.fallback)
+
+        lockstep_nfa = lockstep.LockstepNFA(nfa, max_table_bytes=lockstep_nfa.table_bytes - 1)
+        self.assertTrue(lockstep_nfa.fallback)
+        self.assertIsNone(lockstep_nfa.byte_steps)
+        self.assertEqual(list(lockstep_nfa.match(strings)), [string in keywords for string in strings])
+        self.assertEqual(len(lockstep_nfa.match([])), 0)
+
+        # a 900 state NFA needs a 61 MB table, which is over the default limit
+        nfa = nfa_utils.get_regex_nfa("|".join("keyword{}".format(i) for i in range(100)))
+        self.assertTrue(lockstep.LockstepNFA(nfa).fallback)
+
+    def test_lockstep_empty_input(self):
+        print("Testing lockstep NFA with empty strings and no strings")
+
+        lockstep_nfa = lockstep.LockstepNFA(nfa_utils.get_regex_nfa("a*"))
+        self.assertEqual(list(lockstep_nfa.match(["", "", "b"])), [True, True, False])
+        self.assertEqual(len(lockstep_nfa.match([])), 0)